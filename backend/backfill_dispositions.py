@@ -0,0 +1,44 @@
+import os
+import sys
+import argparse
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import dispositions
+import observability
+from database import SessionLocal
+from migrate import upgrade_database
+
+def backfill_dispositions(taxonomy: str = dispositions.DISPOSITION_TAXONOMY_FILE, batch_size: int = 1000,
+                          rename: bool = False):
+    """
+    Imports the disposition taxonomy and links every classified insight
+    that has no disposition links yet (the server also does this on start).
+    With `rename`, the disposition columns of those insights are rewritten
+    to the canonical names as well. Safe to rerun.
+    """
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        print(f"Importing taxonomy from {taxonomy}...")
+        print(f"Added {dispositions.import_taxonomy(db, taxonomy)} taxonomy entries.")
+        result = dispositions.backfill(db, batch_size=batch_size, rename=rename)
+        print(f"Linked {result['insights']} insights ({result['links']} links, {result['canonicalized']} with non-canonical "
+              f"spellings, {result['renamed']} renamed).")
+        print(f"Matches: {dispositions.CANONICALIZER.stats()['matches']}")
+        return result
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the disposition taxonomy and link existing insights to it.")
+    parser.add_argument("--taxonomy", default=dispositions.DISPOSITION_TAXONOMY_FILE)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rename-columns", action="store_true",
+                        help="also rewrite disposition_1..5 of the linked insights to the canonical names (irreversible)")
+    args = parser.parse_args()
+    # Batch progress is logged by dispositions.backfill
+    observability.configure_logging()
+    backfill_dispositions(args.taxonomy, args.batch_size, args.rename_columns)
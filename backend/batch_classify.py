@@ -0,0 +1,59 @@
+import os
+import sys
+import argparse
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import batch_jobs
+import observability
+from database import SessionLocal
+from migrate import upgrade_database
+
+def print_stats(stats: dict):
+    print(f"Jobs: {stats['jobs'] or 'none'}. {stats['requests']} requests, {stats['ingested']} insights stored, "
+          f"{stats['failed']} failed, {stats['leased_rows']} rows out in batches.")
+    for job in stats["unfinished"]:
+        print(f"  {job['id']}: {job['status']} on {job['backend']} ({job['remote_status'] or '-'}), {job['requests']} requests")
+
+def batch_classify(backend: str = batch_jobs.BATCH_BACKEND, shard_size: int = batch_jobs.BATCH_SHARD_SIZE,
+                   max_shards: int = None, wait: bool = True, poll_interval: float = 60) -> dict:
+    """
+    Drains the classification backlog through the batch backend: exports
+    unclassified rows into sharded JSONL request files, submits them, polls
+    and stores the results in bulk. Safe to interrupt and rerun: unfinished
+    jobs are resumed, results are stored once per row.
+    """
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        unfinished = batch_jobs.unfinished(db)
+        if unfinished:
+            print(f"Resuming {len(unfinished)} unfinished batch job(s).")
+        stats = batch_jobs.drain(db, backend, shard_size, max_shards, wait, poll_interval)
+        print_stats(stats)
+        return stats
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify the backlog offline through Batch-API JSONL jobs (half the price of real-time calls).")
+    parser.add_argument("--backend", choices=["openai", "local"], default=batch_jobs.BATCH_BACKEND,
+                        help="backend for new jobs; 'local' answers the files through the real-time API")
+    parser.add_argument("--shard-size", type=int, default=batch_jobs.BATCH_SHARD_SIZE, help="requests per JSONL file / job")
+    parser.add_argument("--max-shards", type=int, default=None, help="new jobs to export in this run (0: only resume)")
+    parser.add_argument("--no-wait", action="store_true", help="submit / poll once and exit; rerun (e.g. from cron) to continue")
+    parser.add_argument("--poll-interval", type=float, default=60)
+    parser.add_argument("--status", action="store_true", help="only show the jobs")
+    args = parser.parse_args()
+    observability.configure_logging()
+    if args.status:
+        upgrade_database()
+        session = SessionLocal()
+        try:
+            print_stats(batch_jobs.stats(session))
+        finally:
+            session.close()
+    else:
+        batch_classify(args.backend, args.shard_size, args.max_shards, not args.no_wait, args.poll_interval)
@@ -0,0 +1,463 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import datetime
+from itertools import islice
+from openai import OpenAI
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+import observability
+import openai_service
+from classification_cache import CACHE
+from classification_service import persist_results
+from database import in_chunks
+from near_duplicates import NEAR_DUPLICATES
+from work_queue import claim, release
+
+logger = logging.getLogger("signalyze.batch")
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Where request shards and downloaded result files are written
+BATCH_JOB_DIR = os.getenv("BATCH_JOB_DIR", os.path.join(backend_dir, "batch_jobs"))
+# "openai" (the Batch API) or "local" (LocalBatchBackend)
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "openai")
+# Requests and bytes per shard file; the Batch API takes at most 50,000
+# requests and 200 MB per file
+BATCH_SHARD_SIZE = int(os.getenv("BATCH_SHARD_SIZE", "50000"))
+BATCH_SHARD_MAX_BYTES = int(os.getenv("BATCH_SHARD_MAX_BYTES", str(190 * 1024 * 1024)))
+# Exported rows stay leased to their job this long (the 24h completion
+# window plus margin), then the live pipeline picks them up again
+BATCH_LEASE_SECONDS = int(os.getenv("BATCH_LEASE_SECONDS", str(26 * 3600)))
+# Result lines stored per transaction
+BATCH_INGEST_CHUNK = int(os.getenv("BATCH_INGEST_CHUNK", "1000"))
+
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Remote states with (possibly partial) results, and without any
+_REMOTE_FINISHED = ("completed", "expired")
+_REMOTE_FAILED = ("failed", "cancelled")
+# Local job states that need no more work
+DONE = ("ingested", "failed")
+
+class OpenAIBatchBackend:
+    """
+    The OpenAI Batch API: uploads a shard, creates a batch tagged with the
+    job id (so a crash between creating and recording it does not submit
+    twice) and downloads its result files.
+    """
+    name = "openai"
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def find(self, job_id: str, since: datetime.datetime = None):
+        """Id of a live batch already created for `job_id`, or None."""
+        since_ts = since.replace(tzinfo=datetime.timezone.utc).timestamp() if since else 0
+        for batch in self.client.batches.list(limit=100):
+            # Newest first: anything older than the job cannot belong to it
+            if batch.created_at < since_ts - 60:
+                break
+            if (batch.metadata or {}).get("signalyze_job") == job_id and batch.status not in _REMOTE_FAILED:
+                return batch.id
+        return None
+
+    def submit(self, job_id: str, path: str) -> str:
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT,
+                                           completion_window=BATCH_COMPLETION_WINDOW,
+                                           metadata={"signalyze_job": job_id})
+        return batch.id
+
+    def status(self, remote_id: str) -> dict:
+        batch = self.client.batches.retrieve(remote_id)
+        errors = [error.message for error in (batch.errors.data or [])] if batch.errors else []
+        return {
+            "status": batch.status,
+            "output_file_id": batch.output_file_id,
+            "error_file_id": batch.error_file_id,
+            "error": "; ".join(message for message in errors if message) or None,
+        }
+
+    def download(self, file_id: str, path: str):
+        with self.client.files.with_streaming_response.content(file_id) as response:
+            response.stream_to_file(path)
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for the Batch API (tests, benchmarks, accounts
+    without batch access). A submitted shard is copied to `directory` and
+    answered on the first status() call by sending every request to the
+    client from `client_factory` (the real-time API by default, or a fake),
+    writing output and error files in the Batch API format.
+    """
+    name = "local"
+
+    def __init__(self, directory: str = None, client_factory=openai_service.get_openai_client, concurrency: int = 20):
+        self.directory = directory or os.path.join(BATCH_JOB_DIR, "local")
+        self.client_factory = client_factory
+        self.concurrency = concurrency
+
+    def _path(self, remote_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{remote_id}.{kind}.jsonl")
+
+    def find(self, job_id: str, since: datetime.datetime = None):
+        remote_id = f"local-{job_id}"
+        return remote_id if os.path.exists(self._path(remote_id, "input")) else None
+
+    def submit(self, job_id: str, path: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        remote_id = f"local-{job_id}"
+        shutil.copyfile(path, self._path(remote_id, "input") + ".tmp")
+        os.replace(self._path(remote_id, "input") + ".tmp", self._path(remote_id, "input"))
+        return remote_id
+
+    def status(self, remote_id: str) -> dict:
+        output, errors = self._path(remote_id, "output"), self._path(remote_id, "error")
+        if not os.path.exists(output):
+            asyncio.run(self._run(remote_id))
+        return {
+            "status": "completed",
+            "output_file_id": output,
+            "error_file_id": errors if os.path.getsize(errors) else None,
+            "error": None,
+        }
+
+    def download(self, file_id: str, path: str):
+        shutil.copyfile(file_id, path)
+
+    async def _answer(self, client, semaphore, request: dict) -> tuple:
+        line = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request["custom_id"], "response": None, "error": None}
+        if client is None:
+            line["error"] = {"code": "no_client", "message": "OpenAI client not initialized. Check API key."}
+            return None, line
+        try:
+            async with semaphore:
+                response = await client.chat.completions.create(**request["body"])
+        except Exception as e:
+            line["error"] = {"code": type(e).__name__, "message": str(e)}
+            return None, line
+        usage = getattr(response, "usage", None)
+        line["response"] = {"status_code": 200, "body": {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": response.choices[0].message.content}}],
+            "usage": {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens} if usage else None,
+        }}
+        return line, None
+
+    async def _run(self, remote_id: str):
+        client = self.client_factory()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        output, errors = self._path(remote_id, "output"), self._path(remote_id, "error")
+        with open(self._path(remote_id, "input"), encoding="utf-8") as requests, \
+                open(output + ".tmp", "w", encoding="utf-8") as out, open(errors + ".tmp", "w", encoding="utf-8") as err:
+            while True:
+                chunk = [json.loads(line) for line in islice(requests, 1000)]
+                if not chunk:
+                    break
+                for ok, failed in await asyncio.gather(*[self._answer(client, semaphore, request) for request in chunk]):
+                    if ok:
+                        out.write(json.dumps(ok, ensure_ascii=False) + "\n")
+                    else:
+                        err.write(json.dumps(failed, ensure_ascii=False) + "\n")
+        # The output file appears last: its existence means the batch completed
+        os.replace(errors + ".tmp", errors)
+        os.replace(output + ".tmp", output)
+
+BACKENDS = {}
+
+def register_backend(backend):
+    """Makes `backend` the one used for jobs of its name (e.g. a LocalBatchBackend with a fake client)."""
+    BACKENDS[backend.name] = backend
+
+def get_backend(name: str):
+    if name not in BACKENDS:
+        if name == "openai":
+            register_backend(OpenAIBatchBackend())
+        elif name == "local":
+            register_backend(LocalBatchBackend())
+        else:
+            raise ValueError(f"Unknown batch backend: {name}")
+    return BACKENDS[name]
+
+def _worker(job_id: str) -> str:
+    # Exported rows are classify leases held by this worker id
+    return f"batch:{job_id}"
+
+def _leased_ids(db: Session, job_id: str) -> list:
+    return [item_id for (item_id,) in db.query(models.WorkClaim.item_id)
+            .filter(models.WorkClaim.stage == "classify", models.WorkClaim.worker_id == _worker(job_id))]
+
+def _unclassified_texts(db: Session, ids) -> list:
+    """(preprocessed id, text) for the rows of `ids` without an insight."""
+    feedback, insight = models.PreprocessedFeedback, models.ClassifiedInsight
+    texts = []
+    for chunk in in_chunks(ids):
+        for item_id, cleaned, translated, is_translated in db.query(feedback.id, feedback.cleaned_text,
+                                                                    feedback.translated_text, feedback.is_translated)\
+                .outerjoin(insight, insight.preprocessed_id == feedback.id)\
+                .filter(feedback.id.in_(chunk), insight.id.is_(None)):
+            texts.append((item_id, translated if is_translated else cleaned))
+    return texts
+
+def _in_flight_representatives(db: Session, job_id: str, ids) -> list:
+    """Near-duplicate representatives of `ids` that are out in another batch job."""
+    signatures, claims = models.NearDuplicateSignature, models.WorkClaim
+    representatives = set()
+    for chunk in in_chunks(ids):
+        representatives.update(rep_id for (rep_id,) in db.query(signatures.representative_id)
+                               .filter(signatures.preprocessed_id.in_(chunk), signatures.representative_id.isnot(None)))
+    found = []
+    for chunk in in_chunks(representatives):
+        found.extend(item_id for (item_id,) in db.query(claims.item_id)
+                     .filter(claims.stage == "classify", claims.item_id.in_(chunk),
+                             claims.worker_id.like("batch:%"), claims.worker_id != _worker(job_id)))
+    return found
+
+def _resolve_locally(db: Session, texts, in_flight=()) -> tuple:
+    """
+    Results that need no request: cached classifications and classified
+    near-duplicates. Rows whose representative is in `texts` or `in_flight`
+    follow it instead. Returns ({id: result}, {follower id: leader id}).
+    """
+    found = CACHE.get_many(db, dict(texts))
+    followers = {}
+    if NEAR_DUPLICATES.enabled:
+        reused, followers = NEAR_DUPLICATES.lookup(db, [item_id for item_id, _ in texts if item_id not in found],
+                                                   list(found) + list(in_flight))
+        found.update(reused)
+    return found, followers
+
+def create_job(db: Session, backend: str = BATCH_BACKEND) -> models.BatchJob:
+    job_id = f"{datetime.datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    job = models.BatchJob(id=job_id, status="exporting", backend=backend,
+                          model=openai_service.CLASSIFICATION_MODEL, prompt_version=openai_service.PROMPT_VERSION,
+                          request_file=os.path.join(BATCH_JOB_DIR, f"{job_id}.requests.jsonl"),
+                          requests=0, ingest_offset=0, ingested=0, failed=0)
+    db.add(job)
+    db.commit()
+    return job
+
+def export_shard(db: Session, backend: str = BATCH_BACKEND, shard_size: int = BATCH_SHARD_SIZE):
+    """
+    Leases up to `shard_size` unclassified rows to a new job (see
+    work_queue.claim, so live workers leave them alone) and writes its
+    request file. Returns the job, or None when the backlog is empty.
+    """
+    job = create_job(db, backend)
+    if not claim(db, "classify", _worker(job.id), shard_size, lease_seconds=BATCH_LEASE_SECONDS):
+        db.delete(job)
+        db.commit()
+        return None
+    write_requests(db, job)
+    return job
+
+def write_requests(db: Session, job: models.BatchJob):
+    """
+    Writes one request line per leased row (custom_id = preprocessed id),
+    rebuilt from the leases, so a crash mid-export is resumed by calling it
+    again. Cached and near-duplicate results are stored right away;
+    near-duplicates of rows in this or another job wait for that result
+    (see ingest); rows beyond BATCH_SHARD_MAX_BYTES are released for the
+    next shard.
+    """
+    with observability.stage("batch_export", job=job.id):
+        texts = _unclassified_texts(db, _leased_ids(db, job.id))
+        in_flight = _in_flight_representatives(db, job.id, [item_id for item_id, _ in texts]) if NEAR_DUPLICATES.enabled else []
+        found, followers = _resolve_locally(db, texts, in_flight)
+        if found:
+            job.ingested += len(found)
+            persist_results(db, [(item_id, text) for item_id, text in texts if item_id in found], found)
+        # Followers wait for their leader's result (see ingest)
+        pending = [(item_id, text) for item_id, text in texts if item_id not in found and item_id not in followers]
+
+        os.makedirs(BATCH_JOB_DIR, exist_ok=True)
+        written, overflow, size = 0, [], 0
+        with open(job.request_file + ".tmp", "w", encoding="utf-8") as f:
+            for item_id, text in pending:
+                line = json.dumps({"custom_id": str(item_id), "method": "POST", "url": BATCH_ENDPOINT,
+                                   "body": openai_service.classification_request(text)}, ensure_ascii=False) + "\n"
+                length = len(line.encode("utf-8"))
+                if written and size + length > BATCH_SHARD_MAX_BYTES:
+                    overflow.append(item_id)
+                    continue
+                f.write(line)
+                written += 1
+                size += length
+        os.replace(job.request_file + ".tmp", job.request_file)
+
+        release(db, "classify", overflow, worker_id=_worker(job.id))
+        job.requests = written
+        job.status = "exported" if written else "completed"
+        db.commit()
+    logger.info("Batch job %s: %d requests (%.1f MB), %d resolved locally, %d near-duplicates waiting, %d left for the next shard",
+                job.id, written, size / 1e6, len(found), len(followers), len(overflow))
+
+def submit(db: Session, job: models.BatchJob):
+    backend = get_backend(job.backend)
+    with observability.stage("batch_submit", job=job.id):
+        job.remote_id = job.remote_id or backend.find(job.id, job.created_at) or backend.submit(job.id, job.request_file)
+        job.remote_status = "submitted"
+        job.status = "submitted"
+        db.commit()
+    logger.info("Batch job %s submitted to %s as %s", job.id, backend.name, job.remote_id)
+
+def _download(backend, file_id, path: str):
+    if not file_id:
+        return None
+    if not os.path.exists(path):
+        backend.download(file_id, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return path
+
+def poll(db: Session, job: models.BatchJob):
+    """
+    Checks the remote batch once. Finished batches have their result files
+    downloaded; failed ones give their rows back to the live pipeline.
+    """
+    backend = get_backend(job.backend)
+    info = backend.status(job.remote_id)
+    job.remote_status = info["status"]
+    if info["status"] in _REMOTE_FINISHED:
+        job.output_file = _download(backend, info.get("output_file_id"), os.path.join(BATCH_JOB_DIR, f"{job.id}.output.jsonl"))
+        job.error_file = _download(backend, info.get("error_file_id"), os.path.join(BATCH_JOB_DIR, f"{job.id}.errors.jsonl"))
+        job.status = "completed"
+    elif info["status"] in _REMOTE_FAILED:
+        job.error = info.get("error") or info["status"]
+        release(db, "classify", _leased_ids(db, job.id), worker_id=_worker(job.id))
+        job.status = "failed"
+        logger.error("Batch job %s %s: %s", job.id, info["status"], job.error)
+    db.commit()
+
+def parse_result(line) -> tuple:
+    """(custom_id, classification or None) for one Batch API output line."""
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        logger.warning("Unreadable batch result line skipped")
+        return None, None
+    custom_id = entry.get("custom_id")
+    response = entry.get("response") or {}
+    if entry.get("error") or response.get("status_code") != 200:
+        return custom_id, None
+    try:
+        result = json.loads(response["body"]["choices"][0]["message"]["content"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return custom_id, None
+    if not isinstance(result, dict) or not any(field in result for field in openai_service.TAXONOMY_KEYS):
+        return custom_id, None
+    return custom_id, result
+
+def _store_chunk(db: Session, job: models.BatchJob, lines, offset: int, store_cache: bool):
+    results = dict(parse_result(line) for line in lines)
+    # Rows classified meanwhile (or by an earlier run) are left alone:
+    # idempotent per custom_id
+    texts = _unclassified_texts(db, [custom_id for custom_id in results if custom_id])
+    by_id = {item_id: results[str(item_id)] for item_id, _ in texts if results.get(str(item_id))}
+    # The progress commits with the insights
+    job.ingest_offset = offset
+    job.ingested += len(by_id)
+    job.failed += sum(1 for result in results.values() if not result)
+    persist_results(db, texts, by_id, store_cache=store_cache)
+    if job.ingest_offset != offset:
+        raise RuntimeError(f"Storing results of batch job {job.id} failed; rerun to resume")
+
+def ingest(db: Session, job: models.BatchJob):
+    """
+    Streams the output file into classified_insights, BATCH_INGEST_CHUNK
+    lines per transaction, resuming from the stored offset. Then resolves
+    near-duplicates that waited for these results and gives every row
+    still without a result back to the live pipeline.
+    """
+    store_cache = (job.model, job.prompt_version) == (openai_service.CLASSIFICATION_MODEL, openai_service.PROMPT_VERSION)
+    with observability.stage("batch_ingest", job=job.id):
+        if not job.ingest_offset:
+            job.failed = 0
+        if job.output_file:
+            with open(job.output_file, "rb") as f:
+                f.seek(job.ingest_offset)
+                while True:
+                    lines = list(islice(f, BATCH_INGEST_CHUNK))
+                    if not lines:
+                        break
+                    _store_chunk(db, job, lines, f.tell(), store_cache)
+
+        texts = _unclassified_texts(db, _leased_ids(db, job.id))
+        found, _ = _resolve_locally(db, texts)
+        if found:
+            job.ingested += len(found)
+            persist_results(db, [(item_id, text) for item_id, text in texts if item_id in found], found)
+        if job.error_file:
+            with open(job.error_file, "rb") as f:
+                job.failed += sum(1 for _ in f)
+        release(db, "classify", _leased_ids(db, job.id), worker_id=_worker(job.id))
+        job.status = "ingested"
+        db.commit()
+    observability.STAGE_ITEMS.labels("batch", "classified").inc(job.ingested)
+    observability.STAGE_ITEMS.labels("batch", "failed").inc(job.failed)
+    logger.info("Batch job %s ingested: %d insights, %d failed requests", job.id, job.ingested, job.failed)
+
+def advance(db: Session, job: models.BatchJob) -> str:
+    """Moves `job` as far as it gets without waiting for the backend; returns its status."""
+    if job.status == "exporting":
+        write_requests(db, job)
+    if job.status == "exported":
+        submit(db, job)
+    if job.status == "submitted":
+        poll(db, job)
+    if job.status == "completed":
+        ingest(db, job)
+    return job.status
+
+def unfinished(db: Session) -> list:
+    return db.query(models.BatchJob).filter(models.BatchJob.status.notin_(DONE))\
+        .order_by(models.BatchJob.created_at, models.BatchJob.id).all()
+
+def drain(db: Session, backend: str = BATCH_BACKEND, shard_size: int = BATCH_SHARD_SIZE, max_shards: int = None,
+          wait: bool = True, poll_interval: float = 60) -> dict:
+    """
+    Exports the classification backlog into shards (at most `max_shards`
+    new ones), submits them and, with `wait`, polls until every job is
+    ingested. Unfinished jobs of earlier runs are resumed, so after a crash
+    or with wait=False the same call picks up where it stopped.
+    """
+    exported = 0
+    while max_shards is None or exported < max_shards:
+        if not export_shard(db, backend, shard_size):
+            break
+        exported += 1
+    while True:
+        pending = [job for job in unfinished(db) if advance(db, job) not in DONE]
+        if not pending or not wait:
+            break
+        logger.info("%d batch job(s) still running, next poll in %ss", len(pending), poll_interval)
+        time.sleep(poll_interval)
+    return stats(db)
+
+def stats(db: Session) -> dict:
+    jobs = models.BatchJob
+    totals = db.query(func.count(), func.sum(jobs.requests), func.sum(jobs.ingested), func.sum(jobs.failed)).one()
+    return {
+        "jobs": dict(db.query(jobs.status, func.count()).group_by(jobs.status).all()),
+        "requests": totals[1] or 0,
+        "ingested": totals[2] or 0,
+        "failed": totals[3] or 0,
+        # Rows exported to a job and not back yet
+        "leased_rows": db.query(models.WorkClaim)
+            .filter(models.WorkClaim.stage == "classify", models.WorkClaim.worker_id.like("batch:%"),
+                    models.WorkClaim.leased_until >= datetime.datetime.utcnow()).count(),
+        "unfinished": [{"id": job.id, "status": job.status, "backend": job.backend, "remote_status": job.remote_status,
+                        "requests": job.requests, "ingested": job.ingested} for job in unfinished(db)],
+    }
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import openai_service
+from fake_openai import FakeAsyncOpenAI
+from bench_clean_text import DEFAULT_CSV, load_corpus
+
+async def run_mode(mode: str, texts, pipeline_batch: int, batch_size: int, client: FakeAsyncOpenAI, rpm: int, tpm: int):
+    """
+    Drives the same loop shape as run_classification_pipeline: `pipeline_batch`
+    items per iteration, either one request per item or packed requests.
+    """
+    openai_service.client = client
+    classified = 0
+    started = time.perf_counter()
+    for i in range(0, len(texts), pipeline_batch):
+        chunk = list(enumerate(texts[i:i + pipeline_batch], start=i))
+        if mode == "single":
+            results = await asyncio.gather(*[openai_service.analyze_feedback(text) for _, text in chunk])
+        else:
+            results = list((await openai_service.analyze_feedback_batch(chunk, batch_size=batch_size)).values())
+        classified += sum(1 for r in results if r)
+    elapsed = time.perf_counter() - started
+
+    total_tokens = client.prompt_tokens + client.completion_tokens
+    return {
+        "mode": mode,
+        "items": len(texts),
+        "classified": classified,
+        "requests": client.requests,
+        "prompt_tokens_per_item": round(client.prompt_tokens / len(texts), 1),
+        "completion_tokens_per_item": round(client.completion_tokens / len(texts), 1),
+        "tokens_per_item": round(total_tokens / len(texts), 1),
+        "items_per_minute": round(len(texts) / elapsed * 60, 1),
+        # Ceiling imposed by the account's requests/min and tokens/min limits
+        "items_per_minute_at_limits": round(min(rpm * len(texts) / client.requests, tpm * len(texts) / total_tokens), 1),
+    }
+
+def run(args):
+    texts = [t for t in load_corpus(args.csv, 1) if len(t) > 20][:args.items]
+    reports = []
+    for mode in ("single", "batch"):
+        client = FakeAsyncOpenAI(latency=args.latency, latency_per_token=args.latency_per_token,
+                                 drop_rate=args.drop_rate if mode == "batch" else 0, seed=1)
+        reports.append(asyncio.run(run_mode(mode, texts, args.pipeline_batch, args.batch_size, client, args.rpm, args.tpm)))
+
+    print(f"{'mode':<8}{'items':>7}{'ok':>7}{'requests':>10}{'prompt/item':>13}{'compl/item':>12}"
+          f"{'tokens/item':>13}{'items/min':>11}{'items/min @limits':>19}")
+    for r in reports:
+        print(f"{r['mode']:<8}{r['items']:>7}{r['classified']:>7}{r['requests']:>10}{r['prompt_tokens_per_item']:>13}"
+              f"{r['completion_tokens_per_item']:>12}{r['tokens_per_item']:>13}{r['items_per_minute']:>11}"
+              f"{r['items_per_minute_at_limits']:>19}")
+    single, batch = reports
+    print(f"Token reduction: {1 - batch['tokens_per_item'] / single['tokens_per_item']:.1%}, "
+          f"request reduction: {1 - batch['requests'] / single['requests']:.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare single-item and multi-item classification on a mocked OpenAI client")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--items", type=int, default=400)
+    parser.add_argument("--pipeline-batch", type=int, default=20, help="items per pipeline iteration")
+    parser.add_argument("--batch-size", type=int, default=openai_service.CLASSIFY_BATCH_SIZE, help="items per request")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--latency-per-token", type=float, default=0.0002)
+    parser.add_argument("--rpm", type=int, default=500, help="account requests/min limit")
+    parser.add_argument("--tpm", type=int, default=200000, help="account tokens/min limit")
+    parser.add_argument("--drop-rate", type=float, default=0.02, help="share of items the fake drops from batch responses")
+    run(parser.parse_args())
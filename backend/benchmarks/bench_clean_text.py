@@ -0,0 +1,59 @@
+import os
+import re
+import sys
+import csv
+import time
+import argparse
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from utils import TextNormalizer
+
+DEFAULT_CSV = os.path.join(os.path.dirname(backend_dir), "data-1769676935635.csv")
+
+def legacy_clean_text(text: str) -> str:
+    # The original three-pass implementation, kept here as the baseline
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'\[bot\]', '', text, flags=re.IGNORECASE)
+    text = re.sub(r'[^\w\s\.,!\?\-]', '', text)
+    text = text.strip()
+    return text
+
+def load_corpus(path: str, repeat: int):
+    """
+    Every non-empty text cell of the export, repeated `repeat` times.
+    """
+    texts = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            texts.extend(cell for cell in row if cell and cell != "NULL")
+    return texts * repeat
+
+def timed(fn, texts):
+    started = time.perf_counter()
+    out = fn(texts)
+    return out, time.perf_counter() - started
+
+def run(path: str, repeat: int):
+    texts = load_corpus(path, repeat)
+    normalizer = TextNormalizer()
+
+    legacy_out, legacy_sec = timed(lambda items: [legacy_clean_text(t) for t in items], texts)
+    fused_out, fused_sec = timed(normalizer.clean_many, texts)
+
+    mismatches = sum(1 for a, b in zip(legacy_out, fused_out) if a != b)
+    print(f"Texts: {len(texts)} ({sum(len(t) for t in texts) / 1e6:.1f}M chars)")
+    print(f"Legacy clean_text : {len(texts) / legacy_sec:,.0f} texts/sec ({legacy_sec:.3f}s)")
+    print(f"TextNormalizer    : {len(texts) / fused_sec:,.0f} texts/sec ({fused_sec:.3f}s)")
+    print(f"Speedup           : {legacy_sec / fused_sec:.2f}x")
+    print(f"Equivalent output : {'yes' if mismatches == 0 else f'NO ({mismatches} mismatches)'}")
+    return mismatches == 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark clean_text against the fused TextNormalizer")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.csv, args.repeat) else 1)
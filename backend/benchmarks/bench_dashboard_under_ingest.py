@@ -0,0 +1,122 @@
+import os
+import sys
+import csv
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(benchmarks_dir)
+for path in (backend_dir, benchmarks_dir):
+    if path not in sys.path:
+        sys.path.append(path)
+
+import httpx
+from bench_clean_text import DEFAULT_CSV, load_corpus
+from bench_openai_scheduler import start_server, free_port
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def summarize(latencies, errors: int) -> str:
+    ms = [v * 1000 for v in latencies]
+    return (f"n={len(ms)} errors={errors} p50={percentile(ms, 50):.1f}ms p95={percentile(ms, 95):.1f}ms "
+            f"p99={percentile(ms, 99):.1f}ms max={max(ms, default=0):.1f}ms")
+
+def write_csv(path: str, source_csv: str, rows: int):
+    texts = load_corpus(source_csv, 1)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["text"])
+        for i in range(rows):
+            # Suffix keeps rows distinct so preprocessing does real work too
+            writer.writerow([f"{texts[i % len(texts)]} #{i}"])
+
+async def poll(client, url: str, rate: float, done, latencies: list, errors: list):
+    """
+    Issues GET `url` at a fixed rate until `done()` is true. Requests are
+    fired on schedule, not after the previous one returns, so a stalled
+    event loop shows up as latency instead of as fewer samples.
+    """
+    async def one():
+        started = time.perf_counter()
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors.append(1)
+
+    tasks = []
+    while not done():
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+
+async def run_load(base_url: str, csv_path: str, args):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        # 1. Baseline: dashboard polling with nothing else going on
+        idle, idle_errors = [], []
+        deadline = time.perf_counter() + args.idle_seconds
+        await poll(client, "/analytics/summary", args.rate, lambda: time.perf_counter() > deadline, idle, idle_errors)
+        print(f"Idle        : {summarize(idle, len(idle_errors))}")
+
+        # 2. Same polling while a large CSV upload is ingested
+        async def upload():
+            with open(csv_path, "rb") as f:
+                response = await client.post("/ingest/csv", params={"chunksize": args.chunksize},
+                                             files={"file": ("bench.csv", f, "text/csv")})
+            return response.json()
+
+        busy, busy_errors = [], []
+        started = time.perf_counter()
+        ingest = asyncio.create_task(upload())
+        await poll(client, "/analytics/summary", args.rate, ingest.done, busy, busy_errors)
+        job = ingest.result()
+        elapsed = time.perf_counter() - started
+        print(f"During CSV  : {summarize(busy, len(busy_errors))}")
+        print(f"Ingest      : {job.get('records_added', job)} rows in {elapsed:.2f}s "
+              f"({job.get('rows_per_sec', 0):,.0f} rows/sec, {job.get('chunks_done', 0)} chunks)")
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="signalyze-bench-")
+    if not args.database_url:
+        db_path = os.path.join(workdir, "bench.db")
+        # WAL lets dashboard reads proceed while the ingest holds the write lock
+        sqlite3.connect(db_path).execute("PRAGMA journal_mode=WAL").close()
+        args.database_url = f"sqlite:///{db_path}"
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ.setdefault("TRANSLATION_BACKEND", "none")
+
+    csv_path = os.path.join(workdir, "ingest.csv")
+    write_csv(csv_path, args.csv, args.rows)
+
+    # Import the app only after DATABASE_URL points at the benchmark database
+    import openai_service
+    from fake_openai import FakeAsyncOpenAI
+    openai_service.client = FakeAsyncOpenAI(latency=args.llm_latency)
+    from main import app
+
+    port = free_port()
+    server = start_server(app, port)
+    print(f"Database    : {args.database_url}")
+    print(f"CSV         : {args.rows} rows, chunksize {args.chunksize}; polling /analytics/summary at {args.rate}/s")
+    asyncio.run(run_load(f"http://127.0.0.1:{port}", csv_path, args))
+    server.should_exit = True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="p99 latency of /analytics/summary while a large CSV is being ingested")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="source of feedback texts for the generated upload")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunksize", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=20, help="dashboard requests per second")
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="latency of the fake OpenAI client used by the background pipeline")
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file (WAL)")
+    run(parser.parse_args())
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import argparse
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from langdetect import detect
+from utils import LanguageDetector, clean_texts
+from bench_clean_text import DEFAULT_CSV, load_corpus
+
+# A few non-English samples so the script fast path is exercised too
+EXTRA_SAMPLES = [
+    "क्या बढ़िया स्कूटर है, रेंज भी अच्छी है",
+    "ஸ்கூட்டர் மிகவும் நன்றாக உள்ளது",
+    "Battery bahut jaldi khatam ho jati hai yaar",
+    "first!",
+    "Range dropped after the last OTA update, very disappointed with Ather service.",
+]
+
+def legacy_detect_language(text: str) -> str:
+    # The original per-item implementation, kept here as the baseline
+    try:
+        if not text or len(text) < 3: return "unknown"
+        return detect(text)
+    except:
+        return "unknown"
+
+def run(path: str, repeat: int, limit: int, processes: int, batch_size: int):
+    unique = clean_texts(load_corpus(path, 1)[:limit]) + EXTRA_SAMPLES
+    texts = unique * repeat
+
+    started = time.perf_counter()
+    legacy = [legacy_detect_language(t) for t in texts]
+    legacy_sec = time.perf_counter() - started
+
+    print(f"Texts: {len(texts)} ({len(unique)} unique x {repeat})")
+    print(f"Legacy detect_language : {len(texts) / legacy_sec:,.0f} texts/sec ({legacy_sec:.3f}s)")
+
+    configs = [
+        ("langdetect, cache only", dict(backend="langdetect", fast_path=False)),
+        ("langdetect, fast path + cache", dict(backend="langdetect")),
+        ("script backend", dict(backend="script")),
+    ]
+    if processes > 1:
+        configs.append((f"langdetect, {processes} processes", dict(backend="langdetect", fast_path=False, processes=processes, pool_threshold=1)))
+
+    # langdetect is unreliable on short strings, so agreement is also reported
+    # for texts long enough to bypass the ASCII fast path
+    long_idx = [i for i, t in enumerate(texts) if len(t) > 64]
+    for label, kwargs in configs:
+        detector = LanguageDetector(**kwargs)
+        started = time.perf_counter()
+        result = []
+        # Same batch shape as the preprocessing stage, so the cache spans batches
+        for i in range(0, len(texts), batch_size):
+            result.extend(detector.detect_many(texts[i:i + batch_size]))
+        elapsed = time.perf_counter() - started
+        detector.close()
+        agreement = sum(1 for a, b in zip(legacy, result) if a == b) / len(texts)
+        long_agreement = sum(1 for i in long_idx if legacy[i] == result[i]) / max(1, len(long_idx))
+        print(f"{label:<31}: {len(texts) / elapsed:,.0f} texts/sec ({elapsed:.3f}s), "
+              f"{legacy_sec / elapsed:.1f}x, agreement {agreement:.1%} (long texts {long_agreement:.1%}), "
+              f"cache hit rate {detector.cache.stats()['hit_rate']:.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark detect_language against the batched LanguageDetector")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=2000, help="unique texts taken from the CSV")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    run(args.csv, args.repeat, args.limit, args.processes, args.batch_size)
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import threading
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(benchmarks_dir)
+for path in (backend_dir, benchmarks_dir):
+    if path not in sys.path:
+        sys.path.append(path)
+
+import uvicorn
+from openai import AsyncOpenAI
+import openai_service
+from openai_scheduler import OpenAIScheduler
+from fake_openai_server import create_app
+from bench_clean_text import DEFAULT_CSV, load_corpus
+
+def start_server(app, port: int):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def run_unscheduled(client, texts):
+    """
+    The old behaviour: fire everything at once, no retries.
+    """
+    async def call(text):
+        try:
+            await client.chat.completions.create(model="fake", messages=[{"role": "user", "content": f"Customer feedback:\n{text}"}])
+            return True
+        except Exception:
+            return False
+    return sum(await asyncio.gather(*[call(t) for t in texts]))
+
+async def run_scheduled(scheduler, texts):
+    samples = []
+
+    async def sample():
+        while True:
+            samples.append(scheduler.stats())
+            await asyncio.sleep(0.25)
+
+    sampler = asyncio.create_task(sample())
+    results = await asyncio.gather(*[openai_service.analyze_feedback(t) for t in texts])
+    sampler.cancel()
+    return sum(1 for r in results if r), samples
+
+def run(args):
+    texts = [t for t in load_corpus(args.csv, 1) if len(t) > 20][:args.items]
+    app = create_app(latency=args.latency, rate_limit_rate=args.rate_limit_rate,
+                     rpm_limit=args.server_rpm, retry_after=args.retry_after)
+    port = free_port()
+    server = start_server(app, port)
+    client = AsyncOpenAI(base_url=f"http://127.0.0.1:{port}/v1", api_key="fake", max_retries=0)
+
+    started = time.perf_counter()
+    ok = asyncio.run(run_unscheduled(client, texts))
+    print(f"Unscheduled : {ok}/{len(texts)} succeeded in {time.perf_counter() - started:.2f}s "
+          f"(server: {app.state.stats})")
+
+    app.state.stats.update({"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0})
+    scheduler = OpenAIScheduler(rpm=args.rpm, tpm=args.tpm, max_concurrency=args.max_concurrency,
+                                backoff_base=0.2, backoff_max=5)
+
+    async def scheduled():
+        # Fresh client inside this event loop
+        openai_service.client = AsyncOpenAI(base_url=f"http://127.0.0.1:{port}/v1", api_key="fake", max_retries=0)
+        openai_service.SCHEDULER = scheduler
+        return await run_scheduled(scheduler, texts)
+
+    started = time.perf_counter()
+    ok, samples = asyncio.run(scheduled())
+    elapsed = time.perf_counter() - started
+    print(f"Scheduled   : {ok}/{len(texts)} succeeded in {elapsed:.2f}s (server: {app.state.stats})")
+    print(f"Scheduler   : {scheduler.stats()}")
+    if samples:
+        print(f"Peak in-flight {max(s['in_flight'] for s in samples)}, peak queued {max(s['queued'] for s in samples)}, "
+              f"min concurrency limit {min(s['concurrency_limit'] for s in samples)}")
+    server.should_exit = True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run classification calls through the OpenAI scheduler against a fake server injecting 429s")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.1, help="share of random 429s")
+    parser.add_argument("--server-rpm", type=int, default=600, help="server-side requests/min before 429s")
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--rpm", type=int, default=0, help="client-side requests/min budget")
+    parser.add_argument("--tpm", type=int, default=0, help="client-side tokens/min budget")
+    parser.add_argument("--max-concurrency", type=int, default=20)
+    run(parser.parse_args())
@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import argparse
+import platform
+import tempfile
+import subprocess
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(benchmarks_dir)
+for path in (backend_dir, benchmarks_dir):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from bench_clean_text import DEFAULT_CSV
+from bench_dashboard_under_ingest import percentile, write_csv
+
+DASHBOARD_ENDPOINTS = [
+    "/analytics/summary",
+    "/analytics/charts",
+    "/insights/summary",
+    "/insights/dispositions",
+    "/classified-feedback?limit=50",
+    "/classified-feedback?limit=50&sentiment=Negative",
+    "/insights/company/Ather",
+]
+EXPORT_FORMATS = ["ndjson", "csv", "parquet"]
+
+# Metric name suffixes and which direction is better, for --compare
+HIGHER_IS_BETTER = ("per_sec",)
+LOWER_IS_BETTER = ("_ms",)
+
+def latency_summary(latencies) -> dict:
+    ms = [v * 1000 for v in latencies]
+    return {
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms, default=0), 3),
+    }
+
+def throughput(items: int, seconds: float, unit: str = "rows") -> dict:
+    return {unit: items, "seconds": round(seconds, 4), f"{unit}_per_sec": round(items / seconds, 2) if seconds > 0 else 0}
+
+async def bench_ingest(db, csv_path: str, chunksize: int) -> dict:
+    from pipelines.ingestion import ingest_csv_stream
+    started = time.perf_counter()
+    with open(csv_path, "rb") as f:
+        job = await ingest_csv_stream(db, f, "bench.csv", chunksize=chunksize)
+    result = throughput(job["records_added"], time.perf_counter() - started)
+    result.update(latency_summary([chunk["seconds"] for chunk in job["chunks"]]))
+    return result
+
+async def bench_preprocess(db, batch_size: int) -> dict:
+    from pipelines.preprocessing import preprocess_raw_batch
+    batches, rows = [], 0
+    started = time.perf_counter()
+    while True:
+        batch_started = time.perf_counter()
+        stats = await preprocess_raw_batch(db, batch_size=batch_size, worker_id="bench")
+        if not stats["fetched"]:
+            break
+        batches.append(time.perf_counter() - batch_started)
+        rows += stats["fetched"]
+    result = throughput(rows, time.perf_counter() - started)
+    result.update(latency_summary(batches))
+    return result
+
+async def bench_classify(db, batch_size: int, limit: int) -> dict:
+    import openai_service
+    from classification_service import run_classification_pipeline
+    batches, items, empty = [], 0, 0
+    started = time.perf_counter()
+    while items < limit:
+        batch_started = time.perf_counter()
+        classified = await run_classification_pipeline(db, batch_size=min(batch_size, limit - items), worker_id="bench")
+        if not classified:
+            # Failed items stay leased; stop once nothing else can be claimed
+            empty += 1
+            if empty >= 3:
+                break
+            continue
+        batches.append(time.perf_counter() - batch_started)
+        items += classified
+    result = throughput(items, time.perf_counter() - started, unit="items")
+    result.update(latency_summary(batches))
+    client = openai_service.client
+    result.update({"llm_requests": client.requests, "prompt_tokens": client.prompt_tokens,
+                   "completion_tokens": client.completion_tokens})
+    return result
+
+def bench_dashboard(requests: int) -> dict:
+    from fastapi.testclient import TestClient
+    from main import app
+    # No `with`: the lifespan (and its background pipeline) stays off
+    client = TestClient(app)
+    results = {}
+    for endpoint in DASHBOARD_ENDPOINTS:
+        client.get(endpoint).raise_for_status()
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            client.get(endpoint).raise_for_status()
+            latencies.append(time.perf_counter() - request_started)
+        results[endpoint] = throughput(requests, time.perf_counter() - started, unit="requests")
+        results[endpoint].update(latency_summary(latencies))
+    return results
+
+def bench_export(batch_rows: int) -> dict:
+    import exporter
+    import models
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        rows = db.query(models.ClassifiedInsight).count()
+    finally:
+        db.close()
+    results = {}
+    for format in EXPORT_FORMATS:
+        try:
+            exporter.check_format(format)
+        except ValueError as e:
+            results[format] = {"skipped": str(e)}
+            continue
+        size, first_chunk = 0, None
+        started = time.perf_counter()
+        for chunk in exporter.export_stream(format=format, batch_rows=batch_rows):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - started
+            size += len(chunk)
+        results[format] = throughput(rows, time.perf_counter() - started)
+        results[format].update({"bytes": size, "first_chunk_ms": round((first_chunk or 0) * 1000, 3)})
+    return results
+
+def run_single(args) -> dict:
+    """
+    All stages against one fresh database of `args.rows[0]` rows. Runs in
+    its own process, since the engine is bound to DATABASE_URL at import.
+    """
+    workdir = tempfile.mkdtemp(prefix="signalyze-bench-")
+    if not args.database_url:
+        db_path = os.path.join(workdir, "bench.db")
+        sqlite3.connect(db_path).execute("PRAGMA journal_mode=WAL").close()
+        args.database_url = f"sqlite:///{db_path}"
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["TRANSLATION_BACKEND"] = args.translation
+    # Dashboards are measured against the database, not the response cache
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    csv_path = os.path.join(workdir, "ingest.csv")
+    write_csv(csv_path, args.csv, args.rows[0])
+
+    import openai_service
+    from fake_openai import FakeAsyncOpenAI
+    openai_service.client = FakeAsyncOpenAI(latency=args.llm_latency, failure_rate=args.llm_failure_rate, seed=args.seed)
+    from database import SessionLocal, engine
+    from migrate import upgrade_database
+    upgrade_database()
+
+    db = SessionLocal()
+    try:
+        report = {}
+        report["ingest"] = asyncio.run(bench_ingest(db, csv_path, args.chunksize))
+        print(f"  ingest     : {report['ingest']['rows_per_sec']:,.0f} rows/sec")
+        report["preprocess"] = asyncio.run(bench_preprocess(db, args.preprocess_batch))
+        print(f"  preprocess : {report['preprocess']['rows_per_sec']:,.0f} rows/sec")
+        report["classify"] = asyncio.run(bench_classify(db, args.classify_batch, args.classify_limit))
+        print(f"  classify   : {report['classify']['items_per_sec']:,.0f} items/sec "
+              f"({report['classify']['items']} items, {report['classify']['llm_requests']} LLM requests)")
+    finally:
+        db.close()
+    report["dashboard"] = bench_dashboard(args.dashboard_requests)
+    for endpoint, result in report["dashboard"].items():
+        print(f"  {endpoint:<48}: p50 {result['p50_ms']:.1f}ms p95 {result['p95_ms']:.1f}ms")
+    report["export"] = bench_export(args.export_batch)
+    for format, result in report["export"].items():
+        if "skipped" not in result:
+            print(f"  export {format:<8}: {result['rows_per_sec']:,.0f} rows/sec, first chunk {result['first_chunk_ms']:.1f}ms")
+    report["database"] = engine.dialect.name
+    return report
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=backend_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=backend_dir,
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+def flatten(report: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list:
+    """
+    Prints every throughput / latency metric present in both reports and
+    returns the ones that got worse by more than `tolerance` (a fraction).
+    """
+    old, new = flatten(baseline["runs"]), flatten(current["runs"])
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('created_at')}):")
+    old_settings, new_settings = baseline["meta"].get("settings", {}), current["meta"].get("settings", {})
+    differing = sorted(k for k in set(old_settings) | set(new_settings) if old_settings.get(k) != new_settings.get(k))
+    if differing:
+        print(f"  note: settings differ ({', '.join(differing)}), numbers may not be comparable")
+    for name in sorted(set(old) & set(new)):
+        if name.endswith(HIGHER_IS_BETTER):
+            higher_is_better = True
+        elif name.endswith(LOWER_IS_BETTER):
+            higher_is_better = False
+        else:
+            continue
+        if not old[name]:
+            continue
+        change = (new[name] - old[name]) / old[name]
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<72} {old[name]:>12,.2f} -> {new[name]:>12,.2f} ({change:+.1%}){flag}")
+    return regressions
+
+def child_command(args, rows: int, output: str) -> list:
+    command = [sys.executable, os.path.abspath(__file__), "--rows", str(rows), "--child-output", output,
+               "--csv", args.csv, "--chunksize", str(args.chunksize),
+               "--preprocess-batch", str(args.preprocess_batch), "--classify-batch", str(args.classify_batch),
+               "--classify-limit", str(args.classify_limit), "--dashboard-requests", str(args.dashboard_requests),
+               "--export-batch", str(args.export_batch), "--llm-latency", str(args.llm_latency),
+               "--llm-failure-rate", str(args.llm_failure_rate), "--seed", str(args.seed),
+               "--translation", args.translation]
+    if args.database_url:
+        command += ["--database-url", args.database_url]
+    return command
+
+def run(args) -> int:
+    if args.child_output:
+        with open(args.child_output, "w") as f:
+            json.dump(run_single(args), f)
+        return 0
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "child_output", "database_url")},
+        },
+        "runs": {}
+    }
+    for rows in args.rows:
+        print(f"{rows:,} rows:")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as part:
+            part_path = part.name
+        try:
+            subprocess.run(child_command(args, rows, part_path), check=True)
+            with open(part_path) as f:
+                report["runs"][str(rows)] = json.load(f)
+        finally:
+            os.remove(part_path)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark (ingest, preprocess, classify, dashboards, export) "
+                                                 "with a fake LLM, on seeded data at one or more sizes")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000],
+                        help="database sizes to benchmark, each in a fresh database (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument("--csv", default=DEFAULT_CSV, help="source of feedback texts, repeated to the requested size")
+    parser.add_argument("--output", default="bench_pipeline.json", help="JSON report")
+    parser.add_argument("--compare", default=None, help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative slowdown reported as a regression")
+    parser.add_argument("--chunksize", type=int, default=5000, help="CSV ingest chunk size")
+    parser.add_argument("--preprocess-batch", type=int, default=500)
+    parser.add_argument("--classify-batch", type=int, default=20)
+    parser.add_argument("--classify-limit", type=int, default=2000, help="max items classified per size (the fake LLM still sleeps)")
+    parser.add_argument("--dashboard-requests", type=int, default=20, help="requests per dashboard endpoint")
+    parser.add_argument("--export-batch", type=int, default=5000)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake OpenAI base latency in seconds")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="share of fake OpenAI requests that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--translation", choices=["none", "fake"], default="none", help="translation backend")
+    parser.add_argument("--database-url", default=None,
+                        help="empty database to use instead of a fresh SQLite file (one --rows value only)")
+    parser.add_argument("--child-output", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.database_url and len(args.rows) > 1 and not args.child_output:
+        parser.error("--database-url takes a single --rows value")
+    sys.exit(run(args))
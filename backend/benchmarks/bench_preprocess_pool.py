@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import preprocess_pool
+from preprocess_pool import PreprocessPool, clean_and_hash, detect_chunk
+from bench_clean_text import DEFAULT_CSV, load_corpus
+
+def make_texts(path: str, rows: int, tag: str) -> list:
+    # Unique per run, so no language-detection cache (parent or worker) hits
+    corpus = load_corpus(path, 1)
+    return [f"{corpus[i % len(corpus)]} {tag}{i}" for i in range(rows)]
+
+def preprocess(pool: PreprocessPool, texts) -> list:
+    # The CPU-bound half of preprocess_raw_batch (no DB, no translation)
+    prepared = pool.map(clean_and_hash, texts)
+    languages = pool.map(detect_chunk, prepared)
+    return [(cleaned, t_hash, lang) for (cleaned, t_hash), lang in zip(prepared, languages)]
+
+def bench_throughput(texts, processes: int, chunk_size: int):
+    pool = PreprocessPool(processes=processes, chunk_size=chunk_size, threshold=1)
+    try:
+        # Worker start-up is a one-off cost, not part of steady-state throughput
+        pool.start()
+        started = time.perf_counter()
+        out = preprocess(pool, texts)
+        return out, time.perf_counter() - started
+    finally:
+        pool.close()
+
+async def _ticker(lags: list, interval: float, stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+async def _loop_stall(mode: str, texts, processes: int, chunk_size: int, interval: float) -> dict:
+    """
+    How long the event loop stalls while a batch is preprocessed:
+    inline (on the loop, like detect_language in process_raw_item used to),
+    threadpool (processes=1) or the process pool.
+    """
+    pool = PreprocessPool(processes=processes if mode == "pool" else 1, chunk_size=chunk_size, threshold=1)
+    pool.start()
+    lags, stop = [], asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, interval, stop))
+    await asyncio.sleep(interval * 2)
+    started = time.perf_counter()
+    try:
+        if mode == "inline":
+            detect_chunk(clean_and_hash(texts))
+        else:
+            await pool.map_async(detect_chunk, await pool.map_async(clean_and_hash, texts))
+        elapsed = time.perf_counter() - started
+    finally:
+        stop.set()
+        await ticker
+        pool.close()
+    lags.sort()
+    return {"mode": mode, "seconds": elapsed, "ticks": len(lags),
+            "max_lag_ms": lags[-1] * 1000 if lags else 0,
+            "p99_lag_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0}
+
+def run(path: str, rows: int, process_counts, chunk_size: int, loop_rows: int, interval: float):
+    print(f"Cores: {os.cpu_count()}, rows: {rows}, chunk size: {chunk_size}")
+    baseline_out, baseline_sec = None, None
+    ok = True
+    for processes in process_counts:
+        texts = make_texts(path, rows, f"p{processes}-")
+        out, sec = bench_throughput(texts, processes, chunk_size)
+        # Same rows apart from the tag: languages must match the first run
+        langs = [lang for _, _, lang in out]
+        if baseline_out is None:
+            baseline_out, baseline_sec = langs, sec
+        elif langs != baseline_out:
+            ok = False
+        speedup = baseline_sec / sec if sec else 0
+        print(f"{processes:>2} process(es): {rows / sec:>9,.0f} items/sec ({sec:.2f}s, {speedup:.2f}x vs first)")
+
+    print(f"\nEvent-loop stall while preprocessing {loop_rows} rows (ticker every {interval * 1000:.0f} ms):")
+    pool_processes = max(process_counts)
+    for mode in ("inline", "threadpool", "pool"):
+        texts = make_texts(path, loop_rows, f"{mode}-")
+        result = asyncio.run(_loop_stall(mode, texts, pool_processes, chunk_size, interval))
+        print(f"  {mode:<10}: {result['seconds']:.2f}s, max lag {result['max_lag_ms']:.1f} ms, "
+              f"p99 lag {result['p99_lag_ms']:.1f} ms over {result['ticks']} ticks")
+    print(f"\nSame languages across process counts: {'yes' if ok else 'NO'}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocessing throughput: single core vs the process pool, and event-loop stall")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({1, 2, preprocess_pool.PREPROCESS_PROCESSES}))
+    parser.add_argument("--chunk-size", type=int, default=preprocess_pool.PREPROCESS_CHUNK_SIZE)
+    parser.add_argument("--loop-rows", type=int, default=5000)
+    parser.add_argument("--tick-interval", type=float, default=0.005)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.csv, args.rows, args.processes, args.chunk_size, args.loop_rows, args.tick_interval) else 1)
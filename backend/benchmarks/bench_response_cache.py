@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(benchmarks_dir)
+for path in (backend_dir, benchmarks_dir):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from bench_clean_text import DEFAULT_CSV, load_corpus
+from bench_dashboard_under_ingest import percentile
+
+ENDPOINTS = ["/analytics/summary", "/analytics/charts", "/insights/summary", "/classified-feedback"]
+
+def seed(db, texts):
+    """
+    Pushes `texts` through ingest -> preprocess -> classify with the fake LLM.
+    """
+    from pipelines.ingestion import ingest_raw_batch
+    from pipelines.preprocessing import preprocess_raw_batch
+    from classification_service import run_classification_pipeline
+
+    async def go():
+        await ingest_raw_batch(db, texts, source="bench")
+        while (await preprocess_raw_batch(db, batch_size=2000))["fetched"]:
+            pass
+        while await run_classification_pipeline(db, batch_size=200):
+            pass
+    asyncio.run(go())
+
+def run_mode(client, db, args, label: str):
+    """
+    Dashboard-like traffic: endpoints in rotation, the browser revalidating
+    with its last ETag, and an ingest (which invalidates) every
+    `invalidate_every` requests.
+    """
+    from pipelines.ingestion import ingest_raw_batch
+    import response_cache
+    rng = random.Random(0)
+    etags = {}
+    latencies = []
+    statuses = {200: 0, 304: 0}
+    for i in range(args.requests):
+        if args.invalidate_every and i and i % args.invalidate_every == 0:
+            asyncio.run(ingest_raw_batch(db, [f"bench invalidation {label} {i}"], source="bench"))
+        path = ENDPOINTS[rng.randrange(len(ENDPOINTS))]
+        headers = {"If-None-Match": etags[path]} if path in etags else {}
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.headers.get("etag"):
+            etags[path] = response.headers["etag"]
+    stats = response_cache.CACHE.stats()
+    print(f"{label:<14} p50={percentile(latencies, 50):6.2f}ms p95={percentile(latencies, 95):6.2f}ms "
+          f"200s={statuses.get(200, 0):<5} 304s={statuses.get(304, 0):<5} hit_rate={stats['hit_rate']:.2%}")
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="signalyze-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ.setdefault("TRANSLATION_BACKEND", "none")
+
+    import openai_service
+    from fake_openai import FakeAsyncOpenAI
+    from fake_redis import FakeRedis
+    openai_service.client = FakeAsyncOpenAI(latency=0)
+    import response_cache
+    from fastapi.testclient import TestClient
+    from database import SessionLocal
+    from main import app
+
+    db = SessionLocal()
+    texts = [f"{t} #{i}" for i, t in enumerate(load_corpus(args.csv, 1)[:args.rows])]
+    seed(db, texts)
+    print(f"Seeded {len(texts)} feedback rows; {args.requests} requests, ingest every {args.invalidate_every}")
+
+    backends = [
+        ("no cache", None),
+        ("memory", response_cache.MemoryCacheBackend()),
+        ("redis (fake)", response_cache.RedisCacheBackend(client=FakeRedis())),
+    ]
+    # The background pipeline is not started: TestClient is used without its context manager
+    client = TestClient(app)
+    for label, backend in backends:
+        response_cache.CACHE = response_cache.ResponseCache(backend, enabled=backend is not None)
+        run_mode(client, db, args, label)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dashboard endpoint latency with and without the response cache")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--invalidate-every", type=int, default=200)
+    run(parser.parse_args())
@@ -0,0 +1,100 @@
+import re
+import json
+import random
+import asyncio
+from types import SimpleNamespace
+import httpx
+from openai import RateLimitError
+from utils import estimate_tokens
+
+def fake_classify(text: str) -> dict:
+    """
+    Deterministic stand-in for the taxonomy classification of one text.
+    """
+    lower = text.lower()
+    if any(word in lower for word in ("bad", "poor", "worst", "disappoint", "issue", "problem")):
+        sentiment = "Negative"
+    elif any(word in lower for word in ("good", "great", "love", "amazing", "best")):
+        sentiment = "Positive"
+    else:
+        sentiment = "Neutral"
+    model = re.search(r'\b(450x|450s|rizta|s1 pro|iqube|chetak)\b', lower)
+    return {
+        "item_type": "Comment",
+        "product_category": "Electric Vehicle" if "ather" in lower or model else None,
+        "product_subcategory": "Scooter" if model else None,
+        "make_brand": "Ather" if "ather" in lower else None,
+        "model": model.group(1).upper() if model else None,
+        "variant": None, "color": None, "size_capacity": None, "configuration": None,
+        "release_year": None, "price_band": None, "market_segment": None,
+        "verified_purchase": None, "purchase_channel": None, "purchase_region": None,
+        "usage_duration_bucket": None, "ownership_stage": None,
+        "disposition_1": "Range" if "range" in lower else ("Battery" if "battery" in lower else None),
+        "disposition_2": None, "disposition_3": None, "disposition_4": None,
+        "disposition_5": sentiment,
+        "sentiment": sentiment
+    }
+
+def fake_completion(messages, rng: random.Random, drop_rate: float = 0.0):
+    """
+    Builds the JSON content a real model would return for a classification
+    prompt (single or multi-item). Returns (content, prompt_tokens, completion_tokens).
+    """
+    prompt = messages[-1]["content"]
+    if "Customer feedback items:" in prompt:
+        items = json.loads(prompt.split("Customer feedback items:\n", 1)[1])
+        results = [dict(fake_classify(item["text"]), id=item["id"])
+                   for item in items if rng.random() >= drop_rate]
+        content = json.dumps({"results": results})
+    else:
+        content = json.dumps(fake_classify(prompt.split("Customer feedback:\n", 1)[-1]))
+    return content, sum(estimate_tokens(m["content"]) for m in messages), estimate_tokens(content)
+
+class FakeChatCompletions:
+    def __init__(self, owner):
+        self.owner = owner
+
+    async def create(self, model=None, messages=None, **kwargs):
+        owner = self.owner
+        owner.requests += 1
+        if owner.throttle_rate and owner.rng.random() < owner.throttle_rate:
+            # Rejected before any work, like the real API's 429
+            owner.throttled += 1
+            request = httpx.Request("POST", "https://fake-openai.local/v1/chat/completions")
+            raise RateLimitError("fake OpenAI rate limit", response=httpx.Response(429, request=request), body=None)
+        content, prompt_tokens, completion_tokens = fake_completion(messages, owner.rng, owner.drop_rate)
+        owner.prompt_tokens += prompt_tokens
+        owner.completion_tokens += completion_tokens
+
+        # Latency grows with the number of generated tokens, like a real model
+        await asyncio.sleep(owner.latency + completion_tokens * owner.latency_per_token)
+        if owner.rng.random() < owner.failure_rate:
+            raise RuntimeError("fake OpenAI failure")
+
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                  total_tokens=prompt_tokens + completion_tokens)
+        )
+
+class FakeAsyncOpenAI:
+    """
+    In-process replacement for AsyncOpenAI's chat.completions.create.
+    - latency / latency_per_token: simulated response time
+    - failure_rate: share of requests that raise
+    - drop_rate: share of items silently left out of multi-item responses
+    - throttle_rate: share of requests rejected with a 429 (RateLimitError)
+    """
+    def __init__(self, latency: float = 0.05, latency_per_token: float = 0.0002,
+                 failure_rate: float = 0.0, drop_rate: float = 0.0, throttle_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.latency_per_token = latency_per_token
+        self.failure_rate = failure_rate
+        self.drop_rate = drop_rate
+        self.throttle_rate = throttle_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.throttled = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(self))
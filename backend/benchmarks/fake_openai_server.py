@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import deque
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(benchmarks_dir)
+for path in (backend_dir, benchmarks_dir):
+    if path not in sys.path:
+        sys.path.append(path)
+
+from fake_openai import fake_completion
+
+def create_app(latency: float = 0.2, latency_per_token: float = 0.0005, error_rate: float = 0.0,
+               rate_limit_rate: float = 0.0, rpm_limit: int = 0, retry_after: float = 1.0, seed: int = 0):
+    """
+    Local stand-in for the OpenAI chat completions endpoint. Point the SDK at
+    it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+    - latency / latency_per_token: simulated model time
+    - rate_limit_rate: share of requests answered with a random 429
+    - rpm_limit: sliding one-minute request limit enforced with 429s
+    - error_rate: share of requests answered with a 500
+    """
+    app = FastAPI(title="Fake OpenAI")
+    rng = random.Random(seed)
+    recent = deque()
+    app.state.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0}
+
+    def error(status: int, message: str, headers=None):
+        return JSONResponse(status_code=status, headers=headers or {},
+                            content={"error": {"message": message, "type": "fake_error", "code": status}})
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats = app.state.stats
+        stats["requests"] += 1
+
+        now = time.monotonic()
+        while recent and now - recent[0] > 60:
+            recent.popleft()
+        if (rpm_limit and len(recent) >= rpm_limit) or rng.random() < rate_limit_rate:
+            stats["rate_limited"] += 1
+            return error(429, "Rate limit reached", headers={"retry-after": str(retry_after)})
+        recent.append(now)
+
+        content, prompt_tokens, completion_tokens = fake_completion(body["messages"], rng)
+        await asyncio.sleep(latency + completion_tokens * latency_per_token)
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return error(500, "Internal server error")
+
+        stats["ok"] += 1
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return app.state.stats
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Fake OpenAI server that injects latency and 429s")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--latency-per-token", type=float, default=0.0005)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.1)
+    parser.add_argument("--rpm-limit", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.latency_per_token, args.error_rate,
+                           args.rate_limit_rate, args.rpm_limit, args.retry_after),
+                host="127.0.0.1", port=args.port)
@@ -0,0 +1,49 @@
+import time
+import fnmatch
+import threading
+
+class FakeRedis:
+    """
+    In-process stand-in for the redis client methods used by
+    response_cache.RedisCacheBackend (get, set with ex=, incr, scan_iter).
+    """
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _live(self, name):
+        item = self.data.get(name)
+        if item is not None and item[1] is not None and item[1] < time.monotonic():
+            del self.data[name]
+            return None
+        return item
+
+    def get(self, name):
+        with self.lock:
+            self.calls += 1
+            item = self._live(name)
+            return item[0] if item else None
+
+    def set(self, name, value, ex=None):
+        with self.lock:
+            self.calls += 1
+            value = value.encode("utf-8") if isinstance(value, str) else value
+            self.data[name] = (value, time.monotonic() + ex if ex else None)
+            return True
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.calls += 1
+            item = self._live(name)
+            value = int(item[0]) + amount if item else amount
+            self.data[name] = (str(value).encode("utf-8"), item[1] if item else None)
+            return value
+
+    def scan_iter(self, match=None):
+        with self.lock:
+            self.calls += 1
+            names = [name for name in list(self.data) if self._live(name)]
+        for name in names:
+            if match is None or fnmatch.fnmatchcase(name, match):
+                yield name.encode("utf-8")
@@ -0,0 +1,55 @@
+import os
+import re
+import json
+from sqlalchemy.orm import Session
+import rollups
+
+# Canonical brand -> other names the model or users write for it.
+# Extend with a JSON file of the same shape via BRAND_ALIASES_FILE.
+BRAND_ALIASES = {
+    "Ather": ["Ather Energy", "Ather Energy Ltd", "AtherEnergy"],
+}
+BRAND_ALIASES_FILE = os.getenv("BRAND_ALIASES_FILE")
+if BRAND_ALIASES_FILE:
+    with open(BRAND_ALIASES_FILE, encoding="utf-8") as f:
+        for canonical, aliases in json.load(f).items():
+            BRAND_ALIASES.setdefault(canonical, []).extend(aliases)
+
+# Legal-form words that never distinguish two brands
+_LEGAL_SUFFIXES = {"ltd", "limited", "pvt", "private", "inc", "llc", "plc", "corp", "corporation"}
+
+def _normalize(name: str) -> str:
+    words = re.findall(r"[a-z0-9]+", name.lower())
+    while len(words) > 1 and words[-1] in _LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+_ALIAS_KEYS = {
+    _normalize(name): _normalize(canonical)
+    for canonical, aliases in BRAND_ALIASES.items()
+    for name in [canonical] + aliases
+}
+
+def brand_key(name: str) -> str:
+    """
+    Case, punctuation and legal-suffix insensitive identity of a brand,
+    with aliases mapped onto their canonical brand.
+    """
+    normalized = _normalize(name)
+    return _ALIAS_KEYS.get(normalized, normalized)
+
+def brand_variants(db: Session, name: str) -> list:
+    """
+    Every lowercase make_brand value that means the same brand as `name`:
+    the name itself, its configured aliases and any stored spelling with the
+    same brand_key. Stored spellings come from the make_brand rollup, so
+    this costs one read of the rollup buckets, not a scan of the insights.
+    Matched with lower(make_brand) IN (...), which uses the functional index.
+    """
+    key = brand_key(name)
+    variants = {name.strip().lower()}
+    for canonical, aliases in BRAND_ALIASES.items():
+        if _normalize(canonical) == key:
+            variants.update(alias.lower() for alias in [canonical] + aliases)
+    variants.update(value.lower() for value in rollups.totals(db, "make_brand") if value and brand_key(value) == key)
+    return sorted(variants)
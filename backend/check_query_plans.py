@@ -0,0 +1,106 @@
+import os
+import re
+import sys
+import datetime
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from sqlalchemy import select, func, text
+import models
+import feedback_listing
+import work_queue
+from database import engine
+
+def hot_queries():
+    """
+    (name, select, index expected in the plan, tables that must not be
+    scanned in full) for the queries the pipeline and dashboards run on
+    every loop / request.
+    """
+    now = datetime.datetime.utcnow()
+    listing_fields = feedback_listing.DEFAULT_FIELDS
+    insight = models.ClassifiedInsight
+    raw = models.RawFeedback
+
+    def listing(**filters):
+        stmt, _ = feedback_listing.build_query(listing_fields, **filters)
+        return stmt.limit(51)
+
+    return [
+        ("preprocess backlog", work_queue._pending_query("preprocess")[0].limit(200),
+         "ix_raw_feedback_unprocessed_created_at", ["raw_feedback"]),
+        ("preprocess claim candidates", work_queue._candidate_query("preprocess", now, 200)[0],
+         "ix_raw_feedback_unprocessed_created_at", ["raw_feedback", "work_claims"]),
+        ("classify backlog", work_queue._pending_query("classify")[0].limit(20),
+         "ix_preprocessed_feedback_created_at", ["preprocessed_feedback", "classified_insights"]),
+        ("classify claim candidates", work_queue._candidate_query("classify", now, 20)[0],
+         "ix_preprocessed_feedback_created_at", ["preprocessed_feedback", "classified_insights", "work_claims"]),
+        ("raw -> preprocessed lookup", select(models.PreprocessedFeedback.id).where(models.PreprocessedFeedback.raw_id == "x"),
+         "ix_preprocessed_feedback_raw_id", ["preprocessed_feedback"]),
+        ("raw feedback by source, newest first", select(raw.id).where(raw.source == "csv").order_by(raw.created_at.desc()).limit(50),
+         "ix_raw_feedback_source_created_at", ["raw_feedback"]),
+        ("raw feedback time range", select(raw.id).where(raw.created_at >= now - datetime.timedelta(days=1)),
+         "ix_raw_feedback_created_at", ["raw_feedback"]),
+        ("listing first page", listing(),
+         "ix_classified_insights_created_at_id", ["classified_insights"]),
+        ("listing by sentiment", listing(sentiment="Negative"),
+         "ix_classified_insights_sentiment_created_at_id", ["classified_insights"]),
+        ("listing by category", listing(category="Electric Scooter"),
+         "ix_classified_insights_category_created_at_id", ["classified_insights"]),
+        # One spelling reads in index order; several (aliases) are one index
+        # range each, merged by a sort over that brand's rows only
+        ("listing by brand", listing(brand=["ather"]),
+         "ix_classified_insights_brand_lower_created_at_id", ["classified_insights"]),
+        ("listing by model", listing(model="450X"),
+         "ix_classified_insights_model_created_at_id", ["classified_insights"]),
+        ("GROUP BY disposition_1", select(insight.disposition_1, func.count()).group_by(insight.disposition_1),
+         "ix_classified_insights_disposition_1", []),
+    ]
+
+def explain(conn, stmt) -> str:
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "postgresql":
+        return "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+    return "\n".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+def problems(plan: str, index: str, tables: list, dialect: str) -> list:
+    found = []
+    if index not in plan:
+        found.append(f"{index} not used")
+    for table in tables:
+        if dialect == "postgresql":
+            full_scan = re.search(rf"Seq Scan on {table}\b", plan)
+        else:
+            full_scan = re.search(rf"\bSCAN {table}\b(?! USING)", plan)
+        if full_scan:
+            found.append(f"full scan of {table}")
+    if dialect != "postgresql" and "TEMP B-TREE FOR ORDER BY" in plan:
+        found.append("sorts instead of reading in index order")
+    return found
+
+def check_query_plans(verbose: bool = False) -> bool:
+    """
+    EXPLAINs every hot query and checks that it uses its index and does not
+    scan the big tables. On Postgres sequential scans are disabled for the
+    check, so small / unanalyzed tables do not hide a missing index.
+    Returns True when every query passes.
+    """
+    ok = True
+    with engine.connect() as conn:
+        dialect = conn.dialect.name
+        if dialect == "postgresql":
+            conn.execute(text("SET enable_seqscan = off"))
+        for name, stmt, index, tables in hot_queries():
+            plan = explain(conn, stmt)
+            found = problems(plan, index, tables, dialect)
+            ok = ok and not found
+            print(f"{'FAIL' if found else 'ok  '} {name}" + (f": {'; '.join(found)}" if found else ""))
+            if verbose or found:
+                print("     " + plan.replace("\n", "\n     "))
+    return ok
+
+if __name__ == "__main__":
+    passed = check_query_plans(verbose="-v" in sys.argv)
+    sys.exit(0 if passed else 1)
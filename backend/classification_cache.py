@@ -0,0 +1,161 @@
+import os
+import hashlib
+import asyncio
+from sqlalchemy.orm import Session
+import models
+import observability
+import openai_service
+from database import dialect_insert, run_db
+from near_duplicates import NEAR_DUPLICATES
+from utils import LRUCache, get_text_hash
+
+# Entries kept in the in-process tier
+CLASSIFICATION_CACHE_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", "20000"))
+# Whether the classification_cache table is used as a second tier
+CLASSIFICATION_CACHE_DB = os.getenv("CLASSIFICATION_CACHE_DB", "true").lower() in ("1", "true", "yes")
+
+def normalize_for_cache(text: str) -> str:
+    # Casing and whitespace do not change the classification
+    return " ".join(text.lower().split())
+
+class ClassificationResultCache:
+    """
+    Two-tier cache of LLM classification results keyed on
+    (normalized text hash, model, prompt version): an in-process LRU in front
+    of the classification_cache table. A new model or prompt version changes
+    every key, so stale entries are never returned; purge_stale removes them
+    from the table.
+    """
+    def __init__(self, maxsize: int = CLASSIFICATION_CACHE_SIZE, use_db: bool = CLASSIFICATION_CACHE_DB):
+        self.memory = LRUCache(maxsize)
+        self.use_db = use_db
+        self.db_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.version = None
+
+    def _current_version(self):
+        version = (openai_service.CLASSIFICATION_MODEL, openai_service.PROMPT_VERSION)
+        if version != self.version:
+            # Old in-process entries belong to another prompt/model
+            self.memory.clear()
+            self.version = version
+        return version
+
+    def key_for(self, text: str):
+        model, prompt_version = self._current_version()
+        text_hash = get_text_hash(normalize_for_cache(text))
+        return hashlib.md5(f"{text_hash}|{model}|{prompt_version}".encode("utf-8")).hexdigest(), text_hash
+
+    def get_many(self, db: Session, texts: dict) -> dict:
+        """
+        `texts` maps item id -> text. Returns item id -> cached result for hits.
+        """
+        found = {}
+        db_lookup = {}
+        for item_id, text in texts.items():
+            key, _ = self.key_for(text)
+            result = self.memory.get(key)
+            if result is not None:
+                found[item_id] = result
+            else:
+                db_lookup.setdefault(key, []).append(item_id)
+        observability.CACHE_LOOKUPS.labels("classification", "memory_hit").inc(len(found))
+
+        if db_lookup and self.use_db and db is not None:
+            rows = db.query(models.ClassificationCache.cache_key, models.ClassificationCache.result)\
+                .filter(models.ClassificationCache.cache_key.in_(list(db_lookup))).all()
+            for key, result in rows:
+                self.memory.put(key, result)
+                for item_id in db_lookup.pop(key):
+                    found[item_id] = result
+                    self.db_hits += 1
+                    observability.CACHE_LOOKUPS.labels("classification", "db_hit").inc()
+
+        missed = sum(len(ids) for ids in db_lookup.values())
+        self.misses += missed
+        observability.CACHE_LOOKUPS.labels("classification", "miss").inc(missed)
+        return found
+
+    def put_many(self, db: Session, entries):
+        """
+        Stores (text, result) pairs in both tiers. The DB rows are staged in
+        the caller's transaction.
+        """
+        model, prompt_version = self._current_version()
+        rows = {}
+        for text, result in entries:
+            if not result:
+                continue
+            key, text_hash = self.key_for(text)
+            self.memory.put(key, result)
+            rows[key] = {
+                "cache_key": key,
+                "text_hash": text_hash,
+                "model": model,
+                "prompt_version": prompt_version,
+                "result": result
+            }
+        self.stores += len(rows)
+        if rows and self.use_db and db is not None:
+            stmt = dialect_insert(db, models.ClassificationCache.__table__).on_conflict_do_nothing(index_elements=["cache_key"])
+            db.execute(stmt, list(rows.values()))
+
+    def purge_stale(self, db: Session) -> int:
+        """
+        Deletes DB entries written for another model or prompt version.
+        """
+        model, prompt_version = self._current_version()
+        deleted = db.query(models.ClassificationCache)\
+            .filter((models.ClassificationCache.prompt_version != prompt_version) | (models.ClassificationCache.model != model))\
+            .delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+    def stats(self) -> dict:
+        memory = self.memory.stats()
+        hits = memory["hits"] + self.db_hits
+        total = hits + self.misses
+        return {
+            "model": self.version[0] if self.version else openai_service.CLASSIFICATION_MODEL,
+            "prompt_version": self.version[1] if self.version else openai_service.PROMPT_VERSION,
+            "memory_hits": memory["hits"],
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0,
+            "stores": self.stores,
+            "memory_size": memory["size"]
+        }
+
+CACHE = ClassificationResultCache()
+
+async def classify_with_cache(db: Session, items, mode: str = "batch", store: bool = True) -> dict:
+    """
+    Classifies (preprocessed id, text) pairs, consulting the cache first,
+    then the near-duplicate index (see near_duplicates), and only sending
+    the rest to OpenAI. Returns {preprocessed id: result or None}.
+    store=False leaves CACHE.put_many to the caller (e.g. in the session
+    that commits the insights).
+    """
+    texts = dict(items)
+    results = await run_db(CACHE.get_many, db, texts)
+    misses = [(item_id, text) for item_id, text in texts.items() if item_id not in results]
+
+    followers = {}
+    if misses and NEAR_DUPLICATES.enabled and db is not None:
+        reused, followers = await run_db(NEAR_DUPLICATES.lookup, db, [item_id for item_id, _ in misses], list(results))
+        results.update(reused)
+        misses = [(item_id, text) for item_id, text in misses if item_id not in reused and item_id not in followers]
+
+    if misses:
+        if mode == "batch" and len(misses) > 1:
+            fresh = await openai_service.analyze_feedback_batch(misses)
+        else:
+            outputs = await asyncio.gather(*[openai_service.analyze_feedback(text) for _, text in misses])
+            fresh = {item_id: result for (item_id, _), result in zip(misses, outputs)}
+        if store:
+            await run_db(CACHE.put_many, db, [(texts[item_id], result) for item_id, result in fresh.items()])
+        results.update(fresh)
+    if followers:
+        results.update(NEAR_DUPLICATES.followed_results(results, followers))
+    return results
@@ -1,81 +1,114 @@
-import time
-import asyncio
+import os
+import logging
 from sqlalchemy.orm import Session
-from models import PreprocessedFeedback, ClassifiedInsight
-from openai_service import analyze_feedback
-from pipelines.classification import clean_val
+from models import PreprocessedFeedback
+import rollups
+import observability
+import dispositions
+import response_cache
+from database import run_db
+from classification_cache import CACHE, classify_with_cache
+from pipelines.classification import build_insight
+from work_queue import claim, release, default_worker_id
 
-async def run_classification_pipeline(db: Session, batch_size: int = 20):
+# "batch" packs several items into one OpenAI request, "single" sends one request per item
+CLASSIFY_MODE = os.getenv("CLASSIFY_MODE", "batch")
+
+logger = logging.getLogger("signalyze.pipeline")
+
+def _claim_batch(db: Session, batch_size: int, worker_id: str):
+    claimed_ids = claim(db, "classify", worker_id, batch_size)
+    if not claimed_ids:
+        return []
+    return db.query(PreprocessedFeedback).filter(PreprocessedFeedback.id.in_(claimed_ids)).all()
+
+def claim_texts(db: Session, batch_size: int, worker_id: str) -> list:
     """
-    1. Fetch unclassified preprocessed rows
-    2. Parallel processing using asyncio.gather
-    3. Bulk save results
+    Claims up to `batch_size` unclassified preprocessed rows for `worker_id`
+    (see work_queue.claim) and returns (preprocessed id, text) pairs, using
+    the translated text if available, else the cleaned text.
     """
-    # Find preprocessed items that don't have a classified insight yet
-    unprocessed = db.query(PreprocessedFeedback).outerjoin(ClassifiedInsight).filter(ClassifiedInsight.id == None).limit(batch_size).all()
-    
-    if not unprocessed:
-        return 0
+    return [(record.id, record.translated_text if record.is_translated else record.cleaned_text)
+            for record in _claim_batch(db, batch_size, worker_id)]
 
-    print(f"PIPELINE: Processing batch of {len(unprocessed)} in parallel...")
-    
-    # Create tasks for all records in the batch
-    # Use translated text if available, else cleaned text
-    tasks = [analyze_feedback(record.translated_text if record.is_translated else record.cleaned_text) for record in unprocessed]
-    
-    # Run all OpenAI calls concurrently
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+async def classify_texts(db: Session, texts, store: bool = True) -> dict:
+    """
+    Reuses cached classifications and sends the rest to OpenAI, in parallel
+    (single mode) or with multi-item requests (batch mode). `db` is only
+    read from unless `store` is set (see classify_with_cache).
+    Returns {preprocessed id: result or None}.
+    """
+    with observability.stage("classify", mode=CLASSIFY_MODE, preprocessed_ids=[item_id for item_id, _ in texts]):
+        by_id = await classify_with_cache(db, texts, mode=CLASSIFY_MODE, store=store)
+    for item_id, _ in texts:
+        if not by_id.get(item_id):
+            logger.warning("OpenAI returned nothing for %s", item_id)
+    classified = sum(1 for item_id, _ in texts if by_id.get(item_id))
+    observability.STAGE_ITEMS.labels("classify", "classified").inc(classified)
+    observability.STAGE_ITEMS.labels("classify", "failed").inc(len(texts) - classified)
+    return by_id
 
-    results_count = 0
-    for record, structured_data in zip(unprocessed, results):
-        if isinstance(structured_data, Exception):
-            print(f"ERROR: OpenAI task failed for {record.id}: {structured_data}")
-            continue
-            
-        if structured_data:
-            try:
-                # Create result entry (ClassifiedInsight)
-                new_insight = ClassifiedInsight(
-                    preprocessed_id=record.id,
-                    item_id=clean_val(structured_data.get("item_id")),
-                    item_type=clean_val(structured_data.get("item_type")),
-                    product_category=clean_val(structured_data.get("product_category")),
-                    product_subcategory=clean_val(structured_data.get("product_subcategory")),
-                    make_brand=clean_val(structured_data.get("make_brand")),
-                    model=clean_val(structured_data.get("model")),
-                    variant=clean_val(structured_data.get("variant")),
-                    color=clean_val(structured_data.get("color")),
-                    size_capacity=clean_val(structured_data.get("size_capacity")),
-                    configuration=clean_val(structured_data.get("configuration")),
-                    release_year=clean_val(structured_data.get("release_year")),
-                    price_band=clean_val(structured_data.get("price_band")),
-                    market_segment=clean_val(structured_data.get("market_segment")),
-                    verified_purchase=structured_data.get("verified_purchase", False),
-                    purchase_channel=clean_val(structured_data.get("purchase_channel")),
-                    purchase_region=clean_val(structured_data.get("purchase_region")),
-                    usage_duration_bucket=clean_val(structured_data.get("usage_duration_bucket")),
-                    ownership_stage=clean_val(structured_data.get("ownership_stage")),
-                    disposition_1=clean_val(structured_data.get("disposition_1")),
-                    disposition_2=clean_val(structured_data.get("disposition_2")),
-                    disposition_3=clean_val(structured_data.get("disposition_3")),
-                    disposition_4=clean_val(structured_data.get("disposition_4")),
-                    disposition_5=clean_val(structured_data.get("disposition_5")),
-                    sentiment=clean_val(structured_data.get("sentiment")),
-                    raw_llm_response=structured_data
-                )
-                db.add(new_insight)
-                results_count += 1
-            except Exception as e:
-                print(f"ERROR: Mapping failed for {record.id}: {e}")
-        else:
-            print(f"FAILED: OpenAI returned nothing for {record.id}")
-            
-    # Commit the entire batch at once
+def _commit_batch(db: Session, insights) -> bool:
     try:
-        db.commit()
+        with observability.stage("commit", items=len(insights)):
+            # Disposition links, dashboard counters and lease release commit
+            # together with the insights
+            canonical = dispositions.link_insights(db, insights)
+            rollups.record_insights(db, insights, canonical)
+            release(db, "classify", [insight.preprocessed_id for insight in insights])
+            db.commit()
+        observability.STAGE_ITEMS.labels("commit", "ok").inc(len(insights))
+        response_cache.invalidate()
+        return True
     except Exception as e:
-        print(f"ERROR: Batch commit failed: {e}")
+        logger.error("Batch commit failed: %s", e, exc_info=True)
+        observability.STAGE_ITEMS.labels("commit", "failed").inc(len(insights))
         db.rollback()
+        return False
+
+def persist_results(db: Session, texts, by_id: dict, store_cache: bool = False) -> int:
+    """
+    Maps results onto ClassifiedInsight rows and commits them in one
+    transaction (with the cache entries when `store_cache` is set). Items
+    without a result keep their lease and are retried once it expires.
+    Returns the number of insights stored.
+    """
+    insights = []
+    for item_id, _ in texts:
+        structured_data = by_id.get(item_id)
+        if not structured_data:
+            continue
+        try:
+            # Create result entry (ClassifiedInsight)
+            insight = build_insight(item_id, structured_data)
+            db.add(insight)
+            insights.append(insight)
+        except Exception as e:
+            logger.error("Mapping failed for %s: %s", item_id, e)
+            observability.STAGE_ITEMS.labels("classify", "mapping_error").inc()
+    if store_cache:
+        CACHE.put_many(db, [(text, by_id[item_id]) for item_id, text in texts if by_id.get(item_id)])
+
+    # Commit the entire batch at once
+    if not _commit_batch(db, insights):
         return 0
-            
-    return results_count
+    return len(insights)
+
+async def run_classification_pipeline(db: Session, batch_size: int = 20, worker_id: str = None):
+    """
+    1. Claim unclassified preprocessed rows for this worker (see work_queue.claim)
+    2. Reuse cached classifications, classify the rest (classify_texts)
+    3. Bulk save results (persist_results)
+    DB work runs in the threadpool (see database.run_db). The background
+    pipeline in the API runs the same steps as separate stages
+    (see pipeline_engine).
+    """
+    # Claim preprocessed items that don't have a classified insight yet,
+    # so concurrent workers never pick the same rows
+    texts = await run_db(claim_texts, db, batch_size, worker_id or default_worker_id())
+    if not texts:
+        return 0
+
+    logger.info("Processing batch of %d in parallel (%s mode)...", len(texts), CLASSIFY_MODE)
+    by_id = await classify_texts(db, texts)
+    return await run_db(persist_results, db, texts, by_id)
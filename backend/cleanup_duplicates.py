@@ -10,6 +10,7 @@ if backend_dir not in sys.path:
 
 from database import SessionLocal
 from models import ClassifiedInsight
+import rollups
 
 def cleanup_duplicates():
     session = SessionLocal()
@@ -48,6 +49,9 @@ def cleanup_duplicates():
         
         session.commit()
         print(f"Successfully removed {total_removed} duplicate records.")
+
+        # Deleted insights were counted on the dashboards
+        rollups.rebuild(session)
         return total_removed
     except Exception as e:
         session.rollback()
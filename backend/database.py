@@ -1,9 +1,14 @@
 import os
-from sqlalchemy import create_engine
+import logging
+from sqlalchemy import create_engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 from dotenv import load_dotenv, find_dotenv
+from starlette.concurrency import run_in_threadpool
+import observability
+
+logger = logging.getLogger("signalyze.database")
 
 # Try to find the .env file explicitly
 dotenv_path = find_dotenv()
@@ -18,12 +23,13 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not SQLALCHEMY_DATABASE_URL:
     # DEBUG: Print environment to see what is loaded
-    print(f"DEBUG: Current CWD: {os.getcwd()}")
-    print(f"DEBUG: .env path used: {dotenv_path}")
-    print(f"DEBUG: Keys in os.environ: {list(os.environ.keys())}")
+    logger.debug("Current CWD: %s", os.getcwd())
+    logger.debug(".env path used: %s", dotenv_path)
+    logger.debug("Keys in os.environ: %s", list(os.environ.keys()))
     raise ValueError("DATABASE_URL not found in .env file. Please check your configuration.")
 
-print(f"DATABASE CONFIG: Connecting to RDS at {SQLALCHEMY_DATABASE_URL.split('@')[1]}")
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+logger.info("Connecting to RDS at %s", _url.host or _url.database)
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
@@ -31,10 +37,42 @@ engine = create_engine(
     pool_size=10,
     max_overflow=20
 )
+# Statement timings for /metrics
+observability.instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def dialect_insert(db, table):
+    """
+    Returns an INSERT construct for the session's dialect so callers can use
+    on_conflict_do_nothing / on_conflict_do_update on Postgres and SQLite.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+# Parameters per IN (...) lookup, well under the SQLite / Postgres limits
+IN_CHUNK_SIZE = 2000
+
+def in_chunks(items, size: int = IN_CHUNK_SIZE):
+    """Splits `items` into lists of at most `size` for IN (...) lookups."""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Runs blocking work on a sync Session (queries, commits, bulk inserts) in
+    the threadpool so async handlers and the background pipeline never block
+    the event loop. `fn` receives the session like any other argument; one
+    session must only be used by one call at a time, which holds as long as
+    every call is awaited.
+    """
+    return await run_in_threadpool(fn, *args, **kwargs)
+
 def get_db():
     db = SessionLocal()
     try:
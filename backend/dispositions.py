@@ -0,0 +1,327 @@
+import os
+import re
+import csv
+import uuid
+import difflib
+import logging
+import datetime
+import threading
+from collections import Counter
+from sqlalchemy import select, update, func, or_, bindparam, event
+from sqlalchemy.orm import Session
+import models
+import rollups
+from database import dialect_insert
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger("signalyze.dispositions")
+
+# Taxonomy CSV: the "Disposition 1".."Disposition 5" columns of every row
+# below the header are one path through the taxonomy
+DISPOSITION_TAXONOMY_FILE = os.getenv(
+    "DISPOSITION_TAXONOMY_FILE",
+    os.path.join(os.path.dirname(backend_dir), "Signalyze's taxonomy - Recommended.csv")
+)
+# An unknown value is merged into a known one with the same number of words
+# when every word pair has at least this difflib ratio (0-1)
+DISPOSITION_FUZZY_CUTOFF = float(os.getenv("DISPOSITION_FUZZY_CUTOFF", "0.9"))
+
+POSITIONS = [1, 2, 3, 4, 5]
+
+# Words that only say "this is a problem" and never tell two dispositions apart
+_FILLER_WORDS = {"issue", "issues", "problem", "problems", "concern", "concerns", "related"}
+
+def normalize(name: str) -> str:
+    """
+    Case, punctuation, filler-word and plural insensitive key of a
+    disposition: "Range Anxiety" and "range anxiety issues" -> "range anxiety".
+    """
+    words = re.findall(r"[a-z0-9]+", name.lower().replace("&", " and "))
+    key = []
+    for word in words:
+        if word in _FILLER_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        key.append(word)
+    # All filler ("Issues") still names something
+    return " ".join(key or words)[:255]
+
+def load_taxonomy(path: str = DISPOSITION_TAXONOMY_FILE) -> list:
+    """
+    Taxonomy paths from the CSV as lists of (level, name), level 1 first.
+    """
+    with open(path, encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    columns = None
+    paths = []
+    for row in rows:
+        if columns is None:
+            found = {int(m.group(1)): i for i, cell in enumerate(row) if (m := re.fullmatch(r"\s*disposition\s*(\d)\s*", cell, re.I))}
+            if found:
+                columns = found
+            continue
+        path = [(level, row[i].strip()) for level, i in sorted(columns.items()) if i < len(row) and row[i].strip()]
+        if path:
+            paths.append(path)
+    return paths
+
+def needs_taxonomy(db: Session) -> bool:
+    """True while the disposition dimension is empty."""
+    return db.query(models.Disposition.id).first() is None
+
+def import_taxonomy(db: Session, path: str = DISPOSITION_TAXONOMY_FILE) -> int:
+    """
+    Loads the taxonomy CSV into the dispositions table (idempotent; values
+    already present, e.g. observed earlier, are left as they are) and
+    commits. Returns the number of rows added.
+    """
+    if not os.path.exists(path):
+        logger.warning("Taxonomy file not found: %s", path)
+        return 0
+    by_key = dict(db.query(models.Disposition.normalized_name, models.Disposition.id))
+    added = 0
+    for taxonomy_path in load_taxonomy(path):
+        parent_id = None
+        for level, name in taxonomy_path:
+            key = normalize(name)
+            if key not in by_key:
+                row = models.Disposition(name=name, normalized_name=key, level=level, parent_id=parent_id, origin="taxonomy")
+                db.add(row)
+                db.flush()
+                by_key[key] = row.id
+                added += 1
+            parent_id = by_key[key]
+    db.commit()
+    CANONICALIZER.reset()
+    return added
+
+class DispositionCanonicalizer:
+    """
+    Maps free-text disposition values onto dispositions.id: exact spelling,
+    then normalize(), then the closest known value compared word by word
+    (typos and inflections merge, "Range" vs "Brake Performance" does not).
+    Fuzzy candidates come from a word-prefix index, so a lookup is not a
+    scan of the whole dimension. Values that match nothing are added as
+    "observed".
+
+    The dimension is read once per process and kept in memory. New values
+    are inserted in the caller's transaction and only cached once it
+    commits, so a rolled-back batch never leaves an id behind. Rows added by
+    another process are found through the unique normalized_name when
+    inserting, so every process agrees on the ids; they only become fuzzy
+    candidates here after reset().
+    """
+    def __init__(self, cutoff: float = DISPOSITION_FUZZY_CUTOFF):
+        self.cutoff = cutoff
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.matches = Counter()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.loaded = False
+            self.by_name = {}
+            self.by_key = {}
+            self.names = {}
+            self.keys_by_prefix = {}
+
+    def _remember(self, disposition_id: int, name: str, key: str):
+        self.by_key[key] = disposition_id
+        self.names.setdefault(disposition_id, name)
+        for word in key.split():
+            self.keys_by_prefix.setdefault(word[:3], set()).add(key)
+
+    def _load(self, db: Session):
+        for disposition_id, name, key in db.query(models.Disposition.id, models.Disposition.name, models.Disposition.normalized_name):
+            self._remember(disposition_id, name, key)
+        self.loaded = True
+
+    def _fuzzy(self, key: str):
+        words = key.split()
+        candidates = set()
+        for word in words:
+            candidates |= self.keys_by_prefix.get(word[:3], set())
+        best, best_score = None, self.cutoff
+        for candidate in sorted(candidates):
+            other = candidate.split()
+            if len(other) != len(words):
+                continue
+            score = min(difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(words, other))
+            if score > best_score or (best is None and score >= best_score):
+                best, best_score = candidate, score
+        return best
+
+    def _pending(self, db: Session) -> dict:
+        """normalized name -> (id, name) inserted in `db`'s open transaction."""
+        pending = db.info.get("dispositions_pending")
+        if pending is None:
+            pending = db.info["dispositions_pending"] = {}
+            event.listen(db, "after_commit", self._committed)
+            event.listen(db, "after_rollback", lambda session: session.info["dispositions_pending"].clear())
+        return pending
+
+    def _committed(self, session: Session):
+        pending = session.info["dispositions_pending"]
+        with self.lock:
+            for key, (disposition_id, name) in pending.items():
+                self._remember(disposition_id, name, key)
+        pending.clear()
+
+    def _insert(self, db: Session, name: str, key: str, level: int):
+        table = models.Disposition.__table__
+        db.execute(dialect_insert(db, table).on_conflict_do_nothing(index_elements=["normalized_name"]), [{
+            "name": name, "normalized_name": key, "level": level,
+            "origin": "observed", "created_at": datetime.datetime.utcnow()
+        }])
+        # Our row, or the one another process committed first
+        return tuple(db.execute(select(table.c.id, table.c.name).where(table.c.normalized_name == key)).one())
+
+    def resolve(self, db: Session, name: str, level: int = None):
+        """
+        Returns (disposition id, canonical name, match) for a non-empty
+        value; match is exact, normalized, fuzzy or new.
+        """
+        with self.lock:
+            if not self.loaded:
+                self._load(db)
+            if name in self.by_name:
+                disposition_id, match = self.by_name[name]
+                self.matches[match] += 1
+                return disposition_id, self.names[disposition_id], match
+
+            key = normalize(name)
+            fuzzy_key = None if key in self.by_key else self._fuzzy(key)
+            if key in self.by_key:
+                disposition_id = self.by_key[key]
+                match = "exact" if self.names[disposition_id] == name else "normalized"
+            elif fuzzy_key:
+                disposition_id, match = self.by_key[fuzzy_key], "fuzzy"
+            else:
+                # Not cached until the caller commits (see _committed)
+                pending = self._pending(db)
+                if key not in pending:
+                    pending[key] = self._insert(db, name, key, level)
+                disposition_id, canonical = pending[key]
+                match = "new" if canonical == name else "normalized"
+                self.matches[match] += 1
+                return disposition_id, canonical, match
+            self.by_name[name] = (disposition_id, match)
+            self.matches[match] += 1
+            return disposition_id, self.names[disposition_id], match
+
+    def stats(self) -> dict:
+        return {"dispositions": len(self.names), "spellings": len(self.by_name), "matches": dict(self.matches)}
+
+CANONICALIZER = DispositionCanonicalizer()
+
+def _canonicalize(db: Session, insight) -> list:
+    """
+    Association rows (as dicts, with the canonical name) for
+    insight.disposition_1..5. The columns keep the text the model wrote.
+    """
+    links = []
+    for position in POSITIONS:
+        value = getattr(insight, f"disposition_{position}")
+        if not value or not str(value).strip():
+            continue
+        disposition_id, canonical, match = CANONICALIZER.resolve(db, str(value).strip(), level=position)
+        links.append({"insight_id": insight.id, "position": position, "disposition_id": disposition_id,
+                      "match": match, "name": canonical})
+    return links
+
+def link_insights(db: Session, insights) -> dict:
+    """
+    Links new (not yet flushed) ClassifiedInsight objects to the dimension,
+    staging their insight_dispositions rows in the caller's transaction.
+    Returns {insight id: {"disposition_<n>": canonical name}} for
+    rollups.record_insights, so the dashboard counters use canonical names.
+    """
+    canonical = {}
+    for insight in insights:
+        # Assigned up front so the association rows can reference it
+        if insight.id is None:
+            insight.id = str(uuid.uuid4())
+        links = _canonicalize(db, insight)
+        canonical[insight.id] = {f"disposition_{link['position']}": link.pop("name") for link in links}
+        db.add_all(models.InsightDisposition(**link) for link in links)
+    return canonical
+
+def _unlinked_query(batch_size: int, after_id: str = None):
+    insight = models.ClassifiedInsight
+    linked = select(models.InsightDisposition.insight_id).where(models.InsightDisposition.insight_id == insight.id)
+    query = select(insight).where(
+        ~linked.exists(),
+        or_(*[getattr(insight, f"disposition_{position}") != None for position in POSITIONS])
+    )
+    if after_id is not None:
+        query = query.where(insight.id > after_id)
+    return query.order_by(insight.id).limit(batch_size)
+
+def needs_backfill(db: Session) -> bool:
+    """True when some classified insight has dispositions but no links yet."""
+    return db.execute(_unlinked_query(1)).first() is not None
+
+def backfill(db: Session, batch_size: int = 1000, rename: bool = False) -> dict:
+    """
+    Links existing classified insights to the dimension, one committed
+    batch at a time (so it can be stopped and rerun). The disposition
+    columns keep the model's text unless `rename` is set, which rewrites
+    them to the canonical names. Rebuilds the dashboard counters at the end
+    when any value was canonicalized. Returns counts.
+    """
+    table = models.ClassifiedInsight.__table__
+    rename_stmt = update(table).where(table.c.id == bindparam("_id")).values(
+        {f"disposition_{position}": bindparam(f"_d{position}") for position in POSITIONS}
+    )
+    insights = canonicalized = links = 0
+    last_id = None
+    while True:
+        # Walks ids in order, so rows that end up with no links are not re-read
+        batch = db.execute(_unlinked_query(batch_size, last_id)).scalars().all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        changes, rows = [], []
+        for insight in batch:
+            before = [getattr(insight, f"disposition_{position}") for position in POSITIONS]
+            insight_links = _canonicalize(db, insight)
+            names = {link["position"]: link.pop("name") for link in insight_links}
+            rows.extend(insight_links)
+            after = [names.get(position, value) for position, value in zip(POSITIONS, before)]
+            if after != before:
+                changes.append({"_id": insight.id, **{f"_d{p}": value for p, value in zip(POSITIONS, after)}})
+        # Core statements only: the ORM copies are discarded, not flushed
+        db.expunge_all()
+        if changes and rename:
+            db.execute(rename_stmt, changes)
+        if rows:
+            db.execute(dialect_insert(db, models.InsightDisposition.__table__).on_conflict_do_nothing(), rows)
+        db.commit()
+        insights += len(batch)
+        canonicalized += len(changes)
+        links += len(rows)
+        logger.info("Linked %d insights (%d with non-canonical spellings)...", insights, canonicalized)
+    if canonicalized:
+        rollups.rebuild(db)
+    return {"insights": insights, "canonicalized": canonicalized, "renamed": canonicalized if rename else 0, "links": links}
+
+def top_dispositions(db: Session, where=(), positions=(1, 2, 3, 4), top: int = 10) -> list:
+    """
+    Most frequent dispositions as [{"id", "name", "value"}]: an integer
+    GROUP BY over insight_dispositions, joined to classified_insights only
+    when `where` filters the insights.
+    """
+    link = models.InsightDisposition
+    counts = select(link.disposition_id, func.count().label("n")).where(link.position.in_(list(positions)))
+    if where:
+        counts = counts.join(models.ClassifiedInsight, models.ClassifiedInsight.id == link.insight_id).where(*where)
+    counts = counts.group_by(link.disposition_id).order_by(func.count().desc()).limit(top).subquery()
+    rows = db.execute(
+        select(counts.c.disposition_id, models.Disposition.name, counts.c.n)
+        .join(models.Disposition, models.Disposition.id == counts.c.disposition_id)
+        .order_by(counts.c.n.desc())
+    )
+    return [{"id": disposition_id, "name": name, "value": n} for disposition_id, name, n in rows]
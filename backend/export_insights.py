@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import argparse
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import exporter
+
+def export_insights(args):
+    """
+    Writes a streaming export of classified insights to a file (or stdout),
+    one chunk at a time.
+    """
+    chunks = exporter.export_stream(
+        format=args.format, fields=args.fields, gzip=args.gzip, batch_rows=args.batch_rows,
+        sentiment=args.sentiment, category=args.category, brand=args.brand, model=args.model,
+        source=args.source, since=args.since, until=args.until
+    )
+    output = open(args.output, "wb") if args.output != "-" else sys.stdout.buffer
+    started = time.perf_counter()
+    written = 0
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+    print(f"Exported {written / 1e6:.1f} MB in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    import datetime
+    parser = argparse.ArgumentParser(description="Export classified insights joined to raw text")
+    parser.add_argument("--format", choices=list(exporter.EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--output", default=None, help="file to write, '-' for stdout (default: generated name)")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--fields", default=None, help="comma-separated projection")
+    parser.add_argument("--batch-rows", type=int, default=exporter.EXPORT_BATCH_ROWS)
+    parser.add_argument("--sentiment")
+    parser.add_argument("--category")
+    parser.add_argument("--brand")
+    parser.add_argument("--model")
+    parser.add_argument("--source")
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat)
+    parser.add_argument("--until", type=datetime.datetime.fromisoformat)
+    args = parser.parse_args()
+    args.output = args.output or exporter.export_filename(args.format, args.gzip)
+    export_insights(args)
@@ -0,0 +1,197 @@
+import io
+import os
+import csv
+import json
+import zlib
+import datetime
+from sqlalchemy import Integer, Boolean, DateTime
+import feedback_listing
+
+# Optional: only the Parquet / Arrow formats need pyarrow
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Rows encoded per output chunk (and per Parquet row group / Arrow batch)
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+# Size of the first chunk; later chunks double up to EXPORT_BATCH_ROWS
+EXPORT_FIRST_BATCH_ROWS = int(os.getenv("EXPORT_FIRST_BATCH_ROWS", "100"))
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+# Integer columns that hold the model's text ("2021-2022", "unknown"):
+# exported as strings so one such value does not fail the whole file
+TEXT_VALUED_FIELDS = {"release_year"}
+
+# Everything the listing can return except the raw LLM JSON, flat columns only
+DEFAULT_EXPORT_FIELDS = ",".join(name for name in feedback_listing.FIELDS if name != "raw_llm_response")
+
+def _batches(rows, size: int, first: int = EXPORT_FIRST_BATCH_ROWS):
+    # Starts small and doubles up to `size`, so the first bytes go out
+    # before a full batch has been read
+    batch = []
+    target = max(1, min(first, size))
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= target:
+            yield batch
+            batch = []
+            target = min(target * 2, size)
+    if batch:
+        yield batch
+
+def _jsonable(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+def iter_ndjson(rows, fields, batch_rows: int = EXPORT_BATCH_ROWS):
+    for batch in _batches(rows, batch_rows):
+        yield "".join(json.dumps(row, default=_jsonable) + "\n" for row in batch).encode("utf-8")
+
+def iter_csv(rows, fields, batch_rows: int = EXPORT_BATCH_ROWS):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for batch in _batches(rows, batch_rows):
+        for row in batch:
+            # Nested values (e.g. product_info) become JSON text
+            writer.writerow({k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in row.items()})
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands written bytes back to the caller instead of
+    keeping them, while reporting the true position (Parquet footers
+    store absolute offsets).
+    """
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def _arrow_schema(fields):
+    types = []
+    for name in fields:
+        column = feedback_listing.FIELDS.get(name)
+        column_type = column.type if column is not None and name not in TEXT_VALUED_FIELDS else None
+        if isinstance(column_type, Boolean):
+            types.append(pa.bool_())
+        elif isinstance(column_type, Integer):
+            types.append(pa.int64())
+        elif isinstance(column_type, DateTime):
+            types.append(pa.timestamp("us"))
+        else:
+            # Strings, plus JSON / derived values as JSON text
+            types.append(pa.string())
+    return pa.schema(list(zip(fields, types)))
+
+def _arrow_batch(batch, schema):
+    columns = {}
+    for field in schema:
+        values = [row.get(field.name) for row in batch]
+        if pa.types.is_string(field.type):
+            values = [json.dumps(v) if isinstance(v, (dict, list)) else (None if v is None else str(v)) for v in values]
+        columns[field.name] = values
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+def iter_parquet(rows, fields, batch_rows: int = EXPORT_BATCH_ROWS):
+    """
+    One Parquet row group per batch, flushed to the client as it is written.
+    """
+    schema = _arrow_schema(fields)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for batch in _batches(rows, batch_rows):
+            writer.write_batch(_arrow_batch(batch, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def iter_arrow(rows, fields, batch_rows: int = EXPORT_BATCH_ROWS):
+    """
+    Arrow IPC stream, one record batch per batch of rows.
+    """
+    schema = _arrow_schema(fields)
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for batch in _batches(rows, batch_rows):
+            writer.write_batch(_arrow_batch(batch, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+_ENCODERS = {"ndjson": iter_ndjson, "csv": iter_csv, "parquet": iter_parquet, "arrow": iter_arrow}
+
+def gzip_chunks(chunks):
+    """
+    Gzip stream that flushes after every chunk so the download starts with
+    the first batch instead of after the whole file.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def check_format(format: str):
+    """
+    Raises ValueError for unknown formats, or when the Parquet/Arrow
+    writer (pyarrow) is not installed.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format: {format}. Available: {', '.join(EXPORT_FORMATS)}")
+    if format in ("parquet", "arrow") and pa is None:
+        raise ValueError(f"{format} export needs pyarrow (pip install pyarrow)")
+
+def export_filename(format: str, gzip: bool = False) -> str:
+    stamp = datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    return f"classified-insights-{stamp}.{EXPORT_FORMATS[format][1]}" + (".gz" if gzip else "")
+
+def export_stream(format: str = "ndjson", fields: str = None, gzip: bool = False,
+                  batch_rows: int = EXPORT_BATCH_ROWS, **filters):
+    """
+    Byte chunks of classified insights (joined to raw text) in `format`,
+    newest first, with the listing filters. Rows come from a server-side
+    cursor in batches, so memory stays bounded by batch_rows regardless of
+    the export size. Raises ValueError for unknown formats or fields.
+    """
+    check_format(format)
+    fields = fields or DEFAULT_EXPORT_FIELDS
+    names = feedback_listing.parse_fields(fields)
+    # Small server-side fetches keep the first row fast; encoding batches
+    # are assembled from them
+    rows = feedback_listing.stream_insights(fields=fields, yield_per=min(batch_rows, 1000), **filters)
+    chunks = _ENCODERS[format](rows, names, batch_rows)
+    return gzip_chunks(chunks) if gzip else chunks
@@ -0,0 +1,209 @@
+import json
+import base64
+import datetime
+from sqlalchemy import select, tuple_, func
+from sqlalchemy.orm import Session
+from models import RawFeedback, PreprocessedFeedback, ClassifiedInsight
+from database import SessionLocal
+import brands
+import dispositions
+
+# Upper bound for one page
+MAX_PAGE_SIZE = 500
+
+# Selectable fields -> column. Every field is read in one joined query;
+# preprocessed_feedback / raw_feedback are only joined when needed.
+_INSIGHT_COLUMNS = [
+    "id", "preprocessed_id", "item_id", "item_type", "product_category", "product_subcategory",
+    "make_brand", "model", "variant", "color", "size_capacity", "configuration", "release_year",
+    "price_band", "market_segment", "verified_purchase", "purchase_channel", "purchase_region",
+    "usage_duration_bucket", "ownership_stage", "disposition_1", "disposition_2", "disposition_3",
+    "disposition_4", "disposition_5", "sentiment", "created_at"
+]
+FIELDS = {name: getattr(ClassifiedInsight, name) for name in _INSIGHT_COLUMNS}
+FIELDS.update({
+    "raw_text": RawFeedback.raw_text,
+    "source": RawFeedback.source,
+    "cleaned_text": PreprocessedFeedback.cleaned_text,
+    "language": PreprocessedFeedback.language,
+    "raw_llm_response": ClassifiedInsight.raw_llm_response,
+})
+
+# Fields computed from other fields, kept for existing UI components
+DERIVED_FIELDS = {
+    "area": (["product_category"], lambda row: row["product_category"]),
+    "product_info": (["make_brand", "model", "product_category"], lambda row: {
+        "make": row["make_brand"],
+        "model": row["model"],
+        "category": row["product_category"]
+    }),
+    "annotator_note": (["disposition_4"], lambda row: row["disposition_4"]),
+}
+
+# Returned when no `fields` are requested: everything except the raw LLM JSON
+DEFAULT_FIELDS = [name for name in FIELDS if name not in ("raw_llm_response", "cleaned_text", "language")] + list(DERIVED_FIELDS)
+
+def parse_fields(fields: str = None) -> list:
+    """
+    Comma-separated field list -> validated list (DEFAULT_FIELDS if empty).
+    Raises ValueError for unknown fields.
+    """
+    if not fields:
+        return DEFAULT_FIELDS
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in FIELDS and name not in DERIVED_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(list(FIELDS) + list(DERIVED_FIELDS))}")
+    return names
+
+def encode_cursor(created_at: datetime.datetime, insight_id: str) -> str:
+    payload = json.dumps([created_at.isoformat() if created_at else None, insight_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """
+    Returns (created_at, id). Raises ValueError for malformed cursors.
+    """
+    try:
+        created_at, insight_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.datetime.fromisoformat(created_at), insight_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def apply_filters(stmt, sentiment: str = None, category: str = None, brand: str = None, model: str = None,
+                  source: str = None, since: datetime.datetime = None, until: datetime.datetime = None):
+    """
+    Adds the listing filters to a select over classified_insights that
+    already joins raw_feedback when `source` is given. `brand` is a list of
+    lowercase names (see brands.brand_variants). Shared by the listing,
+    company and export endpoints.
+    """
+    if sentiment:
+        stmt = stmt.where(ClassifiedInsight.sentiment == sentiment)
+    if category:
+        stmt = stmt.where(ClassifiedInsight.product_category == category)
+    if brand:
+        stmt = stmt.where(func.lower(ClassifiedInsight.make_brand).in_(brand))
+    if model:
+        stmt = stmt.where(ClassifiedInsight.model == model)
+    if source:
+        stmt = stmt.where(RawFeedback.source == source)
+    if since:
+        stmt = stmt.where(ClassifiedInsight.created_at >= since)
+    if until:
+        stmt = stmt.where(ClassifiedInsight.created_at < until)
+    return stmt
+
+def build_query(fields: list, source: str = None, **filters):
+    """
+    One select of only the columns behind `fields` (plus the keyset columns),
+    newest first. Returns (select, selected column names).
+    """
+    columns = []
+    for name in fields:
+        for base in (DERIVED_FIELDS[name][0] if name in DERIVED_FIELDS else [name]):
+            if base not in columns:
+                columns.append(base)
+    # Keyset columns are always read so the next cursor can be built;
+    # disposition_5 backs the sentiment fallback in shape()
+    extra = ["created_at", "id"] + (["disposition_5"] if "sentiment" in columns else [])
+    for base in extra:
+        if base not in columns:
+            columns.append(base)
+
+    tables = {FIELDS[name].class_ for name in columns}
+    stmt = select(*[FIELDS[name].label(name) for name in columns]).select_from(ClassifiedInsight)
+    if RawFeedback in tables or PreprocessedFeedback in tables or source:
+        stmt = stmt.join(PreprocessedFeedback, ClassifiedInsight.preprocessed_id == PreprocessedFeedback.id)
+    if RawFeedback in tables or source:
+        stmt = stmt.join(RawFeedback, PreprocessedFeedback.raw_id == RawFeedback.id)
+    stmt = apply_filters(stmt, source=source, **filters)
+    return stmt.order_by(ClassifiedInsight.created_at.desc(), ClassifiedInsight.id.desc()), columns
+
+def shape(row: dict, fields: list) -> dict:
+    item = {}
+    for name in fields:
+        item[name] = DERIVED_FIELDS[name][1](row) if name in DERIVED_FIELDS else row[name]
+    if "sentiment" in item and not item["sentiment"]:
+        # Fallback to disp5 if sentiment is null for old records
+        item["sentiment"] = row.get("disposition_5")
+    return item
+
+def list_insights(db: Session, limit: int = 50, cursor: str = None, fields: str = None, brand=None, **filters):
+    """
+    Keyset-paginated listing ordered by (created_at, id) descending.
+    `brand` may be a name (matched alias-aware) or a list of variants.
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for unknown fields or a malformed cursor.
+    """
+    names = parse_fields(fields)
+    if isinstance(brand, str):
+        brand = brands.brand_variants(db, brand)
+    filters["brand"] = brand
+    stmt, _ = build_query(names, **filters)
+    if cursor:
+        created_at, insight_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(ClassifiedInsight.created_at, ClassifiedInsight.id) < tuple_(created_at, insight_id))
+
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # One extra row tells whether another page exists
+    rows = [dict(row) for row in db.execute(stmt.limit(limit + 1)).mappings()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return [shape(row, names) for row in rows], next_cursor
+
+def stream_insights(fields: str = None, yield_per: int = 1000, **filters):
+    """
+    Yields every matching row as a dict (newest first) without loading the
+    result set: rows are fetched `yield_per` at a time through a server-side
+    cursor where the driver supports it. Uses its own session, since it runs
+    after the request's session is closed.
+    """
+    names = parse_fields(fields)
+    db = SessionLocal()
+    try:
+        if isinstance(filters.get("brand"), str):
+            filters["brand"] = brands.brand_variants(db, filters["brand"])
+        stmt, _ = build_query(names, **filters)
+        result = db.execute(stmt.execution_options(yield_per=yield_per, stream_results=True))
+        for row in result.mappings():
+            yield shape(dict(row), names)
+    finally:
+        db.close()
+
+def _top(db: Session, column, where, top: int) -> list:
+    rows = db.execute(
+        select(column, func.count().label("n")).where(*where, column != None)
+        .group_by(column).order_by(func.count().desc()).limit(top)
+    )
+    return [{"name": name, "value": n} for name, n in rows]
+
+def company_aggregates(db: Session, variants: list, top: int = 10) -> dict:
+    """
+    Per-company aggregates computed in SQL over the rows matching
+    lower(make_brand) IN variants: total, sentiment split, the stored brand
+    spellings, top dispositions (1-4 combined, canonical ids from the
+    disposition dimension) and top models.
+    """
+    where = [func.lower(ClassifiedInsight.make_brand).in_(variants)]
+    sentiment = dict(db.execute(
+        select(ClassifiedInsight.sentiment, func.count()).where(*where).group_by(ClassifiedInsight.sentiment)
+    ).all())
+    matched = dict(db.execute(
+        select(ClassifiedInsight.make_brand, func.count()).where(*where).group_by(ClassifiedInsight.make_brand)
+    ).all())
+
+    top_dispositions = [
+        {"name": row["name"], "value": row["value"]}
+        for row in dispositions.top_dispositions(db, where=where, top=top)
+    ]
+
+    return {
+        "total": sum(sentiment.values()),
+        "matched_brands": matched,
+        "sentiment_distribution": sentiment,
+        "top_dispositions": top_dispositions,
+        "top_models": _top(db, ClassifiedInsight.model, where, top)
+    }
@@ -1,80 +1,106 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, Depends
+from fastapi import FastAPI, UploadFile, File, Depends
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
-import pandas as pd
-import io
-import os
 import asyncio
+import logging
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-import models
-from database import engine, get_db, SessionLocal
-from pipelines.ingestion import ingest_raw_data
+import observability
+observability.configure_logging()
+
+from database import get_db, SessionLocal, run_db
+from starlette.concurrency import run_in_threadpool
+from pipelines.ingestion import ingest_raw_batch, ingest_csv_stream, INGEST_JOBS, CSV_CHUNK_SIZE
 from pipelines.preprocessing import process_raw_item
 from pipelines.classification import classify_preprocessed_item
-from classification_service import run_classification_pipeline
+from pipeline_engine import PipelineEngine
+import classification_cache
+import rollups
+import dispositions
+import response_cache
+import preprocess_pool
+import near_duplicates
+import noise_gate
+import batch_jobs
+from openai_scheduler import SCHEDULER
+from work_queue import queue_stats, backlog_counts
 from routers import classification_router
+from migrate import upgrade_database
 
 load_dotenv()
 
+logger = logging.getLogger("signalyze.pipeline")
+
 from fastapi.middleware.cors import CORSMiddleware
 
-models.Base.metadata.create_all(bind=engine)
+# Versioned schema (migrations/versions) instead of create_all
+upgrade_database()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Run classification in the background
+    # Startup: Drop cached classifications from an older prompt/model
+    db = SessionLocal()
+    try:
+        purged = await run_db(classification_cache.CACHE.purge_stale, db)
+        if purged:
+            logger.info("Purged %d classification cache entries from an older prompt version", purged)
+
+        # Backfill the dashboard counters once for databases that predate them
+        if await run_db(rollups.needs_rebuild, db):
+            logger.info("Rollup counter table is empty, rebuilding from existing data...")
+            buckets = await run_db(rollups.rebuild, db)
+            logger.info("Rebuilt %d rollup buckets", buckets)
+
+        # Disposition dimension: taxonomy on first start, then links for
+        # insights classified before it existed
+        if await run_db(dispositions.needs_taxonomy, db):
+            added = await run_db(dispositions.import_taxonomy, db)
+            logger.info("Imported %d disposition taxonomy entries", added)
+        if await run_db(dispositions.needs_backfill, db):
+            logger.info("Linking existing insights to the disposition dimension...")
+            result = await run_db(dispositions.backfill, db)
+            logger.info("Linked %d insights to dispositions", result["insights"])
+    finally:
+        db.close()
+
+    # Run classification in the background
     asyncio.create_task(run_full_pipeline())
     yield
+    # Shutdown: stop the preprocessing worker processes
+    preprocess_pool.POOL.close()
+
+# Background pipeline stages (see pipeline_engine)
+PIPELINE = PipelineEngine()
 
 app = FastAPI(title="Signalyze API - Production Ready", lifespan=lifespan)
 
 app.include_router(classification_router.router)
 
+# Dashboard reads are served from the response cache with ETags
+app.add_middleware(response_cache.ResponseCacheMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the dashboard read the listing cursor and revalidate with ETags
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 async def run_full_pipeline():
     """
     Background worker that moves data through the 3 layers.
     RAW -> CLEANED -> CLASSIFIED
+    Stages run concurrently and are woken by ingestion / preprocessing
+    commits instead of polling (see pipeline_engine).
     """
-    db = SessionLocal()
     try:
-        print("PIPELINE: Starting background worker...")
-        while True:
-            # 1. RAW -> PREPROCESSED
-            raw_unprocessed = db.query(models.RawFeedback).outerjoin(models.PreprocessedFeedback).filter(models.PreprocessedFeedback.id == None).limit(50).all()
-            for raw in raw_unprocessed:
-                try:
-                    await process_raw_item(db, raw.id)
-                    db.commit()
-                except Exception as e:
-                    print(f"PIPELINE: Preprocessing error for {raw.id}: {e}")
-                    db.rollback()
-
-            # 2. PREPROCESSED -> CLASSIFIED
-            # This handles the OpenAI batching (Parallel 20)
-            new_count = await run_classification_pipeline(db, batch_size=20)
-            
-            if new_count > 0:
-                print(f"PIPELINE: Success! Classified {new_count} records.")
-                await asyncio.sleep(1) 
-            elif len(raw_unprocessed) > 0:
-                print(f"PIPELINE: Preprocessed {len(raw_unprocessed)} items. Continuing...")
-                await asyncio.sleep(1)
-            else:
-                await asyncio.sleep(10) 
-            
+        await PIPELINE.run()
     except Exception as e:
-        print(f"PIPELINE FATAL ERROR: {e}")
-    finally:
-        db.close()
+        logger.critical("Background worker stopped: %s", e, exc_info=True)
 
 @app.post("/classify")
 async def classify_single(data: dict, db: Session = Depends(get_db)):
@@ -83,13 +109,15 @@ async def classify_single(data: dict, db: Session = Depends(get_db)):
     if not text:
         return {"error": "Text is required"}
     
-    # 1. Ingest Raw
-    raw = await ingest_raw_data(db, text, source=source)
+    # 1. Ingest Raw (processed inline below, so the background stages are not woken)
+    raw_ids = await ingest_raw_batch(db, [text], source=source, notify=False)
     
     # 2. Preprocess
-    pre = await process_raw_item(db, raw.id)
+    pre = await process_raw_item(db, raw_ids[0])
     if not pre:
         return {"error": "Preprocessing failed"}
+    if pre.skipped_reason:
+        return {"id": None, "skipped": pre.skipped_reason, "annotator_note": "Filtered as noise, not sent to the LLM"}
     
     # 3. Classify
     insight = await classify_preprocessed_item(db, pre.id)
@@ -109,10 +137,55 @@ async def classify_single(data: dict, db: Session = Depends(get_db)):
     
     return {"error": "AI classification failed"}
 
+# Endpoints that only talk to the DB are plain `def` so FastAPI runs them in
+# its threadpool; async endpoints go through database.run_db instead.
 @app.post("/analytics/process")
-async def trigger_processing():
+def trigger_processing(db: Session = Depends(get_db)):
     # Loop is already running from lifespan, no need to start another one
-    return {"message": "Background worker is already active and monitoring for new data."}
+    return {
+        "message": "Background worker is already active and monitoring for new data.",
+        "last_batch": PIPELINE.stats(),
+        "preprocess_pool": preprocess_pool.POOL.stats(),
+        "work_queue": queue_stats(db)
+    }
+
+@app.get("/cache/classification")
+async def get_classification_cache_stats():
+    return classification_cache.CACHE.stats()
+
+@app.get("/cache/near-duplicates")
+def get_near_duplicate_stats(db: Session = Depends(get_db)):
+    return near_duplicates.NEAR_DUPLICATES.stats(db)
+
+@app.get("/noise-gate")
+def get_noise_gate_stats(db: Session = Depends(get_db)):
+    return noise_gate.GATE.stats(db)
+
+@app.get("/batch-jobs")
+def get_batch_jobs(db: Session = Depends(get_db)):
+    return batch_jobs.stats(db)
+
+@app.get("/cache/responses")
+async def get_response_cache_stats():
+    return response_cache.CACHE.stats()
+
+@app.get("/openai/scheduler")
+async def get_openai_scheduler_stats():
+    return SCHEDULER.stats()
+
+@app.get("/metrics")
+def get_metrics(db: Session = Depends(get_db)):
+    # Backlog and scheduler gauges are read at scrape time; everything
+    # else is counted where it happens
+    for layer, count in backlog_counts(db).items():
+        observability.BACKLOG.labels(layer).set(count)
+    scheduler = SCHEDULER.stats()
+    observability.OPENAI_IN_FLIGHT.set(scheduler["in_flight"])
+    observability.OPENAI_CONCURRENCY.set(scheduler["concurrency_limit"])
+    for queue, depth in PIPELINE.queue_depths().items():
+        observability.PIPELINE_QUEUE.labels(queue).set(depth)
+    body, content_type = observability.render_metrics()
+    return Response(content=body, media_type=content_type)
 
 @app.get("/")
 async def root():
@@ -123,51 +196,38 @@ from scrapers.youtube_scraper import fetch_youtube_comments
 
 @app.post("/ingest/reddit")
 async def ingest_reddit(subreddit: str, db: Session = Depends(get_db)):
-    comments = fetch_reddit_comments(subreddit)
-    for text in comments:
-        await ingest_raw_data(db, text, source='reddit', metadata={"subreddit": subreddit})
-    return {"source": "reddit", "records_added": len(comments)}
+    comments = await run_in_threadpool(fetch_reddit_comments, subreddit)
+    raw_ids = await ingest_raw_batch(db, comments, source='reddit', metadata={"subreddit": subreddit})
+    return {"source": "reddit", "records_added": len(raw_ids)}
 
 @app.post("/ingest/youtube")
 async def ingest_youtube(video_id: str, db: Session = Depends(get_db)):
-    comments = fetch_youtube_comments(video_id)
-    for text in comments:
-        await ingest_raw_data(db, text, source='youtube', metadata={"video_id": video_id})
-    return {"source": "youtube", "records_added": len(comments)}
+    comments = await run_in_threadpool(fetch_youtube_comments, video_id)
+    raw_ids = await ingest_raw_batch(db, comments, source='youtube', metadata={"video_id": video_id})
+    return {"source": "youtube", "records_added": len(raw_ids)}
 
 @app.post("/ingest/csv")
 @app.post("/upload-csv")
-async def ingest_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def ingest_csv(file: UploadFile = File(...), db: Session = Depends(get_db), chunksize: int = CSV_CHUNK_SIZE, job_id: str = None):
     try:
-        content = await file.read()
-        df = pd.read_csv(io.BytesIO(content))
-        
-        records_added = 0
-        # Common column names for feedback
-        possible_cols = ['text', 'comment', 'review', 'body', 'content', 'feedback']
-        
-        # Find which column matches
-        text_col = next((col for col in possible_cols if col in df.columns), None)
-        
-        if not text_col:
-             # Fallback: Use the first column if no known name matches
-             text_col = df.columns[0]
-
-        for _, row in df.iterrows():
-            text = str(row.get(text_col, ''))
-            if not text or text.lower() == 'nan': continue
-            
-            await ingest_raw_data(db, text, source='csv', metadata={"filename": file.filename})
-            records_added += 1
-        
-        return {"filename": file.filename, "records_added": records_added}
+        # Stream the spooled upload in chunks instead of loading it into memory.
+        # A client-chosen job_id can be polled at /ingest/jobs/{job_id} meanwhile.
+        job = await ingest_csv_stream(db, file.file, file.filename, chunksize=chunksize, job_id=job_id)
+        return job
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = INGEST_JOBS.get(job_id)
+    if not job:
+        return {"error": "Job not found"}
+    return job
+
 @app.get("/analytics/summary")
-async def get_summary(db: Session = Depends(get_db)):
-    total_raw = db.query(models.RawFeedback).count()
-    total_classified = db.query(models.ClassifiedInsight).count()
+def get_summary(db: Session = Depends(get_db)):
+    total_raw = rollups.total(db, rollups.RAW_DIMENSION)
+    total_classified = rollups.total(db, rollups.INSIGHT_DIMENSION)
     return {
         "total_feedback": total_raw,
         "classified_signal": round((total_classified / total_raw * 100), 2) if total_raw > 0 else 0,
@@ -175,66 +235,16 @@ async def get_summary(db: Session = Depends(get_db)):
     }
 
 @app.get("/analytics/charts")
-async def get_charts(db: Session = Depends(get_db)):
-    from sqlalchemy import func
+def get_charts(db: Session = Depends(get_db)):
     # Using the new sentiment column for primary indicators
-    sentiment_data = db.query(models.ClassifiedInsight.sentiment, func.count(models.ClassifiedInsight.id)).group_by(models.ClassifiedInsight.sentiment).all()
-    category_data = db.query(models.ClassifiedInsight.product_category, func.count(models.ClassifiedInsight.id)).group_by(models.ClassifiedInsight.product_category).all()
+    sentiment_data = rollups.totals(db, "sentiment")
+    category_data = rollups.totals(db, "product_category")
     
     return {
-        "sentiment": [{"name": s or "Unknown", "value": c} for s, c in sentiment_data],
-        "area": [{"name": cat or "Unknown", "value": c} for cat, c in category_data]
+        "sentiment": [{"name": s or "Unknown", "value": c} for s, c in sentiment_data.items()],
+        "area": [{"name": cat or "Unknown", "value": c} for cat, c in category_data.items()]
     }
 
-@app.get("/feedback")
-@app.get("/classified-feedback")
-async def get_feedback(db: Session = Depends(get_db), limit: int = 50):
-    insights = db.query(models.ClassifiedInsight).order_by(models.ClassifiedInsight.created_at.desc()).limit(limit).all()
-    # Return with all fields mapped for frontend
-    return [{
-        "id": i.id,
-        "source": i.preprocessed.raw.source if i.preprocessed and i.preprocessed.raw else "unknown",
-        "raw_text": i.preprocessed.cleaned_text if i.preprocessed else "N/A",
-        
-        # Detailed Taxonomy
-        "item_id": i.item_id,
-        "item_type": i.item_type,
-        "product_category": i.product_category,
-        "product_subcategory": i.product_subcategory,
-        "make_brand": i.make_brand,
-        "model": i.model,
-        "variant": i.variant,
-        "color": i.color,
-        "size_capacity": i.size_capacity,
-        "configuration": i.configuration,
-        "release_year": i.release_year,
-        "price_band": i.price_band,
-        "market_segment": i.market_segment,
-        "verified_purchase": i.verified_purchase,
-        "purchase_channel": i.purchase_channel,
-        "purchase_region": i.purchase_region,
-        "usage_duration_bucket": i.usage_duration_bucket,
-        "ownership_stage": i.ownership_stage,
-        
-        # Signalyze Output
-        "sentiment": i.sentiment or i.disposition_5, # Fallback to disp5 if sentiment is null for old records
-        "disposition_1": i.disposition_1,
-        "disposition_2": i.disposition_2,
-        "disposition_3": i.disposition_3,
-        "disposition_4": i.disposition_4,
-        "disposition_5": i.disposition_5,
-        
-        # Backward compatibility for existing UI components
-        "area": i.product_category,
-        "product_info": {
-            "make": i.make_brand,
-            "model": i.model,
-            "category": i.product_category
-        },
-        "annotator_note": i.disposition_4,
-        "created_at": i.created_at
-    } for i in insights]
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,28 @@
+import os
+import sys
+import argparse
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+from alembic import command
+from alembic.config import Config
+
+def alembic_config() -> Config:
+    return Config(os.path.join(backend_dir, "alembic.ini"))
+
+def upgrade_database(revision: str = "head"):
+    """
+    Brings the database to `revision` with the Alembic migrations in
+    migrations/versions. Every revision is idempotent, so databases created
+    by the old create_all (no alembic_version table) are upgraded in place.
+    """
+    command.upgrade(alembic_config(), revision)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations (same as `alembic upgrade`).")
+    parser.add_argument("revision", nargs="?", default="head")
+    args = parser.parse_args()
+    upgrade_database(args.revision)
+    print(f"Database is at revision {args.revision}.")
@@ -0,0 +1,33 @@
+import os
+import sys
+from alembic import context
+from sqlalchemy import text
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import models
+from database import engine
+
+target_metadata = models.Base.metadata
+
+# Any constant works; it only has to be the same for every process
+MIGRATION_LOCK_ID = 7201863
+
+def run_migrations():
+    # Online only: the revisions inspect the live schema to stay idempotent
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite cannot ALTER most things in place
+            render_as_batch=connection.dialect.name == "sqlite"
+        )
+        with context.begin_transaction():
+            if connection.dialect.name == "postgresql":
+                # Several API processes / workers may start at once; only one migrates
+                connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            context.run_migrations()
+
+run_migrations()
@@ -0,0 +1,91 @@
+"""Baseline: the 3-layer schema (raw -> preprocessed -> classified)
+
+Databases created by the old Base.metadata.create_all already have these
+tables; they only get the baseline columns they are missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns():
+    """Baseline columns per table (fresh objects on every call)."""
+    return {
+        "raw_feedback": [
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("raw_text", sa.Text(), nullable=False),
+            sa.Column("source", sa.String(50)),
+            sa.Column("source_metadata", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime()),
+        ],
+        "preprocessed_feedback": [
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("raw_id", sa.String(), sa.ForeignKey("raw_feedback.id"), nullable=False),
+            sa.Column("cleaned_text", sa.Text(), nullable=False),
+            sa.Column("language", sa.String(10)),
+            sa.Column("is_translated", sa.Boolean()),
+            sa.Column("translated_text", sa.Text(), nullable=True),
+            sa.Column("text_hash", sa.String(32)),
+            sa.Column("created_at", sa.DateTime()),
+        ],
+        "classified_insights": [
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("preprocessed_id", sa.String(), sa.ForeignKey("preprocessed_feedback.id"), nullable=False, unique=True),
+            sa.Column("item_id", sa.String(100)),
+            sa.Column("item_type", sa.String(100)),
+            sa.Column("product_category", sa.String(100)),
+            sa.Column("product_subcategory", sa.String(100)),
+            sa.Column("make_brand", sa.String(100)),
+            sa.Column("model", sa.String(100)),
+            sa.Column("variant", sa.String(100)),
+            sa.Column("color", sa.String(50)),
+            sa.Column("size_capacity", sa.String(50)),
+            sa.Column("configuration", sa.String(100)),
+            sa.Column("release_year", sa.Integer(), nullable=True),
+            sa.Column("price_band", sa.String(50)),
+            sa.Column("market_segment", sa.String(100)),
+            sa.Column("verified_purchase", sa.Boolean()),
+            sa.Column("purchase_channel", sa.String(100)),
+            sa.Column("purchase_region", sa.String(100)),
+            sa.Column("usage_duration_bucket", sa.String(100)),
+            sa.Column("ownership_stage", sa.String(100)),
+            sa.Column("disposition_1", sa.String(255)),
+            sa.Column("disposition_2", sa.String(255)),
+            sa.Column("disposition_3", sa.String(255)),
+            sa.Column("disposition_4", sa.String(255)),
+            sa.Column("disposition_5", sa.String(255)),
+            sa.Column("sentiment", sa.String(50)),
+            sa.Column("raw_llm_response", sa.JSON(), nullable=True),
+            sa.Column("created_at", sa.DateTime()),
+        ],
+    }
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, columns in _columns().items():
+        if not inspector.has_table(table):
+            op.create_table(table, *columns)
+            if table == "preprocessed_feedback":
+                op.create_index("ix_preprocessed_feedback_text_hash", "preprocessed_feedback", ["text_hash"], unique=True)
+            continue
+        # Databases from before the baseline lack some (nullable) columns,
+        # e.g. classified_insights.sentiment
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column)
+
+
+def downgrade():
+    op.drop_table("classified_insights")
+    op.drop_table("preprocessed_feedback")
+    op.drop_table("raw_feedback")
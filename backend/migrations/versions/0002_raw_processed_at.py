@@ -0,0 +1,31 @@
+"""raw_feedback.processed_at for the batch preprocessing stage
+
+Rows that already have a preprocessed row are marked as processed so they
+are not picked up again.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [c["name"] for c in sa.inspect(op.get_bind()).get_columns("raw_feedback")]
+    if "processed_at" not in columns:
+        op.add_column("raw_feedback", sa.Column("processed_at", sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE raw_feedback SET processed_at = created_at "
+        "WHERE processed_at IS NULL AND id IN (SELECT raw_id FROM preprocessed_feedback)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("raw_feedback") as batch:
+        batch.drop_column("processed_at")
@@ -0,0 +1,68 @@
+"""Translation / classification caches, work queue leases, dashboard rollups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table("translation_cache"):
+        op.create_table(
+            "translation_cache",
+            sa.Column("text_hash", sa.String(32), primary_key=True),
+            sa.Column("source_language", sa.String(10)),
+            sa.Column("target_language", sa.String(10)),
+            sa.Column("translated_text", sa.Text(), nullable=False),
+            sa.Column("backend", sa.String(50)),
+            sa.Column("created_at", sa.DateTime()),
+        )
+    if not _has_table("classification_cache"):
+        op.create_table(
+            "classification_cache",
+            sa.Column("cache_key", sa.String(32), primary_key=True),
+            sa.Column("text_hash", sa.String(32), nullable=False),
+            sa.Column("model", sa.String(100), nullable=False),
+            sa.Column("prompt_version", sa.String(50), nullable=False),
+            sa.Column("result", sa.JSON(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_classification_cache_prompt_version", "classification_cache", ["prompt_version"])
+    if not _has_table("work_claims"):
+        op.create_table(
+            "work_claims",
+            sa.Column("stage", sa.String(20), primary_key=True),
+            sa.Column("item_id", sa.String(), primary_key=True),
+            sa.Column("worker_id", sa.String(100), nullable=False),
+            sa.Column("leased_until", sa.DateTime(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("claimed_at", sa.DateTime()),
+        )
+        op.create_index("ix_work_claims_leased_until", "work_claims", ["leased_until"])
+    if not _has_table("analytics_rollups"):
+        op.create_table(
+            "analytics_rollups",
+            sa.Column("dimension", sa.String(50), primary_key=True),
+            sa.Column("value", sa.String(255), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("source", sa.String(50), primary_key=True),
+            sa.Column("count", sa.Integer(), nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table("analytics_rollups")
+    op.drop_table("work_claims")
+    op.drop_table("classification_cache")
+    op.drop_table("translation_cache")
@@ -0,0 +1,32 @@
+"""classified_insights indexes for the keyset listing, filters and company drill-down
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# IF NOT EXISTS: databases set up before the migrations may already have them
+INDEXES = [
+    ("ix_classified_insights_created_at_id", ["created_at", "id"]),
+    ("ix_classified_insights_sentiment_created_at_id", ["sentiment", "created_at", "id"]),
+    ("ix_classified_insights_category_created_at_id", ["product_category", "created_at", "id"]),
+    ("ix_classified_insights_brand_lower_created_at_id", [sa.text("lower(make_brand)"), "created_at", "id"]),
+    ("ix_classified_insights_model_created_at_id", ["model", "created_at", "id"]),
+]
+
+
+def upgrade():
+    for name, columns in INDEXES:
+        op.create_index(name, "classified_insights", columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="classified_insights", if_exists=True)
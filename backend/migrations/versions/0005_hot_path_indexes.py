@@ -0,0 +1,37 @@
+"""Indexes for the pipeline backlogs, raw_feedback time/source reads and GROUP BY disposition_1
+
+ix_raw_feedback_unprocessed_created_at is partial (processed_at IS NULL) so
+the preprocessing backlog query reads only the unprocessed tail instead of
+the whole table, and the index stays small as rows get processed.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    unprocessed = sa.text("processed_at IS NULL")
+    op.create_index("ix_raw_feedback_unprocessed_created_at", "raw_feedback", ["created_at"],
+                    postgresql_where=unprocessed, sqlite_where=unprocessed, if_not_exists=True)
+    op.create_index("ix_raw_feedback_created_at", "raw_feedback", ["created_at"], if_not_exists=True)
+    op.create_index("ix_raw_feedback_source_created_at", "raw_feedback", ["source", "created_at"], if_not_exists=True)
+    op.create_index("ix_preprocessed_feedback_raw_id", "preprocessed_feedback", ["raw_id"], if_not_exists=True)
+    op.create_index("ix_preprocessed_feedback_created_at", "preprocessed_feedback", ["created_at"], if_not_exists=True)
+    op.create_index("ix_classified_insights_disposition_1", "classified_insights", ["disposition_1"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_classified_insights_disposition_1", table_name="classified_insights", if_exists=True)
+    op.drop_index("ix_preprocessed_feedback_created_at", table_name="preprocessed_feedback", if_exists=True)
+    op.drop_index("ix_preprocessed_feedback_raw_id", table_name="preprocessed_feedback", if_exists=True)
+    op.drop_index("ix_raw_feedback_source_created_at", table_name="raw_feedback", if_exists=True)
+    op.drop_index("ix_raw_feedback_created_at", table_name="raw_feedback", if_exists=True)
+    op.drop_index("ix_raw_feedback_unprocessed_created_at", table_name="raw_feedback", if_exists=True)
@@ -0,0 +1,60 @@
+"""Native uuid primary/foreign keys on Postgres
+
+36-char varchar keys become 16-byte uuid: smaller heap rows and indexes and
+cheaper joins. Other databases keep text keys (see models.GUID). The foreign
+keys are dropped for the type change and recreated under the same names.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+KEY_COLUMNS = [
+    ("raw_feedback", "id"),
+    ("preprocessed_feedback", "id"),
+    ("preprocessed_feedback", "raw_id"),
+    ("classified_insights", "id"),
+    ("classified_insights", "preprocessed_id"),
+    ("work_claims", "item_id"),
+]
+FK_TABLES = ["preprocessed_feedback", "classified_insights"]
+
+
+def _convert(to_uuid):
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    inspector = sa.inspect(bind)
+    pending = [
+        (table, column) for table, column in KEY_COLUMNS
+        if isinstance({c["name"]: c["type"] for c in inspector.get_columns(table)}[column], postgresql.UUID) != to_uuid
+    ]
+    if not pending:
+        return
+
+    foreign_keys = [(table, fk) for table in FK_TABLES for fk in inspector.get_foreign_keys(table)]
+    for table, fk in foreign_keys:
+        op.drop_constraint(fk["name"], table, type_="foreignkey")
+    for table, column in pending:
+        if to_uuid:
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE uuid USING {column}::uuid')
+        else:
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE varchar(36) USING {column}::text')
+    for table, fk in foreign_keys:
+        op.create_foreign_key(fk["name"], table, fk["referred_table"], fk["constrained_columns"], fk["referred_columns"])
+
+
+def upgrade():
+    _convert(to_uuid=True)
+
+
+def downgrade():
+    _convert(to_uuid=False)
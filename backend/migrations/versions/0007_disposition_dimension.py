@@ -0,0 +1,49 @@
+"""Disposition dimension (taxonomy + observed values) and insight <-> disposition links
+
+The rows themselves are loaded by dispositions.py (taxonomy import and
+backfill on server start, or backfill_dispositions.py).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import GUID
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table("dispositions"):
+        op.create_table(
+            "dispositions",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("normalized_name", sa.String(255), nullable=False, unique=True),
+            sa.Column("level", sa.Integer(), nullable=True),
+            sa.Column("parent_id", sa.Integer(), sa.ForeignKey("dispositions.id"), nullable=True),
+            sa.Column("origin", sa.String(20), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+        )
+    if not _has_table("insight_dispositions"):
+        op.create_table(
+            "insight_dispositions",
+            sa.Column("insight_id", GUID(), sa.ForeignKey("classified_insights.id"), primary_key=True),
+            sa.Column("position", sa.Integer(), primary_key=True),
+            sa.Column("disposition_id", sa.Integer(), sa.ForeignKey("dispositions.id"), nullable=False),
+            sa.Column("match", sa.String(20)),
+        )
+        op.create_index("ix_insight_dispositions_disposition_id", "insight_dispositions", ["disposition_id", "position"])
+
+
+def downgrade():
+    op.drop_table("insight_dispositions")
+    op.drop_table("dispositions")
@@ -0,0 +1,45 @@
+"""Near-duplicate index: MinHash signatures and LSH buckets
+
+Rows are written by preprocessing (online) and near_duplicate_backfill.py
+(existing rows).
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from models import GUID
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table("near_duplicate_signatures"):
+        op.create_table(
+            "near_duplicate_signatures",
+            sa.Column("preprocessed_id", GUID(), sa.ForeignKey("preprocessed_feedback.id"), primary_key=True),
+            sa.Column("signature", sa.LargeBinary(), nullable=False),
+            sa.Column("representative_id", GUID(), sa.ForeignKey("preprocessed_feedback.id"), nullable=True),
+            sa.Column("similarity", sa.Float(), nullable=True),
+            sa.Column("created_at", sa.DateTime()),
+        )
+        op.create_index("ix_near_duplicate_signatures_representative_id", "near_duplicate_signatures", ["representative_id"])
+    if not _has_table("near_duplicate_buckets"):
+        op.create_table(
+            "near_duplicate_buckets",
+            sa.Column("bucket", sa.String(24), primary_key=True),
+            sa.Column("preprocessed_id", GUID(), sa.ForeignKey("preprocessed_feedback.id"), primary_key=True),
+        )
+
+
+def downgrade():
+    op.drop_table("near_duplicate_buckets")
+    op.drop_table("near_duplicate_signatures")
@@ -0,0 +1,29 @@
+"""preprocessed_feedback.skipped_reason / noise_score for the noise gate
+
+Rows the gate marks as noise are left out of the classification backlog.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = [c["name"] for c in sa.inspect(op.get_bind()).get_columns("preprocessed_feedback")]
+    if "skipped_reason" not in columns:
+        op.add_column("preprocessed_feedback", sa.Column("skipped_reason", sa.String(50), nullable=True))
+    if "noise_score" not in columns:
+        op.add_column("preprocessed_feedback", sa.Column("noise_score", sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("preprocessed_feedback") as batch:
+        batch.drop_column("noise_score")
+        batch.drop_column("skipped_reason")
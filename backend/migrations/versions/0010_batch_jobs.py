@@ -0,0 +1,48 @@
+"""batch_jobs: offline bulk classification shards
+
+Written by batch_classify.py (see batch_jobs.py).
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table("batch_jobs"):
+        op.create_table(
+            "batch_jobs",
+            sa.Column("id", sa.String(40), primary_key=True),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("backend", sa.String(20), nullable=False),
+            sa.Column("model", sa.String(100), nullable=False),
+            sa.Column("prompt_version", sa.String(50), nullable=False),
+            sa.Column("request_file", sa.String(500), nullable=False),
+            sa.Column("requests", sa.Integer(), nullable=False),
+            sa.Column("remote_id", sa.String(100), nullable=True),
+            sa.Column("remote_status", sa.String(50), nullable=True),
+            sa.Column("output_file", sa.String(500), nullable=True),
+            sa.Column("error_file", sa.String(500), nullable=True),
+            sa.Column("ingest_offset", sa.Integer(), nullable=False),
+            sa.Column("ingested", sa.Integer(), nullable=False),
+            sa.Column("failed", sa.Integer(), nullable=False),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+        )
+        op.create_index("ix_batch_jobs_status", "batch_jobs", ["status"])
+
+
+def downgrade():
+    op.drop_table("batch_jobs")
@@ -0,0 +1,67 @@
+import zlib
+import hashlib
+import unicodedata
+import numpy as np
+
+# Signature layout. Changing any of these invalidates stored signatures
+# (empty both near_duplicate_* tables and rerun near_duplicate_backfill.py).
+NUM_PERMUTATIONS = 64
+# 8 bands of 8 rows: pairs at 0.9 similarity share a bucket 99% of the
+# time, pairs below ~0.6 rarely do (few candidates, few bucket rows)
+LSH_BANDS = 8
+SHINGLE_SIZE = 5
+
+_PRIME = (1 << 31) - 1
+# Fixed seed: signatures must agree across processes and restarts
+_rng = np.random.default_rng(20261017)
+_A = _rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+_B = _rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+def normalize(text: str) -> str:
+    """
+    Lowercase words only: punctuation, symbols (emoji) and whitespace runs
+    do not make feedback different.
+    """
+    kept = "".join(" " if unicodedata.category(ch)[0] in "PSZC" else ch for ch in text.lower())
+    return " ".join(kept.split())
+
+def shingles(text: str) -> set:
+    normalized = normalize(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+def signature(text: str) -> bytes:
+    """MinHash signature (NUM_PERMUTATIONS uint32), b"" for texts without words."""
+    items = shingles(text or "")
+    if not items:
+        return b""
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) % _PRIME for s in items), dtype=np.int64, count=len(items))
+    return ((np.outer(hashes, _A) + _B) % _PRIME).min(axis=0).astype("<u4").tobytes()
+
+def signature_chunk(texts) -> list:
+    # Top-level so it can be pickled for the preprocessing pool
+    return [signature(text) for text in texts]
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    if not a or not b:
+        return 0.0
+    return float(np.count_nonzero(np.frombuffer(a, dtype="<u4") == np.frombuffer(b, dtype="<u4"))) / NUM_PERMUTATIONS
+
+def best_match(sig: bytes, candidates: dict) -> tuple:
+    """(id, estimated similarity) of the candidate signature closest to `sig`."""
+    if not sig or not candidates:
+        return None, 0.0
+    ids = list(candidates)
+    matrix = np.frombuffer(b"".join(candidates[i] for i in ids), dtype="<u4").reshape(len(ids), NUM_PERMUTATIONS)
+    scores = np.count_nonzero(matrix == np.frombuffer(sig, dtype="<u4"), axis=1)
+    best = int(scores.argmax())
+    return ids[best], float(scores[best]) / NUM_PERMUTATIONS
+
+def band_keys(sig: bytes) -> list:
+    """LSH bucket of each band: near-duplicates share at least one."""
+    width = _ROWS * 4
+    return [f"{band}:{hashlib.blake2b(sig[band * width:(band + 1) * width], digest_size=8).hexdigest()}"
+            for band in range(LSH_BANDS)]
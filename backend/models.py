@@ -1,42 +1,79 @@
-from sqlalchemy import Column, String, Text, DateTime, Index, ForeignKey, JSON, Boolean, Integer
+from sqlalchemy import func, Column, String, Text, DateTime, Date, Index, ForeignKey, JSON, Boolean, Integer, Float, LargeBinary
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import relationship
 import uuid
 import datetime
 from database import Base
 
+class GUID(TypeDecorator):
+    """
+    UUID primary/foreign keys: native 16-byte uuid on Postgres, 36-char
+    text elsewhere. Values are plain strings on both, so application code
+    never sees uuid.UUID objects.
+    """
+    impl = String(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(String(36))
+
+    def process_result_value(self, value, dialect):
+        return str(value) if value is not None else None
+
 class RawFeedback(Base) :
     __tablename__ = "raw_feedback"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
     raw_text = Column(Text, nullable=False)
     source = Column(String(50)) # youtube, reddit, csv
     source_metadata = Column(JSON, nullable=True) # Storage for video_id, subreddit etc.
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True) # Set once preprocessing has seen the row (incl. duplicates)
 
     # Relationships
     preprocessed = relationship("PreprocessedFeedback", back_populates="raw", uselist=False)
 
+    __table_args__ = (
+        # Preprocessing backlog: WHERE processed_at IS NULL ORDER BY created_at.
+        # Partial, so it only holds the (small) unprocessed tail.
+        Index("ix_raw_feedback_unprocessed_created_at", "created_at",
+              postgresql_where=processed_at.is_(None), sqlite_where=processed_at.is_(None)),
+        Index("ix_raw_feedback_created_at", "created_at"),
+        Index("ix_raw_feedback_source_created_at", "source", "created_at"),
+    )
+
 class PreprocessedFeedback(Base):
     __tablename__ = "preprocessed_feedback"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    raw_id = Column(String, ForeignKey("raw_feedback.id"), nullable=False)
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
+    raw_id = Column(GUID, ForeignKey("raw_feedback.id"), nullable=False, index=True)
     cleaned_text = Column(Text, nullable=False)
     language = Column(String(10))
     is_translated = Column(Boolean, default=False)
     translated_text = Column(Text, nullable=True)
     text_hash = Column(String(32), unique=True, index=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    skipped_reason = Column(String(50), nullable=True) # Set by the noise gate (rule:<name>, model): never sent to the LLM
+    noise_score = Column(Float, nullable=True) # Noise gate model probability that the row is noise
 
     # Relationships
     raw = relationship("RawFeedback", back_populates="preprocessed")
     insight = relationship("ClassifiedInsight", back_populates="preprocessed", uselist=False)
 
+    # Classification backlog: anti-join against classified_insights.preprocessed_id
+    # (unique) in created_at order
+    __table_args__ = (
+        Index("ix_preprocessed_feedback_created_at", "created_at"),
+    )
+
 class ClassifiedInsight(Base):
     __tablename__ = "classified_insights"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    preprocessed_id = Column(String, ForeignKey("preprocessed_feedback.id"), nullable=False, unique=True)
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
+    preprocessed_id = Column(GUID, ForeignKey("preprocessed_feedback.id"), nullable=False, unique=True)
     
     # Core Identity
     item_id = Column(String(100))
@@ -75,5 +112,131 @@ class ClassifiedInsight(Base):
 
     # Relationship
     preprocessed = relationship("PreprocessedFeedback", back_populates="insight")
+    dispositions = relationship("InsightDisposition", cascade="all, delete-orphan")
+
+    # Keyset pagination (created_at, id) and the listing filters, each
+    # ordered by created_at so a filtered page is an index range scan
+    __table_args__ = (
+        Index("ix_classified_insights_created_at_id", "created_at", "id"),
+        Index("ix_classified_insights_sentiment_created_at_id", "sentiment", "created_at", "id"),
+        Index("ix_classified_insights_category_created_at_id", "product_category", "created_at", "id"),
+        # Case-insensitive brand filter: lower(make_brand) IN (...)
+        Index("ix_classified_insights_brand_lower_created_at_id", func.lower(make_brand), "created_at", "id"),
+        Index("ix_classified_insights_model_created_at_id", "model", "created_at", "id"),
+        # GROUP BY disposition_1 (company drill-down, rollup rebuilds)
+        Index("ix_classified_insights_disposition_1", "disposition_1"),
+    )
+
+class TranslationCache(Base):
+    __tablename__ = "translation_cache"
+
+    # One translation per cleaned text, so a text is never translated twice
+    text_hash = Column(String(32), primary_key=True)
+    source_language = Column(String(10))
+    target_language = Column(String(10), default="en")
+    translated_text = Column(Text, nullable=False)
+    backend = Column(String(50))
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class ClassificationCache(Base):
+    __tablename__ = "classification_cache"
+
+    # md5 of "text_hash|model|prompt_version"
+    cache_key = Column(String(32), primary_key=True)
+    text_hash = Column(String(32), nullable=False)
+    model = Column(String(100), nullable=False)
+    prompt_version = Column(String(50), nullable=False, index=True)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class NearDuplicateSignature(Base):
+    __tablename__ = "near_duplicate_signatures"
+
+    # MinHash signature of a preprocessed row's classification text and the
+    # cluster it joined; see near_duplicates.py
+    preprocessed_id = Column(GUID, ForeignKey("preprocessed_feedback.id"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+    representative_id = Column(GUID, ForeignKey("preprocessed_feedback.id"), nullable=True, index=True) # NULL: the row is a representative
+    similarity = Column(Float, nullable=True) # Estimated Jaccard similarity to the representative
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class NearDuplicateBucket(Base):
+    __tablename__ = "near_duplicate_buckets"
+
+    # LSH: one row per (band, representative); "<band>:<hash of the band>"
+    bucket = Column(String(24), primary_key=True)
+    preprocessed_id = Column(GUID, ForeignKey("preprocessed_feedback.id"), primary_key=True)
+
+class WorkClaim(Base):
+    __tablename__ = "work_claims"
+
+    # One lease per (stage, item); see work_queue.py
+    stage = Column(String(20), primary_key=True) # preprocess, classify
+    item_id = Column(GUID, primary_key=True)
+    worker_id = Column(String(100), nullable=False)
+    leased_until = Column(DateTime, nullable=False, index=True)
+    attempts = Column(Integer, default=1, nullable=False)
+    claimed_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class BatchJob(Base):
+    __tablename__ = "batch_jobs"
+
+    # One shard of an offline bulk classification (a Batch API job); its
+    # rows are the classify leases held by worker "batch:<id>". See batch_jobs.py
+    id = Column(String(40), primary_key=True) # Also the job name sent to the backend
+    status = Column(String(20), nullable=False, index=True) # exporting, exported, submitted, completed, ingested, failed
+    backend = Column(String(20), nullable=False) # openai, local
+    model = Column(String(100), nullable=False)
+    prompt_version = Column(String(50), nullable=False)
+    request_file = Column(String(500), nullable=False)
+    requests = Column(Integer, default=0, nullable=False)
+    remote_id = Column(String(100), nullable=True)
+    remote_status = Column(String(50), nullable=True)
+    output_file = Column(String(500), nullable=True)
+    error_file = Column(String(500), nullable=True)
+    ingest_offset = Column(Integer, default=0, nullable=False) # Bytes of the output file already stored
+    ingested = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+class AnalyticsRollup(Base):
+    __tablename__ = "analytics_rollups"
+
+    # Pre-aggregated counts for the dashboards; maintained by rollups.py.
+    # NULL values and sources are stored as '' so they can be part of the key.
+    dimension = Column(String(50), primary_key=True) # raw_feedback, insights, sentiment, product_category, ...
+    value = Column(String(255), primary_key=True)
+    day = Column(Date, primary_key=True)
+    source = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+class Disposition(Base):
+    __tablename__ = "dispositions"
+
+    # Disposition dimension: the taxonomy CSV plus every distinct value the
+    # model produced that matched nothing in it; see dispositions.py
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(255), nullable=False) # Canonical spelling
+    normalized_name = Column(String(255), nullable=False, unique=True) # dispositions.normalize(name)
+    level = Column(Integer, nullable=True) # Taxonomy level (1-5) it was defined at / first seen at
+    parent_id = Column(Integer, ForeignKey("dispositions.id"), nullable=True)
+    origin = Column(String(20), nullable=False, default="taxonomy") # taxonomy, observed
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class InsightDisposition(Base):
+    __tablename__ = "insight_dispositions"
+
+    # ClassifiedInsight.disposition_<position> -> Disposition
+    insight_id = Column(GUID, ForeignKey("classified_insights.id"), primary_key=True)
+    position = Column(Integer, primary_key=True) # 1-5
+    disposition_id = Column(Integer, ForeignKey("dispositions.id"), nullable=False)
+    match = Column(String(20)) # exact, normalized, fuzzy, new
+
+    # "Top issues": GROUP BY disposition_id over this narrow table
+    __table_args__ = (
+        Index("ix_insight_dispositions_disposition_id", "disposition_id", "position"),
+    )
 
 # Note: Deleted old Feedback table to enforce new 3-layer schema
@@ -0,0 +1,51 @@
+import os
+import sys
+import argparse
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import minhash
+import near_duplicates
+import observability
+import preprocess_pool
+from database import SessionLocal
+from migrate import upgrade_database
+
+def near_duplicate_backfill(batch_size: int = 2000, threshold: float = near_duplicates.NEAR_DUPLICATE_THRESHOLD,
+                            processes: int = preprocess_pool.PREPROCESS_PROCESSES) -> dict:
+    """
+    Signs and clusters every preprocessed row that is not in the
+    near-duplicate index yet (rows preprocessed before it existed, or with
+    NEAR_DUPLICATES_ENABLED off), then reports how many LLM calls the
+    clusters save. Safe to rerun, also next to the server.
+    """
+    upgrade_database()
+    near_duplicates.NEAR_DUPLICATES.threshold = threshold
+    pool = preprocess_pool.POOL
+    pool.processes = processes
+    db = SessionLocal()
+    try:
+        print(f"Indexing preprocessed rows (threshold {threshold}, {processes} process(es))...")
+        totals = near_duplicates.backfill(db, batch_size, sign=lambda texts: pool.map(minhash.signature_chunk, texts))
+        print(f"Indexed {totals['rows']} rows: {totals['representatives']} representatives, {totals['members']} near-duplicates.")
+        stats = near_duplicates.NEAR_DUPLICATES.stats(db)
+        print(f"Index: {stats['signatures']} rows, {stats['members']} near-duplicates in total. "
+              f"{stats['unclassified_members']} unclassified near-duplicates will reuse their representative's insight "
+              f"instead of an LLM call.")
+        return {**totals, **stats}
+    finally:
+        db.close()
+        pool.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the near-duplicate (MinHash LSH) index over existing preprocessed rows.")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=near_duplicates.NEAR_DUPLICATE_THRESHOLD,
+                        help="estimated Jaccard similarity from which a row joins a cluster")
+    parser.add_argument("--processes", type=int, default=preprocess_pool.PREPROCESS_PROCESSES,
+                        help="worker processes for computing signatures")
+    args = parser.parse_args()
+    observability.configure_logging()
+    near_duplicate_backfill(args.batch_size, args.threshold, args.processes)
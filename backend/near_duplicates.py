@@ -0,0 +1,205 @@
+import os
+import logging
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+import models
+import observability
+from database import dialect_insert, in_chunks
+from minhash import signature_chunk, best_match, band_keys
+
+logger = logging.getLogger("signalyze.pipeline")
+
+# Whether preprocessing indexes rows and classification reuses the
+# representative's insight for near-duplicates
+NEAR_DUPLICATES_ENABLED = os.getenv("NEAR_DUPLICATES_ENABLED", "true").lower() in ("1", "true", "yes")
+# Estimated Jaccard similarity (of character shingles) from which a row
+# reuses its representative's insight. High on purpose: one inserted "not"
+# in a long review barely changes the shingles.
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+
+class NearDuplicateIndex:
+    """
+    Clusters near-identical feedback so only one row per cluster is sent to
+    the LLM.
+    - assign(): new rows are compared (MinHash estimate) with the
+      representatives sharing an LSH bucket; above `threshold` they join the
+      best one's cluster, otherwise they become a representative themselves.
+      Only representatives are bucketed, so clusters never chain.
+    - lookup(): rows about to be classified reuse their representative's
+      insight, or follow another row of their cluster in the same batch.
+    """
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, enabled: bool = NEAR_DUPLICATES_ENABLED):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.representatives = 0
+        self.members = 0
+        self.reused = 0
+        self.followed = 0
+
+    def _candidates(self, db: Session, keys) -> dict:
+        buckets = {}
+        for chunk in in_chunks(keys):
+            for bucket, preprocessed_id in db.query(models.NearDuplicateBucket.bucket, models.NearDuplicateBucket.preprocessed_id)\
+                    .filter(models.NearDuplicateBucket.bucket.in_(chunk)):
+                buckets.setdefault(bucket, []).append(preprocessed_id)
+        return buckets
+
+    def _signatures(self, db: Session, ids) -> dict:
+        found = {}
+        for chunk in in_chunks(ids):
+            found.update(db.query(models.NearDuplicateSignature.preprocessed_id, models.NearDuplicateSignature.signature)
+                         .filter(models.NearDuplicateSignature.preprocessed_id.in_(chunk)))
+        return found
+
+    def assign(self, db: Session, items) -> dict:
+        """
+        Indexes (preprocessed id, signature) pairs in arrival order, staging
+        the rows in the caller's transaction. Returns the number of new
+        representatives and members.
+        """
+        items = list(items)
+        if not items:
+            return {"representatives": 0, "members": 0}
+        keys = {item_id: band_keys(sig) for item_id, sig in items if sig}
+        buckets = self._candidates(db, {key for item_keys in keys.values() for key in item_keys})
+        signatures = self._signatures(db, {rep_id for ids in buckets.values() for rep_id in ids})
+
+        rows, bucket_rows = [], []
+        counts = {"representatives": 0, "members": 0}
+        for item_id, sig in items:
+            row = {"preprocessed_id": item_id, "signature": sig, "representative_id": None, "similarity": None}
+            rows.append(row)
+            if not sig:
+                continue
+            candidates = {rep_id: signatures[rep_id] for key in keys[item_id] for rep_id in buckets.get(key, ())
+                          if signatures.get(rep_id)}
+            best_id, best = best_match(sig, candidates)
+            if best_id is not None and best >= self.threshold:
+                row["representative_id"], row["similarity"] = best_id, round(best, 4)
+                counts["members"] += 1
+                continue
+            # New representative, also visible to the rest of this batch
+            counts["representatives"] += 1
+            signatures[item_id] = sig
+            for key in keys[item_id]:
+                buckets.setdefault(key, []).append(item_id)
+                bucket_rows.append({"bucket": key, "preprocessed_id": item_id})
+
+        table = models.NearDuplicateSignature.__table__
+        db.execute(dialect_insert(db, table).on_conflict_do_nothing(index_elements=["preprocessed_id"]), rows)
+        if bucket_rows:
+            table = models.NearDuplicateBucket.__table__
+            db.execute(dialect_insert(db, table).on_conflict_do_nothing(index_elements=["bucket", "preprocessed_id"]), bucket_rows)
+        self.representatives += counts["representatives"]
+        self.members += counts["members"]
+        return counts
+
+    def _cluster_results(self, db: Session, cluster_ids) -> dict:
+        """An LLM result per cluster with a classified row (representative first)."""
+        signatures, insights = models.NearDuplicateSignature, models.ClassifiedInsight
+        results = {}
+        for chunk in in_chunks(cluster_ids):
+            for rep_id, result in db.query(signatures.representative_id, insights.raw_llm_response)\
+                    .join(insights, insights.preprocessed_id == signatures.preprocessed_id)\
+                    .filter(signatures.representative_id.in_(chunk)):
+                if result:
+                    results.setdefault(rep_id, result)
+            for rep_id, result in db.query(insights.preprocessed_id, insights.raw_llm_response)\
+                    .filter(insights.preprocessed_id.in_(chunk)):
+                if result:
+                    results[rep_id] = result
+        return results
+
+    def lookup(self, db: Session, item_ids, resolved=()) -> tuple:
+        """
+        For rows about to be classified, returns (reused, followers):
+        - reused: {preprocessed id: the LLM result of an already classified
+          row of its cluster, preferably the representative}
+        - followers: {preprocessed id: id of the row whose result it takes}
+          for clusters without one: the representative when it is in
+          `item_ids` or `resolved` (rows of the same batch that already have
+          a result), otherwise the cluster's first row in `item_ids`
+        """
+        item_ids = list(item_ids)
+        signatures = models.NearDuplicateSignature
+        clusters = {}
+        for chunk in in_chunks(item_ids):
+            for item_id, rep_id in db.query(signatures.preprocessed_id, signatures.representative_id)\
+                    .filter(signatures.preprocessed_id.in_(chunk), signatures.signature != b""):
+                clusters[item_id] = rep_id or item_id
+        if not clusters:
+            return {}, {}
+        results = self._cluster_results(db, set(clusters.values()))
+
+        reused, followers, leaders = {}, {}, {}
+        batch = set(item_ids) | set(resolved)
+        for item_id in item_ids:
+            cluster_id = clusters.get(item_id)
+            if cluster_id is None:
+                continue
+            if cluster_id in results:
+                reused[item_id] = results[cluster_id]
+                continue
+            leader = leaders.setdefault(cluster_id, cluster_id if cluster_id in batch else item_id)
+            if leader != item_id:
+                followers[item_id] = leader
+        self.reused += len(reused)
+        observability.CACHE_LOOKUPS.labels("near_duplicate", "reused").inc(len(reused))
+        return reused, followers
+
+    def followed_results(self, results: dict, followers: dict) -> dict:
+        """Results for `followers` whose leader was classified."""
+        found = {item_id: results[leader] for item_id, leader in followers.items() if results.get(leader)}
+        self.followed += len(found)
+        observability.CACHE_LOOKUPS.labels("near_duplicate", "followed").inc(len(found))
+        return found
+
+    def stats(self, db: Session = None) -> dict:
+        stats = {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "representatives_indexed": self.representatives,
+            "members_indexed": self.members,
+            # Every reuse is one classification the LLM did not have to do
+            "llm_calls_saved": self.reused + self.followed,
+        }
+        if db is not None:
+            signatures = models.NearDuplicateSignature
+            classified = exists().where(models.ClassifiedInsight.preprocessed_id == signatures.preprocessed_id)
+            stats["signatures"] = db.query(signatures).count()
+            stats["members"] = db.query(signatures).filter(signatures.representative_id.isnot(None)).count()
+            # Backlog rows that will take their representative's insight
+            stats["unclassified_members"] = db.query(signatures)\
+                .filter(signatures.representative_id.isnot(None), ~classified).count()
+        return stats
+
+NEAR_DUPLICATES = NearDuplicateIndex()
+
+def _unindexed_query(db: Session, batch_size: int):
+    indexed = exists().where(models.NearDuplicateSignature.preprocessed_id == models.PreprocessedFeedback.id)
+    return db.query(models.PreprocessedFeedback.id, models.PreprocessedFeedback.cleaned_text,
+                    models.PreprocessedFeedback.translated_text, models.PreprocessedFeedback.is_translated)\
+        .filter(~indexed)\
+        .order_by(models.PreprocessedFeedback.created_at, models.PreprocessedFeedback.id)\
+        .limit(batch_size)
+
+def backfill(db: Session, batch_size: int = 1000, sign=signature_chunk) -> dict:
+    """
+    Indexes every preprocessed row without a signature, oldest first (so
+    the earliest copy of a complaint becomes the representative). `sign`
+    maps a list of texts to signatures, e.g. through the preprocessing
+    pool. Commits per batch; safe to rerun.
+    """
+    totals = {"rows": 0, "representatives": 0, "members": 0}
+    while True:
+        rows = _unindexed_query(db, batch_size).all()
+        if not rows:
+            break
+        texts = [translated if is_translated else cleaned for _, cleaned, translated, is_translated in rows]
+        counts = NEAR_DUPLICATES.assign(db, zip([row[0] for row in rows], sign(texts)))
+        db.commit()
+        totals["rows"] += len(rows)
+        totals["representatives"] += counts["representatives"]
+        totals["members"] += counts["members"]
+        logger.info("Indexed %d rows for near-duplicates (%d members so far)", totals["rows"], totals["members"])
+    return totals
@@ -0,0 +1,276 @@
+import os
+import re
+import json
+import zlib
+import logging
+from collections import Counter
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+import models
+import observability
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+logger = logging.getLogger("signalyze.pipeline")
+
+# Whether preprocessing marks noise rows as skipped (never sent to the LLM)
+NOISE_GATE_ENABLED = os.getenv("NOISE_GATE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Model probability of "noise" from which a row is skipped. High by default:
+# a skipped complaint is lost, a classified "first!" only costs one call.
+NOISE_GATE_THRESHOLD = float(os.getenv("NOISE_GATE_THRESHOLD", "0.9"))
+# Trained by train_noise_gate.py; without it only the rules apply
+NOISE_GATE_MODEL_FILE = os.getenv("NOISE_GATE_MODEL_FILE", os.path.join(backend_dir, "noise_gate_model.npz"))
+# Texts with fewer letters than this (emoji, numbers, punctuation) are noise
+NOISE_MIN_LETTERS = int(os.getenv("NOISE_MIN_LETTERS", "3"))
+
+# An insight is noise when the LLM found none of these (all NULL)
+NOISE_FIELDS = ("product_category", "product_subcategory", "make_brand", "model",
+                "disposition_1", "disposition_2", "disposition_3", "disposition_4", "disposition_5")
+
+# Hashed feature space (2^18 weights)
+FEATURE_BITS = 18
+_MASK = (1 << FEATURE_BITS) - 1
+
+# Whole comments that never carry product feedback
+_FILLER = {
+    "first", "first comment", "lol", "lmao", "nice", "nice video", "great video", "wow", "cool", "same",
+    "thanks", "thank you", "thx", "subscribed", "ok", "okay", "yes", "no", "hi", "hello", "bump", "me too",
+    "following", "this", "great", "awesome", "love it", "noice", "op", "edit", "removed", "deleted",
+}
+_BOT = re.compile(r"\bi am a bot\b|\baction was performed automatically\b|\bbeep boop\b|\bautomoderator\b|\[bot\]",
+                  re.IGNORECASE)
+_WORD = re.compile(r"[^\W_]+")
+
+def _words(text: str) -> list:
+    return _WORD.findall(text.lower())
+
+def rule_reason(text: str):
+    """Name of the heuristic rule `text` trips, or None."""
+    if not text or not text.strip():
+        return "empty"
+    if sum(1 for ch in text if ch.isalpha()) < NOISE_MIN_LETTERS:
+        return "no_letters"
+    if _BOT.search(text):
+        return "bot"
+    if " ".join(_words(text)) in _FILLER:
+        return "filler"
+    return None
+
+def _bucket(n: int) -> str:
+    for bound in (0, 1, 2, 3, 5, 8, 13, 21, 34, 55):
+        if n <= bound:
+            return str(bound)
+    return "more"
+
+def features(text: str) -> list:
+    """Hashed feature indices: words, word pairs and a few shape features."""
+    words = _words(text or "")
+    names = [f"w:{w}" for w in words]
+    names += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    names.append(f"n:{_bucket(len(words))}")
+    names.append(f"c:{_bucket(len(text or '') // 10)}")
+    if any(ch.isdigit() for ch in text or ""):
+        names.append("digit")
+    if "?" in (text or ""):
+        names.append("question")
+    return [zlib.crc32(name.encode("utf-8")) & _MASK for name in names]
+
+def _design(texts):
+    """Feature lists as flat indices, row starts, row lengths and values."""
+    rows = [features(text) for text in texts]
+    lengths = np.array([len(row) for row in rows], dtype=np.int64)
+    indices = np.fromiter((i for row in rows for i in row), dtype=np.int64, count=int(lengths.sum()))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    # Unit-length rows: long texts do not dominate the weights
+    values = np.repeat(1.0 / np.sqrt(np.maximum(lengths, 1)), lengths)
+    return indices, starts, lengths, values
+
+def train(texts, labels, epochs: int = 200, learning_rate: float = 0.5, l2: float = 1e-6):
+    """
+    Logistic regression over hashed features, full-batch AdaGrad with
+    balanced class weights (noise is the minority). Returns (weights, bias).
+    """
+    labels = np.asarray(labels, dtype=np.float64)
+    indices, starts, lengths, values = _design(texts)
+    row_of = np.repeat(np.arange(len(labels)), lengths)
+    positives = max(labels.sum(), 1.0)
+    negatives = max(len(labels) - labels.sum(), 1.0)
+    sample_weight = np.where(labels == 1, len(labels) / (2 * positives), len(labels) / (2 * negatives))
+
+    weights = np.zeros(1 << FEATURE_BITS)
+    bias = 0.0
+    squared = np.full(1 << FEATURE_BITS, 1e-8)
+    bias_squared = 1e-8
+    for _ in range(epochs):
+        # Every text has shape features, so no row is empty
+        z = np.add.reduceat(weights[indices] * values, starts) + bias
+        error = (1.0 / (1.0 + np.exp(-z)) - labels) * sample_weight / len(labels)
+        gradient = np.zeros_like(weights)
+        np.add.at(gradient, indices, error[row_of] * values)
+        gradient += l2 * weights
+        squared += gradient ** 2
+        weights -= learning_rate * gradient / np.sqrt(squared)
+        bias_gradient = error.sum()
+        bias_squared += bias_gradient ** 2
+        bias -= learning_rate * bias_gradient / np.sqrt(bias_squared)
+    return weights.astype(np.float32), float(bias)
+
+class NoiseGate:
+    """
+    Cheap local filter in front of the LLM: heuristic rules (empty, no
+    letters, bot boilerplate, filler like "first!") and, once trained, a
+    logistic regression over hashed features whose label is "the LLM found
+    nothing" (see NOISE_FIELDS). Tens of microseconds per text.
+    """
+    def __init__(self, threshold: float = NOISE_GATE_THRESHOLD, model_file: str = NOISE_GATE_MODEL_FILE,
+                 enabled: bool = NOISE_GATE_ENABLED):
+        self.threshold = threshold
+        self.model_file = model_file
+        self.enabled = enabled
+        self.weights = None
+        self.bias = 0.0
+        self.meta = {}
+        self.counts = Counter()
+        if model_file and os.path.exists(model_file):
+            self.load(model_file)
+
+    def load(self, path: str):
+        with np.load(path) as data:
+            self.weights = data["weights"]
+            self.bias = float(data["bias"])
+            self.meta = json.loads(str(data["meta"]))
+        logger.info("Loaded noise gate model from %s (trained on %s rows)", path, self.meta.get("rows"))
+
+    def save(self, path: str):
+        np.savez_compressed(path, weights=self.weights, bias=self.bias, meta=json.dumps(self.meta))
+
+    def score(self, text: str):
+        """Model probability that `text` is noise, None without a model."""
+        if self.weights is None:
+            return None
+        idx = features(text)
+        z = self.bias + float(self.weights[idx].sum()) / len(idx) ** 0.5
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def check(self, text: str) -> tuple:
+        """(skipped reason or None, model score or None) for one text."""
+        reason = rule_reason(text)
+        if reason:
+            return f"rule:{reason}", None
+        score = self.score(text)
+        if score is not None and score >= self.threshold:
+            return "model", round(score, 4)
+        return None, round(score, 4) if score is not None else None
+
+    def check_many(self, texts) -> list:
+        results = [self.check(text) for text in texts]
+        skipped = Counter(reason for reason, _ in results if reason)
+        self.counts.update(skipped)
+        self.counts["passed"] += len(results) - sum(skipped.values())
+        observability.STAGE_ITEMS.labels("gate", "skipped").inc(sum(skipped.values()))
+        observability.STAGE_ITEMS.labels("gate", "passed").inc(len(results) - sum(skipped.values()))
+        return results
+
+    def stats(self, db: Session = None) -> dict:
+        stats = {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "model": self.meta if self.weights is not None else None,
+            "checked": dict(self.counts),
+        }
+        if db is not None:
+            stats["skipped"] = dict(db.query(models.PreprocessedFeedback.skipped_reason, func.count())
+                                    .filter(models.PreprocessedFeedback.skipped_reason.isnot(None))
+                                    .group_by(models.PreprocessedFeedback.skipped_reason).all())
+        return stats
+
+GATE = NoiseGate()
+
+def training_data(db: Session, limit: int = None) -> tuple:
+    """
+    (texts, labels) from every classified row: the text the LLM saw and 1
+    when its insight is all NULL (see NOISE_FIELDS), else 0.
+    """
+    feedback, insight = models.PreprocessedFeedback, models.ClassifiedInsight
+    query = db.query(feedback.cleaned_text, feedback.translated_text, feedback.is_translated,
+                     *[getattr(insight, field) for field in NOISE_FIELDS])\
+        .join(insight, insight.preprocessed_id == feedback.id)\
+        .order_by(feedback.id)
+    if limit:
+        query = query.limit(limit)
+    texts, labels = [], []
+    for cleaned, translated, is_translated, *values in query:
+        texts.append(translated if is_translated else cleaned)
+        labels.append(1 if all(value is None for value in values) else 0)
+    return texts, labels
+
+def evaluate(gate: NoiseGate, texts, labels, thresholds=(0.5, 0.7, 0.8, 0.9, 0.95)) -> list:
+    """
+    Precision / recall of the "noise" decision against the LLM labels, for
+    the rules alone and for rules + model at each threshold.
+    """
+    rules = [rule_reason(text) is not None for text in texts]
+    scores = [gate.score(text) for text in texts]
+    report = [_metrics("rules", rules, labels)]
+    if gate.weights is not None:
+        for threshold in thresholds:
+            predicted = [rule or score >= threshold for rule, score in zip(rules, scores)]
+            report.append(_metrics(f"rules+model@{threshold}", predicted, labels))
+    return report
+
+def _metrics(name: str, predicted, labels) -> dict:
+    tp = sum(1 for p, y in zip(predicted, labels) if p and y)
+    fp = sum(1 for p, y in zip(predicted, labels) if p and not y)
+    fn = sum(1 for p, y in zip(predicted, labels) if not p and y)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "gate": name,
+        "skipped": tp + fp,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+    }
+
+def gate_backlog(db: Session, gate: NoiseGate = None, batch_size: int = 1000) -> dict:
+    """
+    Runs the gate over unclassified rows that are not skipped yet (rows
+    preprocessed before the gate or its model existed). Commits per batch;
+    safe to rerun.
+    """
+    gate = gate or GATE
+    feedback, insight = models.PreprocessedFeedback, models.ClassifiedInsight
+    totals = Counter()
+    last_id = None
+    while True:
+        query = db.query(feedback.id, feedback.cleaned_text, feedback.translated_text, feedback.is_translated)\
+            .outerjoin(insight, insight.preprocessed_id == feedback.id)\
+            .filter(insight.id.is_(None), feedback.skipped_reason.is_(None))
+        if last_id is not None:
+            query = query.filter(feedback.id > last_id)
+        rows = query.order_by(feedback.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        results = gate.check_many([translated if is_translated else cleaned for _, cleaned, translated, is_translated in rows])
+        for (row_id, *_), (reason, score) in zip(rows, results):
+            if reason or score is not None:
+                db.query(feedback).filter(feedback.id == row_id)\
+                    .update({feedback.skipped_reason: reason, feedback.noise_score: score}, synchronize_session=False)
+            totals[reason or "passed"] += 1
+        db.commit()
+    return dict(totals)
+
+def unskip_backlog(db: Session, reasons=None) -> int:
+    """Clears the skip of unclassified rows (all, or those with `reasons`), so they get classified."""
+    feedback, insight = models.PreprocessedFeedback, models.ClassifiedInsight
+    unclassified = select(feedback.id)\
+        .outerjoin(insight, insight.preprocessed_id == feedback.id)\
+        .where(insight.id.is_(None), feedback.skipped_reason.isnot(None))
+    if reasons:
+        unclassified = unclassified.where(feedback.skipped_reason.in_(list(reasons)))
+    updated = db.query(feedback).filter(feedback.id.in_(unclassified))\
+        .update({feedback.skipped_reason: None}, synchronize_session=False)
+    db.commit()
+    return updated
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import logging
+import contextlib
+import prometheus_client
+from sqlalchemy import event
+
+# text (human readable) or json (one object per line, for log shippers)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Spans go through the OpenTelemetry API when it is installed; they are
+# no-ops until an SDK / exporter is configured for the process
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+logger = logging.getLogger("signalyze.observability")
+
+# ---------------------------------------------------------------------------
+# Logging
+# ---------------------------------------------------------------------------
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including any `extra={...}` fields."""
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """
+    Sets up the "signalyze" loggers once per process (API server, each
+    classification_worker.py process).
+    """
+    root = logging.getLogger("signalyze")
+    if getattr(root, "_signalyze_configured", False):
+        return
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    root.propagate = False
+    root._signalyze_configured = True
+
+# ---------------------------------------------------------------------------
+# Metrics (prometheus_client, default registry)
+# ---------------------------------------------------------------------------
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def counter(name: str, documentation: str, labelnames=()):
+    return prometheus_client.Counter(name, documentation, labelnames)
+
+def gauge(name: str, documentation: str, labelnames=()):
+    return prometheus_client.Gauge(name, documentation, labelnames)
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return prometheus_client.Histogram(name, documentation, labelnames, buckets=buckets)
+
+def render_metrics():
+    """Returns (body, content type) for the /metrics endpoint."""
+    return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
+
+def start_metrics_server(port: int):
+    """
+    Serves /metrics on `port` from a background thread, for processes
+    without the API (classification_worker.py).
+    """
+    prometheus_client.start_http_server(port)
+
+# Pipeline stages: ingest, preprocess, classify, commit
+STAGE_ITEMS = counter("signalyze_stage_items_total", "Items handled per pipeline stage and outcome", ["stage", "outcome"])
+STAGE_SECONDS = histogram("signalyze_stage_batch_seconds", "Duration of one batch of a pipeline stage", ["stage"])
+STAGE_ERRORS = counter("signalyze_stage_errors_total", "Batches of a pipeline stage that raised", ["stage"])
+PIPELINE_QUEUE = gauge("signalyze_pipeline_queue_batches", "Batches waiting between pipeline stages", ["queue"])
+BACKLOG = gauge("signalyze_backlog_items", "Items waiting per layer (raw: not preprocessed, preprocessed: not classified)", ["layer"])
+
+# OpenAI (all calls go through openai_scheduler)
+OPENAI_SECONDS = histogram("signalyze_openai_request_seconds", "OpenAI request latency per attempt", ["model", "outcome"],
+                           buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120))
+OPENAI_TOKENS = counter("signalyze_openai_tokens_total", "OpenAI tokens used", ["model", "kind"])
+OPENAI_RETRIES = counter("signalyze_openai_retries_total", "OpenAI requests retried", ["reason"])
+OPENAI_IN_FLIGHT = gauge("signalyze_openai_in_flight", "OpenAI requests in flight")
+OPENAI_CONCURRENCY = gauge("signalyze_openai_concurrency_limit", "Current adaptive OpenAI concurrency limit")
+
+# Caches: classification (memory / db tier), translation, response
+CACHE_LOOKUPS = counter("signalyze_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+
+# Database
+DB_QUERY_SECONDS = histogram("signalyze_db_query_seconds", "SQL statement duration", ["operation"],
+                             buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+
+def record_usage(model: str, usage):
+    """Token counts from an OpenAI response's `usage`."""
+    if usage:
+        OPENAI_TOKENS.labels(model, "prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+        OPENAI_TOKENS.labels(model, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+
+# ---------------------------------------------------------------------------
+# SQLAlchemy timings
+# ---------------------------------------------------------------------------
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return word if word in ("select", "insert", "update", "delete", "with") else "other"
+
+def instrument_engine(engine):
+    """Times every statement on `engine` into signalyze_db_query_seconds."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(_operation(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        # The failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+# ---------------------------------------------------------------------------
+# Tracing
+# ---------------------------------------------------------------------------
+
+_tracer = otel_trace.get_tracer("signalyze") if otel_trace and TRACING_ENABLED else None
+
+def _attribute(value):
+    if isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return str(value)
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """
+    OpenTelemetry span (child of the current one) or a no-op. None
+    attributes are dropped; lists become string arrays.
+    """
+    if _tracer is None:
+        yield None
+        return
+    attrs = {f"signalyze.{k}": _attribute(v) for k, v in attributes.items() if v is not None}
+    with _tracer.start_as_current_span(name, attributes=attrs) as current:
+        yield current
+
+@contextlib.contextmanager
+def stage(name: str, **attributes):
+    """
+    One batch of a pipeline stage: a span plus signalyze_stage_batch_seconds
+    and, when it raises, signalyze_stage_errors_total. Works in sync code
+    (threadpool) and across awaits.
+    """
+    started = time.perf_counter()
+    with span(f"pipeline.{name}", **attributes) as current:
+        try:
+            yield current
+        except Exception:
+            STAGE_ERRORS.labels(name).inc()
+            raise
+        finally:
+            STAGE_SECONDS.labels(name).observe(time.perf_counter() - started)
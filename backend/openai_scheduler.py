@@ -0,0 +1,173 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from openai import RateLimitError, APIStatusError, APITimeoutError, APIConnectionError
+from rate_limit import TokenBucket
+import observability
+
+logger = logging.getLogger("signalyze.openai")
+
+# Account limits (0 = unlimited) and concurrency bounds for OpenAI calls
+OPENAI_RPM = int(os.getenv("OPENAI_RPM", "0"))
+OPENAI_TPM = int(os.getenv("OPENAI_TPM", "0"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "20"))
+OPENAI_MIN_CONCURRENCY = int(os.getenv("OPENAI_MIN_CONCURRENCY", "1"))
+# Latency above which concurrency is reduced instead of increased (seconds)
+OPENAI_LATENCY_TARGET = float(os.getenv("OPENAI_LATENCY_TARGET", "20"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_BACKOFF_BASE = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+OPENAI_BACKOFF_MAX = float(os.getenv("OPENAI_BACKOFF_MAX", "60"))
+# 429s within this many seconds of the last halving count as the same
+# throttle event (a burst of in-flight requests all rejected at once)
+OPENAI_THROTTLE_COOLDOWN = float(os.getenv("OPENAI_THROTTLE_COOLDOWN", "2"))
+
+def _retry_after(error) -> float:
+    """
+    Seconds the server asked us to wait (retry-after-ms / retry-after headers).
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return 0.0
+
+def _is_retryable(error) -> bool:
+    if isinstance(error, (RateLimitError, APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+def _is_throttle(error) -> bool:
+    return isinstance(error, RateLimitError) or getattr(error, "status_code", None) == 429
+
+class OpenAIScheduler:
+    """
+    Wraps chat.completions.create with:
+    - token buckets for requests/min and tokens/min
+    - an AIMD concurrency limit: +1/limit per fast success, halved on a 429
+      (at most once per throttle_cooldown), reduced by 10% when latency
+      exceeds the target
+    - jittered exponential backoff on 429/5xx/timeouts that honours
+      retry-after headers
+    stats() reports in-flight, queued (waiting on the rate limits or a
+    slot) and throttled counts.
+    """
+    def __init__(self, rpm: int = OPENAI_RPM, tpm: int = OPENAI_TPM,
+                 max_concurrency: int = OPENAI_MAX_CONCURRENCY, min_concurrency: int = OPENAI_MIN_CONCURRENCY,
+                 latency_target: float = OPENAI_LATENCY_TARGET, max_retries: int = OPENAI_MAX_RETRIES,
+                 backoff_base: float = OPENAI_BACKOFF_BASE, backoff_max: float = OPENAI_BACKOFF_MAX,
+                 throttle_cooldown: float = OPENAI_THROTTLE_COOLDOWN):
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.throttle_cooldown = throttle_cooldown
+        self.last_decrease = None
+        self.condition = asyncio.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.throttled = 0
+        self.retries = 0
+        self.completed = 0
+        self.failed = 0
+        self.latency_ewma = 0.0
+
+    async def _acquire_slot(self):
+        async with self.condition:
+            while self.in_flight >= int(self.limit):
+                await self.condition.wait()
+            self.in_flight += 1
+
+    async def _release_slot(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def _on_success(self, latency: float):
+        self.latency_ewma = latency if not self.latency_ewma else 0.8 * self.latency_ewma + 0.2 * latency
+        if latency > self.latency_target:
+            self.limit = max(self.min_concurrency, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+
+    def _on_throttle(self):
+        self.throttled += 1
+        now = time.monotonic()
+        if self.last_decrease is not None and now - self.last_decrease < self.throttle_cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit / 2)
+
+    def _backoff(self, attempt: int, error) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        return max(delay, _retry_after(error))
+
+    async def chat_completion(self, client, estimated_tokens: int = 0, **kwargs):
+        """
+        Calls client.chat.completions.create(**kwargs) under the rate limits,
+        retrying retryable errors. Raises the last error once retries are spent.
+        """
+        attempt = 0
+        while True:
+            self.queued += 1
+            try:
+                await self.request_bucket.acquire(1)
+                await self.token_bucket.acquire(estimated_tokens)
+                await self._acquire_slot()
+            finally:
+                self.queued -= 1
+            started = time.perf_counter()
+            model = kwargs.get("model", "unknown")
+            try:
+                response = await client.chat.completions.create(**kwargs)
+            except Exception as e:
+                await self._release_slot()
+                observability.OPENAI_SECONDS.labels(model, "throttled" if _is_throttle(e) else "error")\
+                    .observe(time.perf_counter() - started)
+                if _is_throttle(e):
+                    self._on_throttle()
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self.failed += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                observability.OPENAI_RETRIES.labels(type(e).__name__).inc()
+                logger.warning("%s, retry %d/%d in %.2fs", type(e).__name__, attempt, self.max_retries, delay)
+                await asyncio.sleep(delay)
+                continue
+            await self._release_slot()
+            latency = time.perf_counter() - started
+            observability.OPENAI_SECONDS.labels(model, "ok").observe(latency)
+            observability.record_usage(model, getattr(response, "usage", None))
+            self._on_success(latency)
+            self.completed += 1
+            return response
+
+    def stats(self) -> dict:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_ewma_sec": round(self.latency_ewma, 3)
+        }
+
+SCHEDULER = OpenAIScheduler()
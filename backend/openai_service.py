@@ -1,75 +1,230 @@
 import os
 import json
+import hashlib
+import asyncio
+import logging
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from utils import estimate_tokens
+from openai_scheduler import SCHEDULER
 
 load_dotenv()
 
+logger = logging.getLogger("signalyze.openai")
+
+CLASSIFICATION_MODEL = os.getenv("CLASSIFICATION_MODEL", "gpt-4o-mini")
+
+# Multi-item classification: max items per request and input token budget per request
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "10"))
+CLASSIFY_BATCH_TOKEN_BUDGET = int(os.getenv("CLASSIFY_BATCH_TOKEN_BUDGET", "6000"))
+# Expected completion size per classified item, reserved against the tokens/min limit
+COMPLETION_TOKENS_PER_ITEM = 250
+
 def get_openai_client():
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return None
-    return AsyncOpenAI(api_key=api_key)
+    # Retries and backoff are handled by openai_scheduler
+    return AsyncOpenAI(api_key=api_key, max_retries=0)
 
 client = get_openai_client()
 
-async def analyze_feedback(text):
-    """
-    Analyzes feedback using OpenAI and returns structured JSON based on user taxonomy.
-    """
-    if not client:
-        print("OpenAI client not initialized. Check API key.")
-        return None
+TAXONOMY_FIELDS = [
+    "item_type",
+    "product_category",
+    "product_subcategory",
+    "make_brand",
+    "model",
+    "variant",
+    "color",
+    "size_capacity",
+    "configuration",
+    "release_year",
+    "price_band",
+    "market_segment",
+    "verified_purchase (true/false/null)",
+    "purchase_channel",
+    "purchase_region",
+    "usage_duration_bucket",
+    "ownership_stage",
+    "disposition_1",
+    "disposition_2",
+    "disposition_3",
+    "disposition_4",
+    "disposition_5",
+    "sentiment (Positive, Negative, Neutral)",
+]
 
-    prompt = f"""You are a product intelligence system.
-Analyze the customer feedback and return ONLY valid JSON.
+# Bare field names, as they appear in the JSON response
+TAXONOMY_KEYS = {field.split(" ")[0] for field in TAXONOMY_FIELDS}
 
-Fields:
-- item_type
-- product_category
-- product_subcategory
-- make_brand
-- model
-- variant
-- color
-- size_capacity
-- configuration
-- release_year
-- price_band
-- market_segment
-- verified_purchase (true/false/null)
-- purchase_channel
-- purchase_region
-- usage_duration_bucket
-- ownership_stage
-- disposition_1
-- disposition_2
-- disposition_3
-- disposition_4
-- disposition_5
-- sentiment (Positive, Negative, Neutral)
-
-Rules:
+TAXONOMY_RULES = """Rules:
 - Use null if not mentioned
 - Do NOT hallucinate brand/model
 - Output JSON only
-- No explanation
+- No explanation"""
+
+FIELDS_BLOCK = "Fields:\n" + "\n".join(f"- {field}" for field in TAXONOMY_FIELDS)
+
+# Changes whenever the taxonomy fields or rules change, so cached
+# classifications from an older prompt are never reused
+PROMPT_VERSION = os.getenv("PROMPT_VERSION") or hashlib.md5((FIELDS_BLOCK + TAXONOMY_RULES).encode("utf-8")).hexdigest()[:12]
+
+# Token usage across all classification requests in this process
+USAGE = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+def _record_usage(response):
+    USAGE["requests"] += 1
+    usage = getattr(response, "usage", None)
+    if usage:
+        USAGE["prompt_tokens"] += usage.prompt_tokens or 0
+        USAGE["completion_tokens"] += usage.completion_tokens or 0
+
+def classification_request(text) -> dict:
+    """
+    Chat completion arguments that classify one feedback text; shared by
+    analyze_feedback and the offline batch jobs (see batch_jobs).
+    """
+    prompt = f"""You are a product intelligence system.
+Analyze the customer feedback and return ONLY valid JSON.
+
+{FIELDS_BLOCK}
+
+{TAXONOMY_RULES}
 
 Customer feedback:
 {text}
 """
-    
+    return {
+        "model": CLASSIFICATION_MODEL,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "temperature": 0
+    }
+
+async def analyze_feedback(text):
+    """
+    Analyzes feedback using OpenAI and returns structured JSON based on user taxonomy.
+    """
+    if not client:
+        logger.error("OpenAI client not initialized. Check API key.")
+        return None
+
+    request = classification_request(text)
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0
+        response = await SCHEDULER.chat_completion(
+            client,
+            estimated_tokens=estimate_tokens(request["messages"][-1]["content"]) + COMPLETION_TOKENS_PER_ITEM,
+            **request
         )
+        _record_usage(response)
         return json.loads(response.choices[0].message.content)
     except Exception as e:
-        print(f"Error calling OpenAI: {e}")
+        logger.error("Error calling OpenAI: %s", e)
         return None
+
+def pack_batches(items, batch_size: int = CLASSIFY_BATCH_SIZE, token_budget: int = CLASSIFY_BATCH_TOKEN_BUDGET):
+    """
+    Groups (item_id, text) pairs into requests of at most `batch_size` items
+    whose texts fit into `token_budget` estimated input tokens.
+    """
+    batches, current, current_tokens = [], [], 0
+    for item_id, text in items:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= batch_size or current_tokens + tokens > token_budget):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((item_id, text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+async def _analyze_packed(batch):
+    """
+    One request for several feedback items. Returns {item_id: result} for the
+    items that came back well-formed; missing or malformed ones are left out.
+    Request errors (rate limits, timeouts left after the scheduler's
+    retries) are raised.
+    """
+    payload = [{"id": str(item_id), "text": text} for item_id, text in batch]
+    prompt = f"""You are a product intelligence system.
+Analyze EACH customer feedback item independently and return ONLY valid JSON
+of the form {{"results": [{{"id": "<item id>", <fields>}}]}} with exactly one
+entry per input id.
+
+{FIELDS_BLOCK}
+
+{TAXONOMY_RULES}
+
+Customer feedback items:
+{json.dumps(payload, ensure_ascii=False)}
+"""
+    response = await SCHEDULER.chat_completion(
+        client,
+        estimated_tokens=estimate_tokens(prompt) + COMPLETION_TOKENS_PER_ITEM * len(batch),
+        model=CLASSIFICATION_MODEL,
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        response_format={"type": "json_object"},
+        temperature=0
+    )
+    _record_usage(response)
+    try:
+        data = json.loads(response.choices[0].message.content)
+    except (ValueError, TypeError, IndexError, AttributeError) as e:
+        # Unparseable response: every item counts as malformed
+        logger.warning("Malformed OpenAI response (batch of %d): %s", len(batch), e)
+        return {}
+
+    expected = {str(item_id): item_id for item_id, _ in batch}
+    results = {}
+    for entry in data.get("results", []) if isinstance(data, dict) else []:
+        if not isinstance(entry, dict):
+            continue
+        key = str(entry.pop("id", ""))
+        if key in expected and expected[key] not in results and any(field in entry for field in TAXONOMY_KEYS):
+            results[expected[key]] = entry
+    return results
+
+async def analyze_feedback_batch(items, batch_size: int = CLASSIFY_BATCH_SIZE, token_budget: int = CLASSIFY_BATCH_TOKEN_BUDGET):
+    """
+    Classifies many (item_id, text) pairs, packing up to `batch_size` items
+    into one request so the taxonomy prompt is paid once per request.
+    Items missing from or malformed in a batch response are retried with
+    single-item analyze_feedback calls. Items of a request that failed
+    (e.g. still throttled after the scheduler's retries) are not: they
+    come back as None, so their rows keep the lease and are retried later
+    instead of multiplying requests while the account is throttled.
+    Returns {item_id: result or None}.
+    """
+    items = list(items)
+    if not client:
+        logger.error("OpenAI client not initialized. Check API key.")
+        return {item_id: None for item_id, _ in items}
+
+    batches = pack_batches(items, batch_size, token_budget)
+    packed = await asyncio.gather(*[_analyze_packed(batch) for batch in batches], return_exceptions=True)
+
+    results, failed = {}, set()
+    for batch, partial in zip(batches, packed):
+        if isinstance(partial, Exception):
+            logger.error("Error calling OpenAI (batch of %d): %s", len(batch), partial)
+            failed.update(item_id for item_id, _ in batch)
+            continue
+        results.update(partial)
+
+    missing = [(item_id, text) for item_id, text in items if item_id not in results and item_id not in failed]
+    if missing:
+        logger.warning("%d of %d items missing from batch responses, retrying individually", len(missing), len(items))
+        fallback = await asyncio.gather(*[analyze_feedback(text) for _, text in missing])
+        for (item_id, _), result in zip(missing, fallback):
+            results[item_id] = result
+    for item_id in failed:
+        results[item_id] = None
+    return results
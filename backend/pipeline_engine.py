@@ -0,0 +1,194 @@
+import os
+import asyncio
+import logging
+from database import SessionLocal, engine, run_db
+from pipeline_events import EVENTS, RAW, PREPROCESSED
+from pipelines.preprocessing import preprocess_raw_batch
+from classification_service import claim_texts, classify_texts, persist_results
+from work_queue import default_worker_id
+
+# Concurrent workers per stage. Preprocessing and persisting write to the
+# database (SQLite has a single writer), classification waits on OpenAI.
+PIPELINE_PREPROCESS_CONCURRENCY = int(os.getenv("PIPELINE_PREPROCESS_CONCURRENCY", "1"))
+PIPELINE_CLASSIFY_CONCURRENCY = int(os.getenv("PIPELINE_CLASSIFY_CONCURRENCY", "4"))
+PIPELINE_CLASSIFY_BATCH_SIZE = int(os.getenv("PIPELINE_CLASSIFY_BATCH_SIZE", "20"))
+# Claimed batches waiting for a classification worker; when it is full the
+# claim stage stops claiming (backpressure), so leases are not taken early
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+# Seconds an idle stage waits for a notification before looking anyway
+# (covers writers in processes that cannot notify this one)
+PIPELINE_IDLE_TIMEOUT = float(os.getenv("PIPELINE_IDLE_TIMEOUT", "30"))
+# Pause after an unexpected error, so a broken database is not hammered
+PIPELINE_ERROR_BACKOFF = 1.0
+
+logger = logging.getLogger("signalyze.pipeline")
+
+class PipelineEngine:
+    """
+    RAW -> CLEANED -> CLASSIFIED as concurrent stages:
+
+        preprocess (xP) --notify--> claim --[classify queue]--> classify (xC) --[persist queue]--> persist
+
+    - preprocess: set-based batches (preprocess_raw_batch), woken by
+      ingestion through pipeline_events instead of a sleep
+    - claim: leases unclassified rows (woken by preprocessing) while there
+      is room for another batch in flight
+    - classify: cache lookups and OpenAI calls, several batches at once
+    - persist: one writer committing insights, cache entries and leases;
+      batches that queued up meanwhile share a transaction
+    Each worker has its own session.
+    """
+    def __init__(self, preprocess_concurrency: int = PIPELINE_PREPROCESS_CONCURRENCY,
+                 classify_concurrency: int = PIPELINE_CLASSIFY_CONCURRENCY,
+                 classify_batch_size: int = PIPELINE_CLASSIFY_BATCH_SIZE,
+                 queue_size: int = PIPELINE_QUEUE_SIZE, idle_timeout: float = PIPELINE_IDLE_TIMEOUT):
+        self.preprocess_concurrency = preprocess_concurrency
+        self.classify_concurrency = classify_concurrency
+        self.classify_batch_size = classify_batch_size
+        self.queue_size = queue_size
+        self.idle_timeout = idle_timeout
+        self.worker_id = default_worker_id()
+        self.classify_queue = None
+        self.persist_queue = None
+        self.capacity = None
+        self.classifying = 0
+        self.last_preprocess = {}
+        self.totals = {"preprocessed": 0, "claimed": 0, "classified": 0, "persisted": 0, "errors": 0}
+
+    async def _preprocess_worker(self, index: int):
+        db = SessionLocal()
+        worker_id = f"{self.worker_id}:preprocess:{index}"
+        try:
+            while True:
+                # Cleared before looking, so rows committed meanwhile wake us again
+                EVENTS.clear(RAW)
+                try:
+                    stats = await preprocess_raw_batch(db, worker_id=worker_id)
+                except Exception as e:
+                    logger.error("Preprocessing batch error: %s", e, exc_info=True)
+                    self.totals["errors"] += 1
+                    await run_db(db.rollback)
+                    await asyncio.sleep(PIPELINE_ERROR_BACKOFF)
+                    continue
+                self.last_preprocess = stats
+                if stats["fetched"]:
+                    self.totals["preprocessed"] += stats["fetched"]
+                    logger.info("Preprocessed %d raw rows (%d new, %d duplicates) at %s items/sec",
+                                stats["fetched"], stats["inserted"], stats["duplicates"], stats["items_per_sec"],
+                                extra={"stage": "preprocess", "stats": stats})
+                    continue
+                await EVENTS.wait(RAW, timeout=self.idle_timeout)
+        finally:
+            db.close()
+
+    async def _claim_worker(self):
+        db = SessionLocal()
+        worker_id = f"{self.worker_id}:classify"
+        try:
+            while True:
+                # One slot per batch between claim and commit
+                await self.capacity.acquire()
+                EVENTS.clear(PREPROCESSED)
+                try:
+                    texts = await run_db(claim_texts, db, self.classify_batch_size, worker_id)
+                except Exception as e:
+                    self.capacity.release()
+                    logger.error("Claiming classification batch failed: %s", e, exc_info=True)
+                    self.totals["errors"] += 1
+                    await run_db(db.rollback)
+                    await asyncio.sleep(PIPELINE_ERROR_BACKOFF)
+                    continue
+                if texts:
+                    self.totals["claimed"] += len(texts)
+                    await self.classify_queue.put(texts)
+                    continue
+                self.capacity.release()
+                await EVENTS.wait(PREPROCESSED, timeout=self.idle_timeout)
+        finally:
+            db.close()
+
+    async def _classify_worker(self):
+        # Only reads (cache lookups); results are written by the persist stage
+        db = SessionLocal()
+        try:
+            while True:
+                texts = await self.classify_queue.get()
+                self.classifying += 1
+                try:
+                    by_id = await classify_texts(db, texts, store=False)
+                except Exception as e:
+                    logger.error("Classification batch error: %s", e, exc_info=True)
+                    self.totals["errors"] += 1
+                    by_id = {}
+                finally:
+                    self.classifying -= 1
+                    await run_db(db.rollback)
+                await self.persist_queue.put((texts, by_id))
+        finally:
+            db.close()
+
+    async def _persist_worker(self):
+        db = SessionLocal()
+        try:
+            while True:
+                batches = [await self.persist_queue.get()]
+                while not self.persist_queue.empty():
+                    batches.append(self.persist_queue.get_nowait())
+                texts = [item for batch_texts, _ in batches for item in batch_texts]
+                by_id = {}
+                for _, batch_results in batches:
+                    by_id.update(batch_results)
+                try:
+                    stored = await run_db(persist_results, db, texts, by_id, True)
+                    self.totals["classified"] += sum(1 for item_id, _ in texts if by_id.get(item_id))
+                    self.totals["persisted"] += stored
+                    if stored:
+                        logger.info("Classified %d records", stored, extra={"stage": "classify", "classified": stored})
+                except Exception as e:
+                    logger.error("Persisting insights failed: %s", e, exc_info=True)
+                    self.totals["errors"] += 1
+                    await run_db(db.rollback)
+                finally:
+                    for _ in batches:
+                        self.capacity.release()
+        finally:
+            db.close()
+
+    async def run(self):
+        """Runs every stage until cancelled."""
+        EVENTS.bind()
+        try:
+            EVENTS.listen(engine)
+        except Exception as e:
+            logger.warning("LISTEN unavailable, stages poll every %ss: %s", self.idle_timeout, e)
+        self.classify_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.persist_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.capacity = asyncio.Semaphore(self.queue_size + self.classify_concurrency)
+
+        logger.info("Starting pipeline (%d preprocess, %d classify workers)",
+                    self.preprocess_concurrency, self.classify_concurrency)
+        tasks = [asyncio.create_task(self._preprocess_worker(i)) for i in range(self.preprocess_concurrency)]
+        tasks.append(asyncio.create_task(self._claim_worker()))
+        tasks += [asyncio.create_task(self._classify_worker()) for _ in range(self.classify_concurrency)]
+        tasks.append(asyncio.create_task(self._persist_worker()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            EVENTS.close()
+
+    def queue_depths(self) -> dict:
+        return {
+            "classify": self.classify_queue.qsize() if self.classify_queue else 0,
+            "persist": self.persist_queue.qsize() if self.persist_queue else 0,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "preprocess": self.last_preprocess,
+            "queues": self.queue_depths(),
+            "classifying": self.classifying,
+            "totals": dict(self.totals),
+            "events": EVENTS.stats(),
+        }
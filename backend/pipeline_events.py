@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import threading
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# Channels (also the Postgres NOTIFY channel names)
+RAW = "signalyze_raw"
+PREPROCESSED = "signalyze_preprocessed"
+CHANNELS = (RAW, PREPROCESSED)
+
+logger = logging.getLogger("signalyze.pipeline")
+
+class PipelineEvents:
+    """
+    Wakes pipeline stages when new work is committed, instead of polling.
+    - In-process: one asyncio.Event per channel, set thread-safely (writers
+      run in the threadpool)
+    - Across processes (Postgres): NOTIFY inside the writing transaction,
+      so it is delivered only on commit, and a LISTEN connection per process
+      that sets the local events
+    """
+    def __init__(self):
+        self.loop = None
+        self.events = {}
+        self.lock = threading.Lock()
+        self.listener = None
+        self.received = {channel: 0 for channel in CHANNELS}
+
+    def bind(self, loop: asyncio.AbstractEventLoop = None):
+        """Creates the events on `loop` (the running loop by default)."""
+        with self.lock:
+            self.loop = loop or asyncio.get_running_loop()
+            self.events = {channel: asyncio.Event() for channel in CHANNELS}
+
+    def notify(self, channel: str):
+        """Wakes this process's waiters on `channel`. Safe from any thread."""
+        with self.lock:
+            loop, ev = self.loop, self.events.get(channel)
+        if loop is None or ev is None or loop.is_closed():
+            return
+        self.received[channel] += 1
+        try:
+            loop.call_soon_threadsafe(ev.set)
+        except RuntimeError:
+            # Loop shut down between the check and the call
+            pass
+
+    def clear(self, *channels):
+        for channel in channels:
+            ev = self.events.get(channel)
+            if ev is not None:
+                ev.clear()
+
+    async def wait(self, *channels, timeout: float) -> bool:
+        """
+        Waits until any of `channels` is notified or `timeout` seconds pass.
+        Returns True when notified. Callers clear() before looking for work,
+        so a notification that arrives while they work is not lost.
+        """
+        events = [self.events[channel] for channel in channels if channel in self.events]
+        if not events:
+            await asyncio.sleep(timeout)
+            return False
+        waiters = [asyncio.ensure_future(ev.wait()) for ev in events]
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            return bool(done)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+
+    def announce(self, db: Session, channel: str):
+        """
+        Records that `db`'s open transaction creates work on `channel`.
+        Waiters are woken after it commits (nothing happens on rollback).
+        """
+        pending = db.info.get("pipeline_announcements")
+        if pending is None:
+            pending = db.info["pipeline_announcements"] = set()
+            event.listen(db, "after_commit", self._committed)
+            event.listen(db, "after_rollback", lambda session: session.info["pipeline_announcements"].clear())
+        if channel not in pending and db.get_bind().dialect.name == "postgresql":
+            # Transactional: delivered to listeners on commit only
+            db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": channel})
+        pending.add(channel)
+
+    def _committed(self, session: Session):
+        pending = session.info["pipeline_announcements"]
+        for channel in pending:
+            self.notify(channel)
+        pending.clear()
+
+    def listen(self, engine) -> bool:
+        """
+        LISTENs on every channel with a dedicated Postgres connection whose
+        socket is watched by the event loop. No-op (False) on other databases.
+        Call after bind().
+        """
+        if engine.dialect.name != "postgresql" or self.loop is None:
+            return False
+        raw = engine.raw_connection()
+        # Ours for good: never returned to the pool with autocommit set
+        raw.detach()
+        connection = raw.driver_connection
+        connection.set_isolation_level(0)  # autocommit: LISTEN takes effect at once
+        with connection.cursor() as cursor:
+            for channel in CHANNELS:
+                cursor.execute(f"LISTEN {channel}")
+
+        def on_readable():
+            try:
+                connection.poll()
+            except Exception as e:
+                logger.error("LISTEN connection failed: %s", e)
+                self.loop.remove_reader(connection.fileno())
+                return
+            while connection.notifies:
+                notification = connection.notifies.pop(0)
+                if notification.channel in CHANNELS:
+                    self.notify(notification.channel)
+
+        self.loop.add_reader(connection.fileno(), on_readable)
+        self.listener = raw
+        logger.info("Listening for pipeline notifications on %s", ", ".join(CHANNELS))
+        return True
+
+    def close(self):
+        if self.listener is not None:
+            try:
+                self.loop.remove_reader(self.listener.driver_connection.fileno())
+            finally:
+                self.listener.close()
+                self.listener = None
+
+    def stats(self) -> dict:
+        return {"listening": self.listener is not None, "notifications": dict(self.received)}
+
+EVENTS = PipelineEvents()
+
+def announce(db: Session, channel: str):
+    EVENTS.announce(db, channel)
@@ -1,6 +1,15 @@
+import logging
 from sqlalchemy.orm import Session
 import models
-from openai_service import analyze_feedback as classify_feedback
+import rollups
+import observability
+import dispositions
+import response_cache
+from database import run_db
+from classification_cache import classify_with_cache
+from work_queue import claim, release, default_worker_id
+
+logger = logging.getLogger("signalyze.pipeline")
 
 def clean_val(val):
     if val is None: return None
@@ -8,25 +17,11 @@ def clean_val(val):
         return None
     return val
 
-async def classify_preprocessed_item(db: Session, preprocessed_id: str):
-    item = db.query(models.PreprocessedFeedback).filter(models.PreprocessedFeedback.id == preprocessed_id).first()
-    if not item: return None
-
-    # De-duplication check: Don't classify if already classified
-    existing = db.query(models.ClassifiedInsight).filter(models.ClassifiedInsight.preprocessed_id == preprocessed_id).first()
-    if existing: 
-        print(f"PIPELINE: Item {preprocessed_id} already classified. Skipping.")
-        return existing
-
-    # Use translated text if available, else cleaned text
-    text_to_classify = item.translated_text if item.is_translated else item.cleaned_text
-    
-    # AI Classification
-    result = await classify_feedback(text_to_classify)
-    if not result: return None
-
-    # Map to Schema with NULL handling
-    insight = models.ClassifiedInsight(
+def build_insight(preprocessed_id: str, result: dict):
+    """
+    Maps one LLM result onto a ClassifiedInsight row with NULL handling.
+    """
+    return models.ClassifiedInsight(
         preprocessed_id=preprocessed_id,
         item_id=clean_val(result.get("item_id")),
         item_type=clean_val(result.get("item_type")),
@@ -55,6 +50,66 @@ async def classify_preprocessed_item(db: Session, preprocessed_id: str):
         raw_llm_response=result
     )
 
-    db.add(insight)
-    db.commit()
+def _load_for_classification(db: Session, preprocessed_id: str, worker_id: str):
+    """
+    Leases the row (see work_queue.claim) so the classify stage does not
+    send it to OpenAI as well, and loads it. Returns (item, existing
+    insight or None, leased).
+    """
+    leased = bool(claim(db, "classify", worker_id, 1, item_ids=[preprocessed_id]))
+    item = db.query(models.PreprocessedFeedback).filter(models.PreprocessedFeedback.id == preprocessed_id).first()
+    existing = None
+    if item:
+        existing = db.query(models.ClassifiedInsight).filter(models.ClassifiedInsight.preprocessed_id == preprocessed_id).first()
+    return item, existing, leased
+
+def _store_insight(db: Session, insight):
+    with observability.stage("commit", preprocessed_id=insight.preprocessed_id):
+        db.add(insight)
+        canonical = dispositions.link_insights(db, [insight])
+        rollups.record_insights(db, [insight], canonical)
+        release(db, "classify", [insight.preprocessed_id])
+        db.commit()
+    observability.STAGE_ITEMS.labels("commit", "ok").inc()
+    response_cache.invalidate()
+    db.refresh(insight)
     return insight
+
+async def classify_preprocessed_item(db: Session, preprocessed_id: str):
+    """
+    Classifies one preprocessed row inline (e.g. for /classify) under a
+    work_queue lease. Returns the insight, or None if the row does not
+    exist, is noise, failed, or is being classified by another worker.
+    Failed rows keep their lease and are retried by the classify stage
+    once it expires.
+    """
+    # DB work runs in the threadpool (see database.run_db)
+    item, existing, leased = await run_db(_load_for_classification, db, preprocessed_id, default_worker_id())
+    if not item: return None
+
+    # De-duplication check: Don't classify if already classified
+    if existing: 
+        logger.info("Item %s already classified. Skipping.", preprocessed_id)
+        return existing
+    if item.skipped_reason:
+        logger.info("Item %s was filtered as noise (%s). Skipping.", preprocessed_id, item.skipped_reason)
+        return None
+    if not leased:
+        logger.info("Item %s is being classified by another worker. Skipping.", preprocessed_id)
+        return None
+
+    with observability.stage("classify", mode="single", preprocessed_id=preprocessed_id):
+        # Use translated text if available, else cleaned text
+        text_to_classify = item.translated_text if item.is_translated else item.cleaned_text
+
+        # AI Classification
+        result = (await classify_with_cache(db, [(preprocessed_id, text_to_classify)], mode="single")).get(preprocessed_id)
+        if not result:
+            observability.STAGE_ITEMS.labels("classify", "failed").inc()
+            return None
+
+        # Map to Schema with NULL handling
+        insight = build_insight(preprocessed_id, result)
+    observability.STAGE_ITEMS.labels("classify", "classified").inc()
+
+    return await run_db(_store_insight, db, insight)
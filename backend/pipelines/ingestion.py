@@ -1,15 +1,150 @@
+import os
+import time
+import uuid
+import datetime
+import pandas as pd
 from sqlalchemy.orm import Session
 import models
-from utils import clean_text, get_text_hash
+import rollups
+import observability
+import pipeline_events
+import response_cache
+from database import run_db
+
+# Rows read from an uploaded CSV per chunk (one INSERT per chunk)
+CSV_CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "5000"))
+
+# Max rows per INSERT statement for batch ingestion
+RAW_INSERT_BATCH_SIZE = int(os.getenv("RAW_INSERT_BATCH_SIZE", "1000"))
+
+# Common column names for feedback
+TEXT_COLUMNS = ['text', 'comment', 'review', 'body', 'content', 'feedback']
+
+# In-process progress registry for CSV ingestion jobs, keyed by job id
+INGEST_JOBS = {}
+MAX_TRACKED_JOBS = 100
 
 async def ingest_raw_data(db: Session, raw_text: str, source: str, metadata: dict = None):
     # Step 1: Just store raw data as it comes
-    raw_item = models.RawFeedback(
-        raw_text=raw_text,
-        source=source,
-        source_metadata=metadata
-    )
-    db.add(raw_item)
-    db.commit()
-    db.refresh(raw_item)
-    return raw_item
+    raw_id = (await ingest_raw_batch(db, [raw_text], source, metadata))[0]
+    return await run_db(db.get, models.RawFeedback, raw_id)
+
+def _detect_text_column(columns):
+    text_col = next((col for col in TEXT_COLUMNS if col in columns), None)
+    # Fallback: Use the first column if no known name matches
+    return text_col if text_col else columns[0]
+
+def _insert_raw_rows(db: Session, items, source: str, metadata: dict, batch_size: int, commit: bool, notify: bool = True):
+    now = datetime.datetime.utcnow()
+    ids = []
+    rows = []
+    with observability.stage("ingest", source=source, items=len(items)):
+        for text in items:
+            raw_id = str(uuid.uuid4())
+            ids.append(raw_id)
+            rows.append({
+                "id": raw_id,
+                "raw_text": text,
+                "source": source,
+                "source_metadata": metadata,
+                "created_at": now
+            })
+            if len(rows) >= batch_size:
+                db.execute(models.RawFeedback.__table__.insert(), rows)
+                rows = []
+        if rows:
+            db.execute(models.RawFeedback.__table__.insert(), rows)
+        # Dashboard counters, in the same transaction as the rows
+        rollups.record_raw(db, source, now, len(ids))
+        if notify and ids:
+            # Wakes the preprocessing stage once the rows are committed
+            pipeline_events.announce(db, pipeline_events.RAW)
+
+        if commit and ids:
+            db.commit()
+            response_cache.invalidate(response_cache.ANALYTICS)
+    observability.STAGE_ITEMS.labels("ingest", "inserted").inc(len(ids))
+    return ids
+
+async def ingest_raw_batch(db: Session, items, source: str, metadata: dict = None, batch_size: int = RAW_INSERT_BATCH_SIZE,
+                           commit: bool = True, notify: bool = True):
+    """
+    Stores many raw texts at once.
+    UUIDs are generated client-side so no refresh is needed, rows are written
+    with one executemany INSERT per `batch_size` items and committed once.
+    The inserts run in the threadpool (see database.run_db).
+    notify=False leaves the rows for the caller to process instead of
+    waking the background pipeline.
+    Returns the list of new raw_feedback ids in input order.
+    """
+    return await run_db(_insert_raw_rows, db, list(items), source, metadata, batch_size, commit, notify)
+
+def _ingest_next_chunk(db: Session, reader, text_col: str, filename: str, chunksize: int):
+    """
+    Parses the next CSV chunk and inserts it. Returns the number of rows
+    stored, or None once the reader is exhausted.
+    """
+    chunk = next(reader, None)
+    if chunk is None:
+        return None
+    texts = [t for t in chunk[text_col].dropna() if t and t.lower() != 'nan']
+    return len(_insert_raw_rows(db, texts, 'csv', {"filename": filename}, chunksize, True))
+
+async def ingest_csv_stream(db: Session, fileobj, filename: str, chunksize: int = CSV_CHUNK_SIZE, job_id: str = None):
+    """
+    Streams a CSV file into raw_feedback in fixed-size chunks.
+    Only one chunk is held in memory at a time and each chunk is committed
+    with one INSERT. Progress is published in INGEST_JOBS[job_id]; pass a
+    `job_id` to poll /ingest/jobs/{job_id} while the upload is running.
+    """
+    job_id = job_id or str(uuid.uuid4())
+    if INGEST_JOBS.get(job_id, {}).get("status") == "running":
+        raise ValueError(f"Ingest job {job_id} is already running")
+    while len(INGEST_JOBS) >= MAX_TRACKED_JOBS:
+        INGEST_JOBS.pop(next(iter(INGEST_JOBS)))
+    job = INGEST_JOBS[job_id] = {
+        "job_id": job_id,
+        "filename": filename,
+        "status": "running",
+        "chunks_done": 0,
+        "records_added": 0,
+        "rows_per_sec": 0,
+        "chunks": []
+    }
+    started = time.perf_counter()
+
+    try:
+        # Read the header only, so the chunked reader can load just the text column
+        header = await run_db(pd.read_csv, fileobj, nrows=0)
+        fileobj.seek(0)
+        text_col = _detect_text_column(list(header.columns))
+
+        reader = pd.read_csv(fileobj, usecols=[text_col], dtype=str, chunksize=chunksize)
+        while True:
+            chunk_started = time.perf_counter()
+            # Parsing and inserting a chunk both block, so they run in the
+            # threadpool while the event loop keeps serving requests
+            inserted = await run_db(_ingest_next_chunk, db, reader, text_col, filename, chunksize)
+            if inserted is None:
+                break
+
+            elapsed = time.perf_counter() - started
+            job["chunks_done"] += 1
+            job["records_added"] += inserted
+            job["rows_per_sec"] = round(job["records_added"] / elapsed, 2) if elapsed > 0 else 0
+            job["chunks"].append({
+                "chunk": job["chunks_done"],
+                "rows": inserted,
+                "seconds": round(time.perf_counter() - chunk_started, 4)
+            })
+
+        job["status"] = "completed"
+    except Exception as e:
+        await run_db(db.rollback)
+        job["status"] = "failed"
+        job["error"] = str(e)
+        raise
+    finally:
+        job["elapsed_sec"] = round(time.perf_counter() - started, 4)
+
+    return job
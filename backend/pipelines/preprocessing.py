@@ -1,8 +1,40 @@
+import os
+import time
+import uuid
+import datetime
 from sqlalchemy.orm import Session
 import models
-from utils import clean_text, get_text_hash, detect_language, translate_if_needed
+import observability
+import pipeline_events
+import minhash
+import near_duplicates
+import noise_gate
+from database import dialect_insert, run_db
+from starlette.concurrency import run_in_threadpool
+from utils import clean_text, get_text_hash, detect_language
+from preprocess_pool import POOL
+from translation import translate_texts
+from work_queue import claim, release, default_worker_id
 
-async def process_raw_item(db: Session, raw_id: str):
+# Raw rows pulled per preprocessing batch
+PREPROCESS_BATCH_SIZE = int(os.getenv("PREPROCESS_BATCH_SIZE", "500"))
+
+def _mark_processed(db: Session, raw_ids, now: datetime.datetime):
+    """Stamps processed_at and drops the preprocess leases (caller commits)."""
+    db.query(models.RawFeedback)\
+        .filter(models.RawFeedback.id.in_(raw_ids))\
+        .update({models.RawFeedback.processed_at: now}, synchronize_session=False)
+    release(db, "preprocess", raw_ids)
+
+def _prepare_raw_item(db: Session, raw_id: str, worker_id: str):
+    """
+    Leases one raw row (see work_queue.claim) so the batch stage skips it,
+    and cleans it. A row whose text is already stored is marked processed
+    right away. Returns (cleaned, hash, existing preprocessed row or None,
+    leased), or None if the raw row does not exist. Rows that are already
+    processed or leased by another worker come back with leased=False.
+    """
+    leased = bool(claim(db, "preprocess", worker_id, 1, item_ids=[raw_id]))
     raw_item = db.query(models.RawFeedback).filter(models.RawFeedback.id == raw_id).first()
     if not raw_item: return None
 
@@ -12,21 +44,198 @@ async def process_raw_item(db: Session, raw_id: str):
 
     # De-duplication check
     exists = db.query(models.PreprocessedFeedback).filter(models.PreprocessedFeedback.text_hash == t_hash).first()
-    if exists: return exists
-
-    # Language & Translation
-    lang = detect_language(cleaned)
-    translated_text, is_translated = await translate_if_needed(cleaned, lang)
-
-    preprocessed = models.PreprocessedFeedback(
-        raw_id=raw_id,
-        cleaned_text=cleaned,
-        language=lang,
-        is_translated=is_translated,
-        translated_text=translated_text,
-        text_hash=t_hash
-    )
-    db.add(preprocessed)
-    db.commit()
-    db.refresh(preprocessed)
-    return preprocessed
+    if exists and leased:
+        _mark_processed(db, [raw_id], datetime.datetime.utcnow())
+        db.commit()
+    return cleaned, t_hash, exists, leased
+
+def _store_preprocessed(db: Session, row: dict):
+    """
+    Inserts one preprocessed row (ON CONFLICT (text_hash) DO NOTHING, like
+    _store_batch: another raw row with the same text may have been stored
+    meanwhile) and marks its raw row processed in the same transaction.
+    Returns the stored row.
+    """
+    table = models.PreprocessedFeedback.__table__
+    try:
+        stmt = dialect_insert(db, table).on_conflict_do_nothing(index_elements=["text_hash"]).returning(table.c.id)
+        inserted = db.execute(stmt, [row]).first()
+        if inserted and near_duplicates.NEAR_DUPLICATES.enabled and not row["skipped_reason"]:
+            text = row["translated_text"] if row["is_translated"] else row["cleaned_text"]
+            near_duplicates.NEAR_DUPLICATES.assign(db, [(row["id"], minhash.signature(text))])
+        _mark_processed(db, [row["raw_id"]], row["created_at"])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    stored = db.query(models.PreprocessedFeedback).filter(models.PreprocessedFeedback.text_hash == row["text_hash"]).first()
+    return stored, inserted is not None
+
+async def process_raw_item(db: Session, raw_id: str):
+    """
+    Preprocesses one raw row inline (e.g. for /classify). The row is leased
+    while it is processed and only marked processed together with its
+    preprocessed row; if anything fails, the lease expires and the batch
+    stage retries it. Returns the preprocessed row, or None if the raw row
+    does not exist or another worker is processing it.
+    """
+    with observability.stage("preprocess", raw_id=raw_id):
+        # DB work runs in the threadpool (see database.run_db)
+        prepared = await run_db(_prepare_raw_item, db, raw_id, default_worker_id())
+        if not prepared: return None
+        cleaned, t_hash, exists, leased = prepared
+        if exists:
+            observability.STAGE_ITEMS.labels("preprocess", "duplicate").inc()
+            return exists
+        if not leased:
+            return None
+
+        # Language & Translation (detection is CPU-bound: off the event loop)
+        lang = await run_in_threadpool(detect_language, cleaned)
+        translated_text, is_translated = (await translate_texts(db, [cleaned], [lang], [t_hash]))[0]
+
+        skipped_reason, noise_score = None, None
+        if noise_gate.GATE.enabled:
+            skipped_reason, noise_score = noise_gate.GATE.check_many([translated_text if is_translated else cleaned])[0]
+
+        preprocessed = {
+            "id": str(uuid.uuid4()),
+            "raw_id": raw_id,
+            "cleaned_text": cleaned,
+            "language": lang,
+            "is_translated": is_translated,
+            "translated_text": translated_text,
+            "text_hash": t_hash,
+            "skipped_reason": skipped_reason,
+            "noise_score": noise_score,
+            "created_at": datetime.datetime.utcnow()
+        }
+        stored, inserted = await run_db(_store_preprocessed, db, preprocessed)
+        observability.STAGE_ITEMS.labels("preprocess", "inserted" if inserted else "duplicate").inc()
+        return stored
+
+def _claim_batch(db: Session, batch_size: int, worker_id: str):
+    """Claims raw rows for this worker and fetches them. Returns (raw_ids, raw_rows)."""
+    raw_ids = claim(db, "preprocess", worker_id, batch_size)
+    if not raw_ids:
+        return [], []
+    raw_rows = db.query(models.RawFeedback.id, models.RawFeedback.raw_text)\
+        .filter(models.RawFeedback.id.in_(raw_ids)).all()
+    return raw_ids, raw_rows
+
+def _dedupe_batch(db: Session, raw_rows, prepared) -> list:
+    """
+    Drops duplicates within the batch (first raw row wins for each hash) and
+    rows whose hash already exists. `prepared` holds (cleaned, hash) per raw
+    row. Returns survivors as (hash, raw_id, cleaned).
+    """
+    candidates = {}
+    for (raw_id, _), (cleaned, t_hash) in zip(raw_rows, prepared):
+        if t_hash not in candidates:
+            candidates[t_hash] = (raw_id, cleaned)
+
+    existing = {
+        h for (h,) in db.query(models.PreprocessedFeedback.text_hash)
+        .filter(models.PreprocessedFeedback.text_hash.in_(list(candidates)))
+    }
+    return [(t_hash, raw_id, cleaned) for t_hash, (raw_id, cleaned) in candidates.items() if t_hash not in existing]
+
+def _store_batch(db: Session, rows, raw_ids, now, signatures=None) -> int:
+    """
+    Inserts the preprocessed rows (and indexes them for near-duplicates when
+    `signatures` are given), marks the raw rows processed and drops their
+    claims in one transaction. Returns the number of rows inserted.
+    """
+    inserted = 0
+    try:
+        if rows:
+            table = models.PreprocessedFeedback.__table__
+            stmt = dialect_insert(db, table)\
+                .on_conflict_do_nothing(index_elements=["text_hash"])\
+                .returning(table.c.id)
+            inserted_ids = {row_id for (row_id,) in db.execute(stmt, rows)}
+            inserted = len(inserted_ids)
+            if signatures:
+                near_duplicates.NEAR_DUPLICATES.assign(
+                    db, [(row["id"], sig) for row, sig in zip(rows, signatures) if row["id"] in inserted_ids])
+        if inserted:
+            # Wakes the classification stage once this commits
+            pipeline_events.announce(db, pipeline_events.PREPROCESSED)
+
+        _mark_processed(db, raw_ids, now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return inserted
+
+async def preprocess_raw_batch(db: Session, batch_size: int = PREPROCESS_BATCH_SIZE, worker_id: str = None):
+    """
+    Set-based RAW -> PREPROCESSED stage.
+    1. Claim up to `batch_size` unprocessed raw rows for this worker
+       (see work_queue.claim) and fetch them in one query
+    2. Clean and hash, dedupe within the batch and against the table with a
+       single `text_hash IN (...)` lookup, then detect the survivors' languages
+    3. Run the noise gate (see noise_gate), insert survivors in one
+       statement (ON CONFLICT (text_hash) DO NOTHING), index them for
+       near-duplicates (see near_duplicates) and mark every fetched raw row
+       as processed, then commit once
+    DB work runs in the threadpool (see database.run_db) and cleaning /
+    language detection / MinHash signatures in the preprocessing process
+    pool (see preprocess_pool), so only translation awaits on the event loop.
+    Returns stats including items_per_sec for sizing the batch.
+    """
+    started = time.perf_counter()
+    stats = {"fetched": 0, "inserted": 0, "duplicates": 0, "seconds": 0, "items_per_sec": 0}
+    raw_ids, raw_rows = await run_db(_claim_batch, db, batch_size, worker_id or default_worker_id())
+    if not raw_ids:
+        return stats
+    stats["fetched"] = len(raw_rows)
+
+    # Empty polls are not counted as batches
+    with observability.stage("preprocess", items=len(raw_rows), worker=worker_id):
+        prepared = await POOL.clean_and_hash([raw_text for _, raw_text in raw_rows])
+        survivors = await run_db(_dedupe_batch, db, raw_rows, prepared)
+        survivor_texts = [cleaned for _, _, cleaned in survivors]
+        survivor_hashes = [t_hash for t_hash, _, _ in survivors]
+        languages = await POOL.detect_languages(survivor_texts, survivor_hashes)
+        translations = await translate_texts(db, survivor_texts, languages, survivor_hashes)
+
+        now = datetime.datetime.utcnow()
+        rows = []
+        for (t_hash, raw_id, cleaned), lang, (translated_text, is_translated) in zip(survivors, languages, translations):
+            rows.append({
+                "id": str(uuid.uuid4()),
+                "raw_id": raw_id,
+                "cleaned_text": cleaned,
+                "language": lang,
+                "is_translated": is_translated,
+                "translated_text": translated_text,
+                "text_hash": t_hash,
+                "created_at": now
+            })
+
+        texts = [row["translated_text"] if row["is_translated"] else row["cleaned_text"] for row in rows]
+        for row in rows:
+            row["skipped_reason"], row["noise_score"] = None, None
+        if rows and noise_gate.GATE.enabled:
+            # Rules and a linear model: microseconds per row, no pool needed
+            for row, (reason, score) in zip(rows, await run_in_threadpool(noise_gate.GATE.check_many, texts)):
+                row["skipped_reason"], row["noise_score"] = reason, score
+
+        signatures = None
+        if rows and near_duplicates.NEAR_DUPLICATES.enabled:
+            # Skipped rows are never classified, so they never represent a cluster
+            kept = [i for i, row in enumerate(rows) if not row["skipped_reason"]]
+            signatures = [b""] * len(rows)
+            for i, sig in zip(kept, await POOL.map_async(minhash.signature_chunk, [texts[i] for i in kept])):
+                signatures[i] = sig
+        stats["inserted"] = await run_db(_store_batch, db, rows, [raw_id for raw_id, _ in raw_rows], now, signatures)
+
+    elapsed = time.perf_counter() - started
+    stats["duplicates"] = stats["fetched"] - stats["inserted"]
+    observability.STAGE_ITEMS.labels("preprocess", "inserted").inc(stats["inserted"])
+    observability.STAGE_ITEMS.labels("preprocess", "duplicate").inc(stats["duplicates"])
+    stats["seconds"] = round(elapsed, 4)
+    stats["items_per_sec"] = round(stats["fetched"] / elapsed, 2) if elapsed > 0 else 0
+    return stats
@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import observability
+import preprocess_pool
+from database import SessionLocal
+from migrate import upgrade_database
+from pipelines.preprocessing import preprocess_raw_batch
+from work_queue import default_worker_id
+
+async def _backfill(batch_size: int, limit: int = None) -> dict:
+    db = SessionLocal()
+    worker_id = f"{default_worker_id()}:backfill"
+    totals = {"fetched": 0, "inserted": 0, "duplicates": 0, "batches": 0}
+    started = time.perf_counter()
+    try:
+        while limit is None or totals["fetched"] < limit:
+            size = batch_size if limit is None else min(batch_size, limit - totals["fetched"])
+            stats = await preprocess_raw_batch(db, batch_size=size, worker_id=worker_id)
+            if not stats["fetched"]:
+                break
+            totals["batches"] += 1
+            for key in ("fetched", "inserted", "duplicates"):
+                totals[key] += stats[key]
+            elapsed = time.perf_counter() - started
+            print(f"Batch {totals['batches']}: {stats['fetched']} rows at {stats['items_per_sec']} items/sec "
+                  f"({totals['fetched']} total, {totals['fetched'] / elapsed:.1f} items/sec overall)")
+    finally:
+        db.close()
+    totals["seconds"] = round(time.perf_counter() - started, 2)
+    return totals
+
+def preprocess_backfill(processes: int = preprocess_pool.PREPROCESS_PROCESSES, batch_size: int = 5000,
+                        chunk_size: int = preprocess_pool.PREPROCESS_CHUNK_SIZE, limit: int = None) -> dict:
+    """
+    Preprocesses every raw row that has not been preprocessed yet, using all
+    cores for cleaning and language detection. Rows are claimed like the
+    pipeline does, so this can run next to the server or workers. Safe to
+    rerun.
+    """
+    upgrade_database()
+    pool = preprocess_pool.POOL
+    pool.processes, pool.chunk_size = processes, chunk_size
+    print(f"Preprocessing with {processes} process(es) ({batch_size} rows per batch, {chunk_size} per chunk)...")
+    try:
+        pool.start()
+        totals = asyncio.run(_backfill(batch_size, limit))
+    finally:
+        pool.close()
+    rate = totals["fetched"] / totals["seconds"] if totals["seconds"] else 0
+    print(f"Preprocessed {totals['fetched']} raw rows ({totals['inserted']} new, {totals['duplicates']} duplicates) "
+          f"in {totals['seconds']}s, {rate:.1f} items/sec.")
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess the raw backlog on every core (for backfills and large imports).")
+    parser.add_argument("--processes", type=int, default=preprocess_pool.PREPROCESS_PROCESSES,
+                        help="worker processes for cleaning / language detection (1 = single core)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="raw rows claimed and stored per batch")
+    parser.add_argument("--chunk-size", type=int, default=preprocess_pool.PREPROCESS_CHUNK_SIZE,
+                        help="texts per task sent to a worker process")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many raw rows")
+    args = parser.parse_args()
+    observability.configure_logging()
+    preprocess_backfill(args.processes, args.batch_size, args.chunk_size, args.limit)
@@ -0,0 +1,110 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from starlette.concurrency import run_in_threadpool
+import utils
+
+# Worker processes for the CPU-bound part of preprocessing (cleaning,
+# hashing, language detection). 1 disables the pool: the work then runs in
+# the threadpool as before.
+PREPROCESS_PROCESSES = int(os.getenv("PREPROCESS_PROCESSES", str(os.cpu_count() or 1)))
+# Texts per task sent to a worker: large enough to amortize pickling and
+# IPC, small enough to spread a batch over every worker
+PREPROCESS_CHUNK_SIZE = int(os.getenv("PREPROCESS_CHUNK_SIZE", "250"))
+# Batches smaller than this stay in the threadpool; shipping them to
+# another process costs more than it saves
+PREPROCESS_POOL_THRESHOLD = int(os.getenv("PREPROCESS_POOL_THRESHOLD", "200"))
+
+def _init_worker():
+    # The workers are the pool: no nested language-detection pool in each
+    utils.DEFAULT_DETECTOR.processes = 0
+
+# Task functions are top-level so they can be pickled for the pool
+
+def clean_and_hash(texts) -> list:
+    """(cleaned text, text hash) per raw text."""
+    return [(cleaned, utils.get_text_hash(cleaned)) for cleaned in utils.clean_texts(texts)]
+
+def detect_chunk(items) -> list:
+    """Language per (cleaned text, text hash) item."""
+    return utils.detect_languages([text for text, _ in items], [t_hash for _, t_hash in items])
+
+class PreprocessPool:
+    """
+    Runs the CPU-bound preprocessing steps in a ProcessPoolExecutor sized to
+    the cores, so regex cleaning and langdetect neither block the event loop
+    nor contend for the API's GIL. A batch is split into chunks of
+    `chunk_size` items, one task each, and results come back in order.
+    The pool starts on first use with the spawn start method, so workers
+    never inherit the parent's DB connections or event loop.
+    """
+    def __init__(self, processes: int = PREPROCESS_PROCESSES, chunk_size: int = PREPROCESS_CHUNK_SIZE,
+                 threshold: int = PREPROCESS_POOL_THRESHOLD):
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.threshold = threshold
+        self._pool = None
+        self.pooled_batches = 0
+        self.inline_batches = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker)
+        return self._pool
+
+    def start(self):
+        """Starts every worker now instead of on the first batches."""
+        if self.processes > 1:
+            list(self._executor().map(clean_and_hash, [[""]] * self.processes))
+
+    def _chunks(self, items) -> list:
+        return [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+
+    def _use_pool(self, items) -> bool:
+        use = self.processes > 1 and len(items) >= self.threshold
+        if use:
+            self.pooled_batches += 1
+        else:
+            self.inline_batches += 1
+        return use
+
+    def map(self, fn, items) -> list:
+        """fn(chunk) over `items` in chunks, flattened. Blocking (CLIs, threadpool)."""
+        items = list(items)
+        if not items:
+            return []
+        if not self._use_pool(items):
+            return fn(items)
+        return [result for chunk in self._executor().map(fn, self._chunks(items)) for result in chunk]
+
+    async def map_async(self, fn, items) -> list:
+        """Same as map, awaited from the event loop."""
+        items = list(items)
+        if not items:
+            return []
+        if not self._use_pool(items):
+            return await run_in_threadpool(fn, items)
+        loop = asyncio.get_running_loop()
+        executor = self._executor()
+        chunks = await asyncio.gather(*[loop.run_in_executor(executor, fn, chunk) for chunk in self._chunks(items)])
+        return [result for chunk in chunks for result in chunk]
+
+    async def clean_and_hash(self, texts) -> list:
+        return await self.map_async(clean_and_hash, texts)
+
+    async def detect_languages(self, texts, hashes) -> list:
+        return await self.map_async(detect_chunk, list(zip(texts, hashes)))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {"processes": self.processes, "chunk_size": self.chunk_size, "threshold": self.threshold,
+                "started": self._pool is not None, "pooled_batches": self.pooled_batches,
+                "inline_batches": self.inline_batches}
+
+POOL = PreprocessPool()
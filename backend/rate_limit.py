@@ -0,0 +1,33 @@
+import time
+import asyncio
+
+class TokenBucket:
+    """
+    Async token bucket refilled at `rate_per_minute` units per minute.
+    Used for both request-per-minute and token-per-minute limits.
+    A rate of 0 disables the limit.
+    """
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_minute / 60.0)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        if self.rate_per_minute <= 0:
+            return
+        # Requests larger than the bucket would wait forever; let them drain it instead
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) * 60.0 / self.rate_per_minute)
@@ -0,0 +1,29 @@
+import os
+import sys
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import rollups
+from database import SessionLocal
+from migrate import upgrade_database
+
+def rebuild_rollups():
+    """
+    Recomputes the analytics_rollups counters behind the dashboards from
+    raw_feedback and classified_insights. Needed once for databases that
+    predate the counters, and after rows are deleted or edited by hand.
+    """
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        print("Rebuilding analytics rollups...")
+        buckets = rollups.rebuild(db)
+        print(f"Wrote {buckets} buckets.")
+        return buckets
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_rollups()
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+import observability
+
+# Set to false to serve every request from the DB
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# "memory" (per process) or "redis" (shared by every API process and worker)
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+# Entries kept by the in-process backend
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+# Seconds a response may be served from cache, per endpoint group
+RESPONSE_CACHE_TTL_ANALYTICS = int(os.getenv("RESPONSE_CACHE_TTL_ANALYTICS", "30"))
+RESPONSE_CACHE_TTL_FEEDBACK = int(os.getenv("RESPONSE_CACHE_TTL_FEEDBACK", "10"))
+
+logger = logging.getLogger("signalyze.cache")
+
+# Cached GET endpoints -> (namespace, ttl). A namespace is invalidated as a
+# whole when the data behind it changes.
+ANALYTICS = "analytics"
+FEEDBACK = "feedback"
+CACHED_ENDPOINTS = {
+    "/analytics/summary": (ANALYTICS, RESPONSE_CACHE_TTL_ANALYTICS),
+    "/analytics/charts": (ANALYTICS, RESPONSE_CACHE_TTL_ANALYTICS),
+    "/insights/summary": (ANALYTICS, RESPONSE_CACHE_TTL_ANALYTICS),
+    "/insights/dispositions": (ANALYTICS, RESPONSE_CACHE_TTL_ANALYTICS),
+    "/feedback": (FEEDBACK, RESPONSE_CACHE_TTL_FEEDBACK),
+    "/classified-feedback": (FEEDBACK, RESPONSE_CACHE_TTL_FEEDBACK),
+}
+
+# Response headers that are recomputed instead of cached
+_SKIP_HEADERS = {"content-length", "etag", "cache-control", "date", "server"}
+
+class MemoryCacheBackend:
+    """
+    In-process TTL cache with LRU eviction. Invalidation only reaches this
+    process; entries written elsewhere age out by TTL.
+    """
+    name = "memory"
+    blocking = False
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+
+    def _drop(self, key):
+        _, entry = self.entries.pop(key)
+        self.memory_bytes -= len(entry["body"])
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl: int):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic() + ttl, entry)
+            self.memory_bytes += len(entry["body"])
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def generation(self, namespace: str) -> int:
+        return self.generations.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self.lock:
+            self.generations[namespace] = self.generations.get(namespace, 0) + 1
+            # Entries of the old generation can never be read again
+            for key in [k for k in self.entries if k.startswith(f"{namespace}:")]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        return {"entries": len(self.entries), "max_entries": self.max_entries, "memory_bytes": self.memory_bytes}
+
+class RedisCacheBackend:
+    """
+    Shared backend: entries and namespace generations live in redis, so an
+    invalidation from any process (e.g. a classification_worker.py worker)
+    is seen by every API process. `client` can be any object with redis'
+    get/set(ex=)/incr/scan_iter methods, e.g. benchmarks/fake_redis.py.
+    """
+    name = "redis"
+    blocking = True
+
+    def __init__(self, client=None, url: str = RESPONSE_CACHE_REDIS_URL, prefix: str = "signalyze:response:"):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        entry["body"] = entry["body"].encode("utf-8")
+        return entry
+
+    def set(self, key, entry, ttl: int):
+        payload = dict(entry, body=entry["body"].decode("utf-8"))
+        self.client.set(self.prefix + key, json.dumps(payload), ex=ttl)
+
+    def generation(self, namespace: str) -> int:
+        return int(self.client.get(f"{self.prefix}generation:{namespace}") or 0)
+
+    def bump(self, namespace: str):
+        # Old entries are left to expire by TTL
+        self.client.incr(f"{self.prefix}generation:{namespace}")
+
+    def stats(self) -> dict:
+        # Only this cache's keys (the redis DB may be shared), without the
+        # generation counters
+        generations = f"{self.prefix}generation:"
+        entries = 0
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            key = key.decode("utf-8") if isinstance(key, bytes) else key
+            if not key.startswith(generations):
+                entries += 1
+        return {"entries": entries}
+
+class ResponseCache:
+    """
+    Keys are "<namespace>:<generation>:<path>?<sorted query>", so bumping a
+    namespace's generation invalidates every response in it at once.
+    """
+    def __init__(self, backend=None, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.backend = backend or MemoryCacheBackend()
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def key_for(self, namespace: str, path: str, query: str) -> str:
+        params = "&".join(sorted(query.split("&"))) if query else ""
+        return f"{namespace}:{self.backend.generation(namespace)}:{path}?{params}"
+
+    def lookup(self, namespace: str, path: str, query: str):
+        """
+        Returns (key, entry or None). Backend failures count as misses.
+        """
+        try:
+            key = self.key_for(namespace, path, query)
+            entry = self.backend.get(key)
+        except Exception as e:
+            logger.warning("Response cache lookup failed: %s", e)
+            self.errors += 1
+            observability.CACHE_LOOKUPS.labels("response", "error").inc()
+            return None, None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        observability.CACHE_LOOKUPS.labels("response", "miss" if entry is None else "hit").inc()
+        return key, entry
+
+    def store(self, key: str, entry: dict, ttl: int):
+        try:
+            self.backend.set(key, entry, ttl)
+            self.stores += 1
+        except Exception as e:
+            logger.warning("Response cache store failed: %s", e)
+            self.errors += 1
+
+    def invalidate(self, *namespaces):
+        """
+        Called right after the commits that change what the cached endpoints
+        return (ingestion, classification, rollup rebuilds).
+        """
+        for namespace in namespaces or (ANALYTICS, FEEDBACK):
+            try:
+                self.backend.bump(namespace)
+                self.invalidations += 1
+            except Exception as e:
+                logger.warning("Response cache invalidation failed: %s", e)
+                self.errors += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        try:
+            backend_stats = self.backend.stats()
+        except Exception as e:
+            backend_stats = {"error": str(e)}
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+            "not_modified": self.not_modified,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            **backend_stats
+        }
+
+def _make_backend():
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return RedisCacheBackend()
+    return MemoryCacheBackend()
+
+CACHE = ResponseCache(_make_backend())
+
+def set_backend(backend):
+    """Swaps the backend (e.g. for a local stand-in of redis)."""
+    CACHE.backend = backend
+
+def invalidate(*namespaces):
+    CACHE.invalidate(*namespaces)
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Serves GET requests for CACHED_ENDPOINTS from the response cache and
+    answers If-None-Match with 304 when the ETag (md5 of the body) matches.
+    """
+    async def dispatch(self, request, call_next):
+        endpoint = CACHED_ENDPOINTS.get(request.url.path)
+        if request.method != "GET" or endpoint is None or not CACHE.enabled:
+            return await call_next(request)
+        namespace, ttl = endpoint
+        cache = CACHE
+        query = request.url.query
+
+        if cache.backend.blocking:
+            key, entry = await run_in_threadpool(cache.lookup, namespace, request.url.path, query)
+        else:
+            key, entry = cache.lookup(namespace, request.url.path, query)
+
+        if entry is None:
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            entry = {
+                "etag": f'"{hashlib.md5(body).hexdigest()}"',
+                "headers": {k: v for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS},
+                "body": body
+            }
+            if key is not None:
+                if cache.backend.blocking:
+                    await run_in_threadpool(cache.store, key, entry, ttl)
+                else:
+                    cache.store(key, entry, ttl)
+
+        # Browsers revalidate every time and get a 304 while the data is unchanged
+        headers = dict(entry["headers"], etag=entry["etag"])
+        headers["cache-control"] = "no-cache"
+        if _etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+            cache.not_modified += 1
+            headers.pop("content-type", None)
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry["body"], status_code=200, headers=headers)
@@ -0,0 +1,153 @@
+import datetime
+from collections import Counter
+from sqlalchemy import func, and_
+from sqlalchemy.orm import Session
+import models
+import response_cache
+from database import dialect_insert
+
+# Counters kept per (dimension, value, day, source):
+# - raw_feedback: every ingested raw row (value is always '')
+# - insights: every classified insight (value is always '')
+# - one dimension per ClassifiedInsight column shown on the dashboards
+RAW_DIMENSION = "raw_feedback"
+INSIGHT_DIMENSION = "insights"
+INSIGHT_DIMENSIONS = ["sentiment", "product_category", "disposition_1", "model", "make_brand"]
+
+def _key(value) -> str:
+    # NULLs are stored as '' because every column is part of the primary key
+    return str(value)[:255] if value is not None else ""
+
+def _day(value) -> datetime.date:
+    if value is None:
+        return datetime.datetime.utcnow().date()
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, str):
+        # SQLite returns DATE() as text
+        return datetime.date.fromisoformat(value[:10])
+    return value
+
+def _apply(db: Session, counts: Counter):
+    """
+    Adds `counts` to the rollup table with one upsert (count = count + n).
+    Keys are unique per statement since they come from a Counter. Rows go
+    in primary key order, so concurrent writers lock shared counter rows in
+    the same order and cannot deadlock on Postgres.
+    """
+    if not counts:
+        return
+    table = models.AnalyticsRollup.__table__
+    stmt = dialect_insert(db, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["dimension", "value", "day", "source"],
+        set_={"count": table.c.count + stmt.excluded["count"]}
+    )
+    db.execute(stmt, [
+        {"dimension": dimension, "value": value, "day": day, "source": source, "count": n}
+        for (dimension, value, day, source), n in sorted(counts.items())
+    ])
+
+def record_raw(db: Session, source: str, created_at: datetime.datetime, n: int):
+    """
+    Stages the counter increment for `n` new raw_feedback rows in the
+    caller's transaction.
+    """
+    if n:
+        _apply(db, Counter({(RAW_DIMENSION, "", _day(created_at), _key(source)): n}))
+
+def record_insights(db: Session, insights, canonical: dict = None):
+    """
+    Stages counter increments for new ClassifiedInsight objects in the
+    caller's transaction, so the counters commit (or roll back) together
+    with the insights. The raw source is looked up in one query.
+    `canonical` ({insight id: {column: value}}, from
+    dispositions.link_insights) overrides column values.
+    """
+    if not insights:
+        return
+    sources = dict(
+        db.query(models.PreprocessedFeedback.id, models.RawFeedback.source)
+        .join(models.RawFeedback, models.PreprocessedFeedback.raw_id == models.RawFeedback.id)
+        .filter(models.PreprocessedFeedback.id.in_([insight.preprocessed_id for insight in insights]))
+    )
+    now = datetime.datetime.utcnow()
+    counts = Counter()
+    for insight in insights:
+        # Pin created_at so the bucket matches the stored row
+        if insight.created_at is None:
+            insight.created_at = now
+        day = _day(insight.created_at)
+        source = _key(sources.get(insight.preprocessed_id))
+        counts[(INSIGHT_DIMENSION, "", day, source)] += 1
+        overrides = (canonical or {}).get(insight.id, {})
+        for dimension in INSIGHT_DIMENSIONS:
+            counts[(dimension, _key(overrides.get(dimension, getattr(insight, dimension))), day, source)] += 1
+    _apply(db, counts)
+
+def totals(db: Session, dimension: str, since: datetime.date = None, until: datetime.date = None, source: str = None) -> dict:
+    """
+    {value: count} for one dimension, optionally limited to a day range
+    (inclusive) and a source. Reads one row per bucket, not per insight.
+    '' values come back as None.
+    """
+    rollup = models.AnalyticsRollup
+    query = db.query(rollup.value, func.sum(rollup.count)).filter(rollup.dimension == dimension)
+    if since:
+        query = query.filter(rollup.day >= since)
+    if until:
+        query = query.filter(rollup.day <= until)
+    if source is not None:
+        query = query.filter(rollup.source == source)
+    return {(value or None): int(n) for value, n in query.group_by(rollup.value)}
+
+def total(db: Session, dimension: str, **filters) -> int:
+    return sum(totals(db, dimension, **filters).values())
+
+def needs_rebuild(db: Session) -> bool:
+    """
+    True for databases that have feedback but no counters yet (created
+    before the rollup table existed).
+    """
+    return db.query(models.AnalyticsRollup.dimension).first() is None \
+        and db.query(models.RawFeedback.id).first() is not None
+
+def rebuild(db: Session) -> int:
+    """
+    Recomputes every counter from raw_feedback and classified_insights with
+    one GROUP BY per dimension and commits. Run it with the pipeline stopped
+    for exact counts. Returns the number of buckets written.
+    """
+    db.query(models.AnalyticsRollup).delete(synchronize_session=False)
+    counts = Counter()
+
+    raw_day = func.date(models.RawFeedback.created_at)
+    for day, source, n in db.query(raw_day, models.RawFeedback.source, func.count(models.RawFeedback.id))\
+            .group_by(raw_day, models.RawFeedback.source):
+        counts[(RAW_DIMENSION, "", _day(day), _key(source))] += n
+
+    insight_day = func.date(models.ClassifiedInsight.created_at)
+    for dimension in [INSIGHT_DIMENSION] + INSIGHT_DIMENSIONS:
+        column = getattr(models.ClassifiedInsight, dimension) if dimension != INSIGHT_DIMENSION else None
+        if dimension == "disposition_1":
+            # Canonical name from the disposition dimension, the model's
+            # text for insights not linked yet
+            column = func.coalesce(models.Disposition.name, column)
+        columns = [insight_day, models.RawFeedback.source] + ([column] if column is not None else [])
+        query = db.query(*columns, func.count(models.ClassifiedInsight.id))\
+            .select_from(models.ClassifiedInsight)\
+            .join(models.PreprocessedFeedback, models.ClassifiedInsight.preprocessed_id == models.PreprocessedFeedback.id)\
+            .join(models.RawFeedback, models.PreprocessedFeedback.raw_id == models.RawFeedback.id)
+        if dimension == "disposition_1":
+            link = models.InsightDisposition
+            query = query.outerjoin(link, and_(link.insight_id == models.ClassifiedInsight.id, link.position == 1))\
+                .outerjoin(models.Disposition, models.Disposition.id == link.disposition_id)
+        query = query.group_by(*columns)
+        for row in query:
+            value = _key(row[2]) if column is not None else ""
+            counts[(dimension, value, _day(row[0]), _key(row[1]))] += row[-1]
+
+    _apply(db, counts)
+    db.commit()
+    response_cache.invalidate()
+    return len(counts)
@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends
+import json
+import datetime
+from fastapi import APIRouter, Depends, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from database import get_db
-from models import RawFeedback, ClassifiedInsight, PreprocessedFeedback
+import rollups
+import feedback_listing
+import brands
+import exporter
+import dispositions
+from models import ClassifiedInsight
 
 router = APIRouter(tags=["Classification"])
 
 @router.get("/analytics/summary")
-def get_dashboard_stats(db: Session = Depends(get_db)):
-    total = db.query(RawFeedback).count()
-    classified = db.query(ClassifiedInsight).count()
+def get_dashboard_stats(db: Session = Depends(get_db), source: str = None,
+                        since: datetime.date = None, until: datetime.date = None):
+    # Read from the rollup counters (one row per bucket) instead of COUNT(*)
+    filters = {"source": source, "since": since, "until": until}
+    total = rollups.total(db, rollups.RAW_DIMENSION, **filters)
+    classified = rollups.total(db, rollups.INSIGHT_DIMENSION, **filters)
     pending = total - classified
     signal_pct = int((classified / total * 100)) if total > 0 else 0
     
@@ -20,25 +30,23 @@ def get_dashboard_stats(db: Session = Depends(get_db)):
     }
 
 @router.get("/analytics/charts")
-def get_dashboard_charts(db: Session = Depends(get_db)):
+def get_dashboard_charts(db: Session = Depends(get_db), source: str = None,
+                         since: datetime.date = None, until: datetime.date = None):
+    filters = {"source": source, "since": since, "until": until}
     # Sentiment
-    sentiment_data = db.query(
-        ClassifiedInsight.sentiment, func.count(ClassifiedInsight.id)
-    ).group_by(ClassifiedInsight.sentiment).all()
+    sentiment_data = rollups.totals(db, "sentiment", **filters)
     
     sentiment_list = [
-        {"name": s[0] if s[0] else "Neutral", "value": s[1]} 
-        for s in sentiment_data
+        {"name": name if name else "Neutral", "value": count} 
+        for name, count in sentiment_data.items()
     ]
     
     # Area (Product Category)
-    area_data = db.query(
-        ClassifiedInsight.product_category, func.count(ClassifiedInsight.id)
-    ).group_by(ClassifiedInsight.product_category).all()
+    area_data = rollups.totals(db, "product_category", **filters)
     
     area_list = [
-        {"name": a[0] if a[0] else "Other", "value": a[1]}
-        for a in area_data
+        {"name": name if name else "Other", "value": count}
+        for name, count in area_data.items()
     ]
     
     return {
@@ -46,69 +54,108 @@ def get_dashboard_charts(db: Session = Depends(get_db)):
         "area": area_list
     }
 
+@router.get("/feedback")
 @router.get("/classified-feedback")
-def get_verified_data(limit: int = 50, db: Session = Depends(get_db)):
+def get_verified_data(response: Response, limit: int = 50, cursor: str = None, fields: str = None,
+                      sentiment: str = None, category: str = None, brand: str = None, model: str = None,
+                      source: str = None, since: datetime.datetime = None, until: datetime.datetime = None,
+                      db: Session = Depends(get_db)):
     """
-    Returns joined data for the Verification View table.
+    Returns joined data for the Verification View table, newest first.
+    Keyset pagination: pass the X-Next-Cursor header of a page as `cursor`
+    to get the next one. `fields` is a comma-separated projection.
     """
-    query = db.query(
-        ClassifiedInsight, 
-        RawFeedback.raw_text.label("raw_text"),
-        RawFeedback.source.label("source")
-    ).select_from(ClassifiedInsight)\
-     .join(PreprocessedFeedback, ClassifiedInsight.preprocessed_id == PreprocessedFeedback.id)\
-     .join(RawFeedback, PreprocessedFeedback.raw_id == RawFeedback.id)\
-     .order_by(ClassifiedInsight.created_at.desc())\
-     .limit(limit).all()
-    
-    results = []
-    for row in query:
-        res_obj = row.ClassifiedInsight
-        data = {column.name: getattr(res_obj, column.name) for column in res_obj.__table__.columns}
-        data["raw_text"] = row.raw_text
-        data["source"] = row.source
-        results.append(data)
-    return results
+    try:
+        items, next_cursor = feedback_listing.list_insights(
+            db, limit=limit, cursor=cursor, fields=fields, sentiment=sentiment, category=category,
+            brand=brand, model=model, source=source, since=since, until=until
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+@router.get("/export/insights")
+def export_insights(format: str = "ndjson", gzip: bool = False, fields: str = None,
+                    sentiment: str = None, category: str = None, brand: str = None, model: str = None,
+                    source: str = None, since: datetime.datetime = None, until: datetime.datetime = None):
+    """
+    Streams every matching insight joined to its raw text as NDJSON, CSV,
+    Parquet or Arrow (same filters as /classified-feedback). Rows are read
+    through a server-side cursor, so memory use does not grow with the export.
+    """
+    try:
+        exporter.check_format(format)
+        feedback_listing.parse_fields(fields or exporter.DEFAULT_EXPORT_FIELDS)
+    except ValueError as e:
+        return {"error": str(e)}
+    chunks = exporter.export_stream(format=format, fields=fields, gzip=gzip, sentiment=sentiment, category=category,
+                                    brand=brand, model=model, source=source, since=since, until=until)
+    media_type = "application/gzip" if gzip else exporter.EXPORT_FORMATS[format][0]
+    headers = {"Content-Disposition": f'attachment; filename="{exporter.export_filename(format, gzip)}"'}
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
 
 @router.get("/insights/summary")
-def get_insights_summary(db: Session = Depends(get_db)):
+def get_insights_summary(db: Session = Depends(get_db), source: str = None,
+                         since: datetime.date = None, until: datetime.date = None):
     """
     Group by: disposition_1, product_category, model, sentiment
+    (served from the rollup counters, see rollups.py)
     """
-    disp_summary = db.query(
-        ClassifiedInsight.disposition_1, 
-        func.count(ClassifiedInsight.id)
-    ).group_by(ClassifiedInsight.disposition_1).all()
-
-    category_summary = db.query(
-        ClassifiedInsight.product_category, 
-        func.count(ClassifiedInsight.id)
-    ).group_by(ClassifiedInsight.product_category).all()
-
-    model_summary = db.query(
-        ClassifiedInsight.model, 
-        func.count(ClassifiedInsight.id)
-    ).group_by(ClassifiedInsight.model).all()
-
-    sentiment_summary = db.query(
-        ClassifiedInsight.sentiment, 
-        func.count(ClassifiedInsight.id)
-    ).group_by(ClassifiedInsight.sentiment).all()
-
+    filters = {"source": source, "since": since, "until": until}
     return {
-        "disposition_distribution": dict(disp_summary),
-        "category_distribution": dict(category_summary),
-        "model_distribution": dict(model_summary),
-        "sentiment_distribution": dict(sentiment_summary)
+        "disposition_distribution": rollups.totals(db, "disposition_1", **filters),
+        "category_distribution": rollups.totals(db, "product_category", **filters),
+        "model_distribution": rollups.totals(db, "model", **filters),
+        "sentiment_distribution": rollups.totals(db, "sentiment", **filters)
     }
 
+@router.get("/insights/dispositions")
+def get_top_dispositions(db: Session = Depends(get_db), position: int = None, top: int = 20,
+                         since: datetime.datetime = None, until: datetime.datetime = None):
+    """
+    Top canonical dispositions (taxonomy-backed, see dispositions.py).
+    `position` limits to one disposition column (1-5); default is 1-4 combined.
+    """
+    where = []
+    if since:
+        where.append(ClassifiedInsight.created_at >= since)
+    if until:
+        where.append(ClassifiedInsight.created_at < until)
+    positions = [position] if position else [1, 2, 3, 4]
+    return {"top_dispositions": dispositions.top_dispositions(db, where=where, positions=positions, top=min(top, 100))}
+
 @router.get("/insights/company/{company_name}")
-def get_company_insights(company_name: str, db: Session = Depends(get_db)):
+def get_company_insights(company_name: str, response: Response, limit: int = 50, cursor: str = None,
+                         fields: str = None, format: str = "json", aggregates: bool = True, top: int = 10,
+                         db: Session = Depends(get_db)):
     """
-    Returns classified data filtered by company name joining with RawFeedback table.
+    Company drill-down on make_brand (case-insensitive, alias-aware, see brands.py).
+    - format=json: SQL aggregates plus one keyset page of insights
+      (follow `next_cursor`; pass aggregates=false on later pages)
+    - format=ndjson: streams every matching insight, one JSON object per line
     """
-    results = db.query(ClassifiedInsight)\
-        .join(PreprocessedFeedback, ClassifiedInsight.preprocessed_id == PreprocessedFeedback.id)\
-        .join(RawFeedback, PreprocessedFeedback.raw_id == RawFeedback.id)\
-        .all() 
-    return results
+    variants = brands.brand_variants(db, company_name)
+    if format == "ndjson":
+        # Validated before the 200 headers go out, like export_insights
+        try:
+            feedback_listing.parse_fields(fields)
+        except ValueError as e:
+            return {"error": str(e)}
+        lines = (json.dumps(item, default=str) + "\n" for item in feedback_listing.stream_insights(fields=fields, brand=variants))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    try:
+        items, next_cursor = feedback_listing.list_insights(db, limit=limit, cursor=cursor, fields=fields, brand=variants)
+    except ValueError as e:
+        return {"error": str(e)}
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    result = {"company": company_name, "brand_variants": variants}
+    if aggregates:
+        result.update(feedback_listing.company_aggregates(db, variants, top=top))
+    result["items"] = items
+    result["next_cursor"] = next_cursor
+    return result
@@ -1,16 +1,19 @@
 import os
+import logging
 import praw
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger("signalyze.scrapers")
+
 def fetch_reddit_comments(subreddit_name: str, limit: int = 100):
     client_id = os.getenv("REDDIT_CLIENT_ID")
     client_secret = os.getenv("REDDIT_CLIENT_SECRET")
     user_agent = os.getenv("REDDIT_USER_AGENT", "Signalyze v1.0")
 
     if not all([client_id, client_secret]):
-        print("Reddit API credentials missing")
+        logger.warning("Reddit API credentials missing")
         return []
 
     reddit = praw.Reddit(
@@ -26,7 +29,7 @@ def fetch_reddit_comments(subreddit_name: str, limit: int = 100):
             comments.append(comment.body)
         return comments
     except Exception as e:
-        print(f"Error fetching Reddit comments: {e}")
+        logger.error("Error fetching Reddit comments: %s", e)
         return []
 
 if __name__ == "__main__":
@@ -1,13 +1,16 @@
 import os
+import logging
 from googleapiclient.discovery import build
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger("signalyze.scrapers")
+
 def fetch_youtube_comments(video_id: str):
     api_key = os.getenv("YOUTUBE_API_KEY")
     if not api_key:
-        print("YOUTUBE_API_KEY not found in .env")
+        logger.warning("YOUTUBE_API_KEY not found in .env")
         return []
 
     youtube = build('youtube', 'v3', developerKey=api_key)
@@ -26,7 +29,7 @@ def fetch_youtube_comments(video_id: str):
             comments.append(comment)
         return comments
     except Exception as e:
-        print(f"Error fetching YouTube comments: {e}")
+        logger.error("Error fetching YouTube comments: %s", e)
         return []
 
 if __name__ == "__main__":
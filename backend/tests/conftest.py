@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(tests_dir)
+for path in (backend_dir, os.path.join(backend_dir, "benchmarks")):
+    if path not in sys.path:
+        sys.path.append(path)
+
+# database.py connects at import time: point it at a throwaway SQLite file
+# before any test imports it (the .env never overrides a set variable)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="signalyze-tests-"), "signalyze.db")
+
+import pytest
+
+@pytest.fixture(scope="session")
+def engine():
+    import models
+    from database import engine
+    models.Base.metadata.create_all(bind=engine)
+    return engine
@@ -0,0 +1,52 @@
+import uuid
+import asyncio
+import models
+import work_queue
+from pipelines import classification
+from database import SessionLocal
+
+def _preprocessed_row(db, text: str) -> str:
+    raw = models.RawFeedback(raw_text=text, source="test")
+    db.add(raw)
+    db.flush()
+    item = models.PreprocessedFeedback(raw_id=raw.id, cleaned_text=text, language="en", text_hash=uuid.uuid4().hex)
+    db.add(item)
+    db.commit()
+    return item.id
+
+def _fake_llm(monkeypatch):
+    calls = []
+
+    async def classify_with_cache(db, items, mode="single"):
+        calls.extend(item_id for item_id, _ in items)
+        return {item_id: {"sentiment": "Negative", "disposition_1": "Range"} for item_id, _ in items}
+
+    monkeypatch.setattr(classification, "classify_with_cache", classify_with_cache)
+    return calls
+
+def test_inline_classification_skips_a_row_the_pipeline_has_claimed(engine, monkeypatch):
+    calls = _fake_llm(monkeypatch)
+    db = SessionLocal()
+    try:
+        item_id = _preprocessed_row(db, "Range is far below the claimed figure")
+        assert work_queue.claim(db, "classify", "pipeline-worker", 1, item_ids=[item_id]) == [item_id]
+
+        assert asyncio.run(classification.classify_preprocessed_item(db, item_id)) is None
+        assert calls == []
+        assert db.query(models.ClassifiedInsight).filter(models.ClassifiedInsight.preprocessed_id == item_id).first() is None
+    finally:
+        db.close()
+
+def test_inline_classification_releases_its_lease(engine, monkeypatch):
+    calls = _fake_llm(monkeypatch)
+    db = SessionLocal()
+    try:
+        item_id = _preprocessed_row(db, "Range drops by half in the cold")
+        insight = asyncio.run(classification.classify_preprocessed_item(db, item_id))
+        assert insight.preprocessed_id == item_id and insight.sentiment == "Negative"
+        assert calls == [item_id]
+        assert db.query(models.WorkClaim).filter(models.WorkClaim.item_id == item_id).first() is None
+        # Classified rows are no longer claimable
+        assert work_queue.claim(db, "classify", "pipeline-worker", 1, item_ids=[item_id]) == []
+    finally:
+        db.close()
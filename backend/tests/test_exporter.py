@@ -0,0 +1,25 @@
+import io
+import pytest
+import exporter
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+FIELDS = ["id", "sentiment", "release_year", "verified_purchase"]
+ROWS = [
+    {"id": "a", "sentiment": "Positive", "release_year": 2023, "verified_purchase": True},
+    # The model's text, not a year
+    {"id": "b", "sentiment": "Negative", "release_year": "2021-2022", "verified_purchase": False},
+    {"id": "c", "sentiment": None, "release_year": "unknown", "verified_purchase": None},
+]
+
+def test_parquet_export_keeps_text_valued_release_years():
+    data = b"".join(exporter.iter_parquet(iter(ROWS), FIELDS, batch_rows=2))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.column("release_year").to_pylist() == ["2023", "2021-2022", "unknown"]
+    assert table.column("verified_purchase").to_pylist() == [True, False, None]
+
+def test_arrow_export_keeps_text_valued_release_years():
+    data = b"".join(exporter.iter_arrow(iter(ROWS), FIELDS, batch_rows=2))
+    table = pa.ipc.open_stream(data).read_all()
+    assert table.column("release_year").to_pylist() == ["2023", "2021-2022", "unknown"]
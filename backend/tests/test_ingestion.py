@@ -0,0 +1,33 @@
+import io
+import asyncio
+import pytest
+from pipelines import ingestion
+from database import SessionLocal
+
+def test_csv_job_is_published_under_the_callers_job_id(engine, monkeypatch):
+    csv = io.BytesIO(b"text\n" + b"".join(f"Great scooter {i}\n".encode() for i in range(25)))
+    seen = []
+    insert = ingestion._insert_raw_rows
+
+    def insert_and_poll(*args, **kwargs):
+        # What /ingest/jobs/{job_id} returns while the upload is still running
+        seen.append(dict(ingestion.INGEST_JOBS["upload-1"]))
+        return insert(*args, **kwargs)
+
+    monkeypatch.setattr(ingestion, "_insert_raw_rows", insert_and_poll)
+    db = SessionLocal()
+    try:
+        job = asyncio.run(ingestion.ingest_csv_stream(db, csv, "feedback.csv", chunksize=10, job_id="upload-1"))
+    finally:
+        db.close()
+
+    assert [(s["status"], s["records_added"]) for s in seen] == [("running", 0), ("running", 10), ("running", 20)]
+    assert job["job_id"] == "upload-1" and job["status"] == "completed" and job["records_added"] == 25
+
+def test_running_job_id_cannot_be_reused(engine):
+    ingestion.INGEST_JOBS["upload-2"] = {"job_id": "upload-2", "status": "running"}
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(ingestion.ingest_csv_stream(None, io.BytesIO(b"text\nhi\n"), "x.csv", job_id="upload-2"))
+    finally:
+        ingestion.INGEST_JOBS.pop("upload-2")
@@ -0,0 +1,31 @@
+import uuid
+import models
+import noise_gate
+from database import SessionLocal
+
+def _skipped_row(db, classified: bool) -> str:
+    raw = models.RawFeedback(raw_text="first!!!", source="test")
+    db.add(raw)
+    db.flush()
+    item = models.PreprocessedFeedback(raw_id=raw.id, cleaned_text="first!!!", text_hash=uuid.uuid4().hex,
+                                       skipped_reason="rule:contentless")
+    db.add(item)
+    db.flush()
+    if classified:
+        db.add(models.ClassifiedInsight(preprocessed_id=item.id, sentiment="Neutral"))
+    db.commit()
+    return item.id
+
+def test_unskip_leaves_classified_rows_alone(engine):
+    db = SessionLocal()
+    try:
+        db.query(models.PreprocessedFeedback).filter(models.PreprocessedFeedback.skipped_reason.isnot(None))\
+            .update({models.PreprocessedFeedback.skipped_reason: None}, synchronize_session=False)
+        pending = _skipped_row(db, classified=False)
+        classified = _skipped_row(db, classified=True)
+
+        assert noise_gate.unskip_backlog(db, reasons=["rule:contentless"]) == 1
+        assert db.get(models.PreprocessedFeedback, pending).skipped_reason is None
+        assert db.get(models.PreprocessedFeedback, classified).skipped_reason == "rule:contentless"
+    finally:
+        db.close()
@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from openai import RateLimitError
+from openai_scheduler import OpenAIScheduler
+from fake_openai import FakeAsyncOpenAI
+
+MESSAGES = [{"role": "user", "content": "Customer feedback:\nThe battery range is great"}]
+
+def _scheduler(rpm: int = 0, **kwargs) -> OpenAIScheduler:
+    # Tiny backoff so retries do not slow the test down
+    return OpenAIScheduler(rpm=rpm, tpm=0, backoff_base=0.001, backoff_max=0.01, **kwargs)
+
+def test_429_halves_the_concurrency_limit():
+    async def run():
+        scheduler = _scheduler(max_concurrency=16, min_concurrency=1, max_retries=2, throttle_cooldown=0)
+        client = FakeAsyncOpenAI(latency=0, throttle_rate=1.0)
+        with pytest.raises(RateLimitError):
+            await scheduler.chat_completion(client, model="fake", messages=MESSAGES)
+        return scheduler, client
+
+    scheduler, client = asyncio.run(run())
+    # One attempt plus two retries, each a 429 that halves the limit
+    assert client.requests == client.throttled == 3
+    assert scheduler.throttled == 3
+    assert scheduler.retries == 2
+    assert scheduler.limit == 2
+    assert scheduler.stats()["failed"] == 1
+
+def test_burst_of_429s_halves_the_limit_once():
+    async def run():
+        scheduler = _scheduler(max_concurrency=16, min_concurrency=1, max_retries=0, throttle_cooldown=60)
+        client = FakeAsyncOpenAI(latency=0, throttle_rate=1.0)
+        results = await asyncio.gather(*[
+            scheduler.chat_completion(client, model="fake", messages=MESSAGES) for _ in range(8)
+        ], return_exceptions=True)
+        return scheduler, results
+
+    scheduler, results = asyncio.run(run())
+    # Eight in-flight requests rejected by one throttle event
+    assert all(isinstance(r, RateLimitError) for r in results)
+    assert scheduler.throttled == 8
+    assert scheduler.limit == 8
+
+def test_queued_counts_callers_waiting_on_the_rate_limit():
+    async def run():
+        scheduler = _scheduler(rpm=2, max_concurrency=16)
+        client = FakeAsyncOpenAI(latency=0)
+        calls = [asyncio.create_task(scheduler.chat_completion(client, model="fake", messages=MESSAGES)) for _ in range(5)]
+        await asyncio.sleep(0.1)
+        stats = scheduler.stats()
+        for call in calls:
+            call.cancel()
+        await asyncio.gather(*calls, return_exceptions=True)
+        return stats, scheduler.stats()
+
+    waiting, after = asyncio.run(run())
+    # Two requests fit in the bucket, three wait for it to refill
+    assert waiting["completed"] == 2
+    assert waiting["queued"] == 3
+    assert after["queued"] == 0
+
+def test_limit_recovers_additively_after_throttling():
+    async def run():
+        scheduler = _scheduler(max_concurrency=16, min_concurrency=1, max_retries=5)
+        client = FakeAsyncOpenAI(latency=0, throttle_rate=0.5, seed=1)
+        results = await asyncio.gather(*[
+            scheduler.chat_completion(client, model="fake", messages=MESSAGES) for _ in range(20)
+        ], return_exceptions=True)
+        return scheduler, client, results
+
+    scheduler, client, results = asyncio.run(run())
+    assert client.throttled > 0
+    assert scheduler.throttled == client.throttled
+    # Backed off and only creeping back up (+1/limit per success)
+    assert scheduler.limit < 16
+    assert scheduler.completed == sum(1 for r in results if not isinstance(r, Exception))
@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+import models
+from pipelines import preprocessing
+from database import SessionLocal
+
+def _raw_row(db, text: str) -> str:
+    raw = models.RawFeedback(raw_text=text, source="test")
+    db.add(raw)
+    db.commit()
+    return raw.id
+
+def _lease(db, raw_id):
+    return db.query(models.WorkClaim).filter(models.WorkClaim.stage == "preprocess", models.WorkClaim.item_id == raw_id).first()
+
+def test_failed_inline_preprocessing_leaves_the_row_for_a_retry(engine, monkeypatch):
+    def fail(text):
+        raise RuntimeError("language detection failed")
+
+    monkeypatch.setattr(preprocessing, "detect_language", fail)
+    db = SessionLocal()
+    try:
+        raw_id = _raw_row(db, "The range dropped after the last update")
+        with pytest.raises(RuntimeError):
+            asyncio.run(preprocessing.process_raw_item(db, raw_id))
+        db.rollback()
+
+        assert db.get(models.RawFeedback, raw_id).processed_at is None
+        assert db.query(models.PreprocessedFeedback).filter(models.PreprocessedFeedback.raw_id == raw_id).first() is None
+        # Leased, so the batch stage picks it up again once the lease expires
+        assert _lease(db, raw_id) is not None
+    finally:
+        db.close()
+
+def test_inline_preprocessing_marks_the_row_processed_with_its_insert(engine):
+    db = SessionLocal()
+    try:
+        raw_id = _raw_row(db, "Charging takes far too long on the new model")
+        stored = asyncio.run(preprocessing.process_raw_item(db, raw_id))
+        assert stored.raw_id == raw_id
+        assert db.get(models.RawFeedback, raw_id).processed_at is not None
+        assert _lease(db, raw_id) is None
+    finally:
+        db.close()
@@ -0,0 +1,11 @@
+import pytest
+import check_query_plans
+
+QUERIES = {name: (stmt, index, tables) for name, stmt, index, tables in check_query_plans.hot_queries()}
+
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_hot_query_uses_its_index(engine, name):
+    stmt, index, tables = QUERIES[name]
+    with engine.connect() as conn:
+        plan = check_query_plans.explain(conn, stmt)
+        assert check_query_plans.problems(plan, index, tables, conn.dialect.name) == [], plan
@@ -0,0 +1,31 @@
+import datetime
+from collections import Counter
+import rollups
+
+class RecordingSession:
+    """Captures the parameters of the rollup upsert instead of running it."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.rows = None
+
+    def get_bind(self):
+        return self.engine
+
+    def execute(self, stmt, rows):
+        self.rows = rows
+
+def test_counters_are_upserted_in_key_order(engine):
+    day = datetime.date(2026, 10, 17)
+    counts = Counter({
+        ("sentiment", "Positive", day, "csv"): 1,
+        ("insights", "", day, "reddit"): 2,
+        ("sentiment", "Negative", day, "csv"): 3,
+        ("insights", "", day, "csv"): 4,
+    })
+    db = RecordingSession(engine)
+    rollups._apply(db, counts)
+    # Concurrent writers must lock shared rows in the same order
+    assert [(r["dimension"], r["value"], r["source"]) for r in db.rows] == [
+        ("insights", "", "csv"), ("insights", "", "reddit"),
+        ("sentiment", "Negative", "csv"), ("sentiment", "Positive", "csv"),
+    ]
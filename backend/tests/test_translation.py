@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+import translation
+from database import SessionLocal
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    backend = translation.FakeTranslationBackend()
+    monkeypatch.setattr(translation, "_backend", backend)
+    return backend
+
+def test_misses_are_split_into_bounded_batches(fake_backend, monkeypatch):
+    monkeypatch.setattr(translation, "TRANSLATION_MAX_BATCH_ITEMS", 2)
+    texts = [f"Die Reichweite ist gut {i}" for i in range(5)]
+    results = asyncio.run(translation.translate_texts(None, texts, ["de"] * 5))
+    assert fake_backend.calls == 3
+    assert fake_backend.texts_translated == 5
+    assert results == [(f"[de->en] {text}", True) for text in texts]
+
+def test_english_and_unknown_texts_are_not_sent(fake_backend):
+    results = asyncio.run(translation.translate_texts(None, ["Great range", "??", "Sehr gut"], ["en", "unknown", "de"]))
+    assert results == [("Great range", False), ("??", False), ("[de->en] Sehr gut", True)]
+    assert fake_backend.texts_translated == 1
+
+def test_second_call_is_served_from_translation_cache(engine, fake_backend):
+    texts = ["Der Akku hält nicht lange", "La batterie est excellente", "Der Akku hält nicht lange"]
+    langs = ["de", "fr", "de"]
+    db = SessionLocal()
+    try:
+        first = asyncio.run(translation.translate_texts(db, texts, langs))
+        db.commit()
+        # The repeated text is translated once
+        assert fake_backend.texts_translated == 2
+
+        second = asyncio.run(translation.translate_texts(db, texts, langs))
+        assert second == first
+        assert fake_backend.calls == 1
+        assert fake_backend.texts_translated == 2
+    finally:
+        db.close()
+
+def test_none_backend_keeps_the_original_text_without_a_cache_lookup(monkeypatch):
+    monkeypatch.setattr(translation, "_backend", translation.TranslationBackend())
+
+    def no_lookup(db, text_hashes):
+        raise AssertionError("translation_cache was queried")
+
+    monkeypatch.setattr(translation, "_load_cached", no_lookup)
+    db = SessionLocal()
+    try:
+        texts = ["Die Reichweite ist schlecht", "Great scooter"]
+        results = asyncio.run(translation.translate_texts(db, texts, ["de", "en"]))
+        assert results == [(text, False) for text in texts]
+    finally:
+        db.close()
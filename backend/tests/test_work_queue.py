@@ -0,0 +1,79 @@
+import datetime
+import threading
+import pytest
+import models
+import work_queue
+from database import SessionLocal
+
+STAGE = "preprocess"
+
+@pytest.fixture
+def raw_ids(engine):
+    db = SessionLocal()
+    try:
+        db.query(models.WorkClaim).delete()
+        db.query(models.RawFeedback).delete()
+        now = datetime.datetime.utcnow()
+        rows = [models.RawFeedback(raw_text=f"feedback {i}", source="test",
+                                   created_at=now + datetime.timedelta(microseconds=i))
+                for i in range(200)]
+        db.add_all(rows)
+        db.commit()
+        return {row.id for row in rows}
+    finally:
+        db.close()
+
+def _claim_concurrently(workers: int, limit: int) -> dict:
+    """
+    Runs `workers` threads, each with its own session, that claim until the
+    backlog is empty. Returns {worker id: [claimed ids]}.
+    """
+    start = threading.Barrier(workers)
+    claimed = {f"worker-{n}": [] for n in range(workers)}
+    errors = []
+
+    def run(worker_id):
+        db = SessionLocal()
+        try:
+            start.wait()
+            while True:
+                ids = work_queue.claim(db, STAGE, worker_id, limit)
+                if not ids:
+                    return
+                claimed[worker_id].extend(ids)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=run, args=(worker_id,)) for worker_id in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    return claimed
+
+def test_two_concurrent_claims_are_disjoint(raw_ids):
+    claimed = _claim_concurrently(workers=2, limit=len(raw_ids))
+    first, second = (set(ids) for ids in claimed.values())
+    assert first.isdisjoint(second)
+    assert first | second == raw_ids
+
+def test_concurrent_workers_never_share_an_item(raw_ids):
+    claimed = _claim_concurrently(workers=4, limit=10)
+    all_claimed = [item_id for ids in claimed.values() for item_id in ids]
+    assert len(all_claimed) == len(set(all_claimed))
+    assert set(all_claimed) == raw_ids
+
+def test_expired_lease_is_reclaimed(raw_ids):
+    db = SessionLocal()
+    try:
+        first = work_queue.claim(db, STAGE, "worker-a", 5, lease_seconds=-1)
+        assert len(first) == 5
+        # Expired leases go back to the pool; live ones are never handed out twice
+        second = work_queue.claim(db, STAGE, "worker-b", 5)
+        assert second == first
+        assert work_queue.claim(db, STAGE, "worker-c", 5) != second
+    finally:
+        db.close()
@@ -0,0 +1,90 @@
+import os
+import sys
+import random
+import argparse
+import datetime
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+if backend_dir not in sys.path:
+    sys.path.append(backend_dir)
+
+import noise_gate
+import observability
+from database import SessionLocal
+from migrate import upgrade_database
+
+def print_report(report: list):
+    print(f"  {'gate':<22} {'skipped':>8} {'precision':>10} {'recall':>8} {'f1':>8}")
+    for row in report:
+        print(f"  {row['gate']:<22} {row['skipped']:>8} {row['precision']:>10.3f} {row['recall']:>8.3f} {row['f1']:>8.3f}")
+
+def train_noise_gate(output: str = noise_gate.NOISE_GATE_MODEL_FILE, holdout: float = 0.2, epochs: int = 200,
+                     seed: int = 7, min_noise: int = 20) -> dict:
+    """
+    Trains the noise gate model on classified insights (all-NULL insight =
+    noise), reports precision / recall on a held-out split and saves the
+    model trained on the rest. The server loads it on start.
+    """
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        texts, labels = noise_gate.training_data(db)
+    finally:
+        db.close()
+    noise = sum(labels)
+    print(f"{len(texts)} classified rows, {noise} of them noise (all-NULL insight).")
+    if noise < min_noise or len(texts) - noise < min_noise:
+        print(f"Need at least {min_noise} rows of each class to train; keeping the rules only.")
+        return {}
+
+    order = list(range(len(texts)))
+    random.Random(seed).shuffle(order)
+    cut = int(len(order) * (1 - holdout))
+    train_idx, test_idx = order[:cut], order[cut:]
+
+    gate = noise_gate.NoiseGate(model_file=None)
+    gate.weights, gate.bias = noise_gate.train([texts[i] for i in train_idx], [labels[i] for i in train_idx], epochs=epochs)
+    report = noise_gate.evaluate(gate, [texts[i] for i in test_idx], [labels[i] for i in test_idx])
+    print(f"Held-out {len(test_idx)} rows ({sum(labels[i] for i in test_idx)} noise):")
+    print_report(report)
+
+    gate.meta = {
+        "rows": len(train_idx),
+        "noise_rows": sum(labels[i] for i in train_idx),
+        "trained_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        "holdout": report,
+    }
+    gate.save(output)
+    print(f"Model saved to {output}. Skip threshold: NOISE_GATE_THRESHOLD={noise_gate.NOISE_GATE_THRESHOLD}.")
+    return gate.meta
+
+def gate_existing(threshold: float, unskip: bool) -> dict:
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        if unskip:
+            print(f"Cleared the skip of {noise_gate.unskip_backlog(db)} rows.")
+        gate = noise_gate.NoiseGate(threshold=threshold)
+        totals = noise_gate.gate_backlog(db, gate)
+        print(f"Gated the unclassified backlog: {totals}")
+        return totals
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local noise gate on classified insights and report precision / recall.")
+    parser.add_argument("--output", default=noise_gate.NOISE_GATE_MODEL_FILE)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction of rows kept out of training for the report")
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--apply-backlog", action="store_true",
+                        help="after training, run the gate over unclassified rows preprocessed before it existed")
+    parser.add_argument("--unskip", action="store_true",
+                        help="with --apply-backlog: first clear every skip, so the backlog is re-gated (e.g. after changing the threshold)")
+    parser.add_argument("--threshold", type=float, default=noise_gate.NOISE_GATE_THRESHOLD,
+                        help="model probability from which --apply-backlog skips a row")
+    args = parser.parse_args()
+    observability.configure_logging()
+    train_noise_gate(args.output, args.holdout, args.epochs, args.seed)
+    if args.apply_backlog:
+        gate_existing(args.threshold, args.unskip)
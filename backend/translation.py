@@ -0,0 +1,217 @@
+import os
+import json
+import asyncio
+import logging
+from sqlalchemy.orm import Session
+import models
+import observability
+from database import dialect_insert, run_db
+from rate_limit import TokenBucket
+from openai_scheduler import SCHEDULER
+from utils import get_text_hash, estimate_tokens
+
+# Backend used by translate_texts: none (keep the original text, as
+# before translation existed), fake or openai (opt-in: one paid request
+# per batch of non-English rows)
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "none")
+TRANSLATION_MODEL = os.getenv("TRANSLATION_MODEL", "gpt-4o-mini")
+TRANSLATION_TARGET_LANGUAGE = "en"
+
+# Batching and rate limits for translation requests
+TRANSLATION_BATCH_TOKENS = int(os.getenv("TRANSLATION_BATCH_TOKENS", "3000"))
+TRANSLATION_MAX_BATCH_ITEMS = int(os.getenv("TRANSLATION_MAX_BATCH_ITEMS", "50"))
+TRANSLATION_MAX_CONCURRENCY = int(os.getenv("TRANSLATION_MAX_CONCURRENCY", "4"))
+TRANSLATION_TOKENS_PER_MINUTE = int(os.getenv("TRANSLATION_TOKENS_PER_MINUTE", "0")) # 0 = unlimited
+
+# Languages that are never sent for translation
+SKIP_LANGUAGES = {"en", "unknown"}
+
+logger = logging.getLogger("signalyze.openai")
+
+class TranslationBackend:
+    """
+    Base backend: translates nothing. translate_batch returns one entry per
+    input text, None where no translation is available.
+    """
+    name = "none"
+
+    async def translate_batch(self, texts, source_langs, target_lang: str) -> list:
+        return [None] * len(texts)
+
+class FakeTranslationBackend(TranslationBackend):
+    """
+    Deterministic local backend for tests and benchmarks. Records how many
+    requests and texts it has seen.
+    """
+    name = "fake"
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.calls = 0
+        self.texts_translated = 0
+
+    async def translate_batch(self, texts, source_langs, target_lang: str) -> list:
+        self.calls += 1
+        self.texts_translated += len(texts)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return [f"[{lang}->{target_lang}] {text}" for text, lang in zip(texts, source_langs)]
+
+class OpenAITranslationBackend(TranslationBackend):
+    """
+    Packs many texts into one chat completion and asks for a JSON object
+    keyed by item id.
+    """
+    name = "openai"
+
+    def __init__(self, client=None, model: str = TRANSLATION_MODEL):
+        self.client = client
+        self.model = model
+
+    async def translate_batch(self, texts, source_langs, target_lang: str) -> list:
+        client = self.client
+        if client is None:
+            from openai_service import client
+        if not client:
+            return [None] * len(texts)
+
+        items = [{"id": i, "language": lang, "text": text} for i, (text, lang) in enumerate(zip(texts, source_langs))]
+        prompt = f"""Translate each item's text into language "{target_lang}".
+Keep product names, brands and model names unchanged.
+Return ONLY valid JSON of the form {{"translations": [{{"id": <id>, "text": "<translation>"}}]}}
+with exactly one entry per input id.
+
+Items:
+{json.dumps(items, ensure_ascii=False)}
+"""
+        try:
+            response = await SCHEDULER.chat_completion(
+                client,
+                estimated_tokens=2 * estimate_tokens(prompt),
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are a translation engine that outputs JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0
+            )
+            data = json.loads(response.choices[0].message.content)
+            # Models echo ids as numbers or strings
+            by_id = {str(item.get("id")): item.get("text") for item in data.get("translations", []) if isinstance(item, dict)}
+            return [by_id.get(str(i)) or None for i in range(len(texts))]
+        except Exception as e:
+            logger.error("Error calling OpenAI for translation: %s", e)
+            return [None] * len(texts)
+
+TRANSLATION_BACKENDS = {
+    TranslationBackend.name: TranslationBackend,
+    FakeTranslationBackend.name: FakeTranslationBackend,
+    OpenAITranslationBackend.name: OpenAITranslationBackend,
+}
+
+_backend = None
+_semaphore = asyncio.Semaphore(TRANSLATION_MAX_CONCURRENCY)
+_token_bucket = TokenBucket(TRANSLATION_TOKENS_PER_MINUTE)
+
+def get_backend() -> TranslationBackend:
+    global _backend
+    if _backend is None:
+        _backend = TRANSLATION_BACKENDS[TRANSLATION_BACKEND]()
+    return _backend
+
+def set_backend(backend: TranslationBackend):
+    # Swap the backend at runtime (e.g. FakeTranslationBackend in tests)
+    global _backend
+    _backend = backend
+
+def _pack_batches(items):
+    """
+    Groups (hash, text, lang) items into batches bounded by
+    TRANSLATION_BATCH_TOKENS and TRANSLATION_MAX_BATCH_ITEMS.
+    """
+    batches, current, current_tokens = [], [], 0
+    for item in items:
+        tokens = estimate_tokens(item[1])
+        if current and (current_tokens + tokens > TRANSLATION_BATCH_TOKENS or len(current) >= TRANSLATION_MAX_BATCH_ITEMS):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+async def _translate_with_limits(backend: TranslationBackend, batch):
+    # Input and output are both billed, so reserve roughly twice the input size
+    await _token_bucket.acquire(2 * sum(estimate_tokens(text) for _, text, _ in batch))
+    async with _semaphore:
+        return await backend.translate_batch(
+            [text for _, text, _ in batch],
+            [lang for _, _, lang in batch],
+            TRANSLATION_TARGET_LANGUAGE
+        )
+
+def _load_cached(db: Session, text_hashes) -> dict:
+    return dict(
+        db.query(models.TranslationCache.text_hash, models.TranslationCache.translated_text)
+        .filter(models.TranslationCache.text_hash.in_(text_hashes))
+    )
+
+async def translate_texts(db: Session, texts, source_langs, hashes=None) -> list:
+    """
+    Translates non-English texts to English.
+    1. Look up every text_hash in the persistent translation_cache in one query
+    2. Send the misses to the backend in token-bounded batches, with at most
+       TRANSLATION_MAX_CONCURRENCY requests in flight
+    3. Stage new translations in translation_cache (the caller commits)
+    Returns one (translated_text, is_translated) tuple per input; texts that
+    are English, unknown or failed to translate come back unchanged.
+    `db` may be None to skip the persistent cache.
+    """
+    results = [(text, False) for text in texts]
+    backend = get_backend()
+    # The default: nothing to translate, so no cache lookup either
+    if backend.name == TranslationBackend.name:
+        return results
+    todo = [i for i, (text, lang) in enumerate(zip(texts, source_langs)) if text and lang not in SKIP_LANGUAGES]
+    if not todo:
+        return results
+
+    keys = {i: (hashes[i] if hashes else get_text_hash(texts[i])) for i in todo}
+
+    cached = {}
+    if db is not None:
+        cached = await run_db(_load_cached, db, list(set(keys.values())))
+
+    misses = {}
+    for i in todo:
+        if keys[i] not in cached and keys[i] not in misses:
+            misses[keys[i]] = (keys[i], texts[i], source_langs[i])
+    observability.CACHE_LOOKUPS.labels("translation", "hit").inc(len(set(keys.values())) - len(misses))
+    observability.CACHE_LOOKUPS.labels("translation", "miss").inc(len(misses))
+
+    if misses:
+        batches = _pack_batches(list(misses.values()))
+        translated = await asyncio.gather(*[_translate_with_limits(backend, batch) for batch in batches])
+
+        new_rows = []
+        for batch, outputs in zip(batches, translated):
+            for (t_hash, _, lang), output in zip(batch, outputs):
+                if output:
+                    cached[t_hash] = output
+                    new_rows.append({
+                        "text_hash": t_hash,
+                        "source_language": lang,
+                        "target_language": TRANSLATION_TARGET_LANGUAGE,
+                        "translated_text": output,
+                        "backend": backend.name
+                    })
+        if db is not None and new_rows:
+            stmt = dialect_insert(db, models.TranslationCache.__table__).on_conflict_do_nothing(index_elements=["text_hash"])
+            await run_db(db.execute, stmt, new_rows)
+
+    for i in todo:
+        if keys[i] in cached:
+            results[i] = (cached[keys[i]], True)
+    return results
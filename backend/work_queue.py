@@ -0,0 +1,124 @@
+import os
+import socket
+import datetime
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.orm import Session
+import models
+from database import dialect_insert
+
+# How long a claimed item stays reserved for its worker
+WORK_LEASE_SECONDS = int(os.getenv("WORK_LEASE_SECONDS", "300"))
+# Items claimed this many times without completing are left alone
+WORK_MAX_ATTEMPTS = int(os.getenv("WORK_MAX_ATTEMPTS", "5"))
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _pending_query(stage: str):
+    """
+    Items of `stage` that still need work, as (select, item table).
+    """
+    if stage == "preprocess":
+        return select(models.RawFeedback.id).where(models.RawFeedback.processed_at == None)\
+            .order_by(models.RawFeedback.created_at), models.RawFeedback
+    if stage == "classify":
+        return select(models.PreprocessedFeedback.id)\
+            .outerjoin(models.ClassifiedInsight, models.ClassifiedInsight.preprocessed_id == models.PreprocessedFeedback.id)\
+            .where(models.ClassifiedInsight.id == None, models.PreprocessedFeedback.skipped_reason == None)\
+            .order_by(models.PreprocessedFeedback.created_at), models.PreprocessedFeedback
+    raise ValueError(f"Unknown stage: {stage}")
+
+def _candidate_query(stage: str, now: datetime.datetime, limit: int, item_ids=None):
+    """
+    Pending items of `stage` that are unclaimed or whose lease expired, as
+    (select, item table). `item_ids` limits them to those items.
+    """
+    pending, item_table = _pending_query(stage)
+    claims = models.WorkClaim
+    candidates = pending.outerjoin(claims, and_(claims.stage == stage, claims.item_id == item_table.id))\
+        .where(or_(claims.item_id == None, and_(claims.leased_until < now, claims.attempts < WORK_MAX_ATTEMPTS)))
+    if item_ids is not None:
+        candidates = candidates.where(item_table.id.in_(list(item_ids)))
+    return candidates.limit(limit), item_table
+
+def claim(db: Session, stage: str, worker_id: str, limit: int, lease_seconds: int = WORK_LEASE_SECONDS, item_ids=None) -> list:
+    """
+    Reserves up to `limit` pending items of `stage` for `worker_id` and
+    returns their ids. Items leased by another worker are skipped until the
+    lease expires, so concurrent workers never get the same item.
+    `item_ids` claims only those items (e.g. one row processed inline).
+
+    Postgres: candidates are locked with SELECT ... FOR UPDATE SKIP LOCKED so
+    concurrent claimers do not block on each other. On every backend the
+    claim itself is an INSERT ... ON CONFLICT DO UPDATE (only where the old
+    lease expired) ... RETURNING, which is what makes it atomic; SQLite
+    serializes writers, so it needs no row locks.
+    """
+    now = datetime.datetime.utcnow()
+    claims = models.WorkClaim
+    candidates, item_table = _candidate_query(stage, now, limit, item_ids)
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True, of=item_table)
+
+    ids = list(db.execute(candidates).scalars())
+    if not ids:
+        db.rollback()
+        return []
+
+    leased_until = now + datetime.timedelta(seconds=lease_seconds)
+    stmt = dialect_insert(db, claims.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["stage", "item_id"],
+        set_={
+            "worker_id": worker_id,
+            "leased_until": leased_until,
+            "attempts": claims.__table__.c.attempts + 1,
+            "claimed_at": now
+        },
+        where=and_(claims.__table__.c.leased_until < now, claims.__table__.c.attempts < WORK_MAX_ATTEMPTS)
+    ).returning(claims.__table__.c.item_id)
+    claimed = db.execute(stmt, [{
+        "stage": stage,
+        "item_id": item_id,
+        "worker_id": worker_id,
+        "leased_until": leased_until,
+        "attempts": 1,
+        "claimed_at": now
+    } for item_id in ids]).scalars().all()
+    db.commit()
+    return list(claimed)
+
+def release(db: Session, stage: str, item_ids, worker_id: str = None):
+    """
+    Drops the leases of finished items (staged in the caller's transaction).
+    Failed items keep their lease and are retried once it expires.
+    """
+    if not item_ids:
+        return
+    query = db.query(models.WorkClaim).filter(models.WorkClaim.stage == stage, models.WorkClaim.item_id.in_(list(item_ids)))
+    if worker_id:
+        query = query.filter(models.WorkClaim.worker_id == worker_id)
+    query.delete(synchronize_session=False)
+
+def queue_stats(db: Session) -> dict:
+    now = datetime.datetime.utcnow()
+    stats = {}
+    for stage in ("preprocess", "classify"):
+        base = db.query(models.WorkClaim).filter(models.WorkClaim.stage == stage)
+        stats[stage] = {
+            "leased": base.filter(models.WorkClaim.leased_until >= now).count(),
+            "expired": base.filter(models.WorkClaim.leased_until < now, models.WorkClaim.attempts < WORK_MAX_ATTEMPTS).count(),
+            "poisoned": base.filter(models.WorkClaim.attempts >= WORK_MAX_ATTEMPTS).count()
+        }
+    return stats
+
+def backlog_counts(db: Session) -> dict:
+    """
+    Items waiting per layer: raw rows not yet preprocessed and preprocessed
+    rows not yet classified (both read through the backlog indexes).
+    """
+    counts = {}
+    for layer, stage in (("raw", "preprocess"), ("preprocessed", "classify")):
+        pending, _ = _pending_query(stage)
+        counts[layer] = db.execute(select(func.count()).select_from(pending.order_by(None).subquery())).scalar()
+    return counts
@@ -1,47 +1,114 @@
 import asyncio
+import logging
+import argparse
+import multiprocessing
 import os
 import sys
-from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
-backend_path = 'c:/Users/jeyab/Desktop/prasath/backend'
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
 if backend_path not in sys.path:
     sys.path.append(backend_path)
 
 load_dotenv(os.path.join(backend_path, '.env'))
 
-import models
-from database import SessionLocal
-from pipelines.classification import classify_preprocessed_item
+logger = logging.getLogger("signalyze.worker")
+
+async def worker(worker_id: str, stages, batch_size: int, idle_sleep: int):
+    # Imported here so every worker process builds its own engine and pool
+    from database import SessionLocal, engine
+    from pipelines.preprocessing import preprocess_raw_batch
+    from classification_service import run_classification_pipeline
+    from pipeline_events import EVENTS, RAW, PREPROCESSED
+
+    # On Postgres, commits in other processes wake this worker (LISTEN);
+    # elsewhere it rechecks every idle_sleep seconds
+    EVENTS.bind()
+    EVENTS.listen(engine)
+    channels = [channel for stage, channel in (("preprocess", RAW), ("classify", PREPROCESSED)) if stage in stages]
 
-async def worker():
     db = SessionLocal()
     try:
-        print("WORKER: Starting classification worker...")
+        logger.info("Worker %s starting (%s)...", worker_id, ", ".join(stages))
         while True:
-            # Find preprocessed items that don't have an insight yet
-            pre_pending = db.query(models.PreprocessedFeedback).outerjoin(models.ClassifiedInsight).filter(models.ClassifiedInsight.id == None).limit(10).all()
-            
-            if not pre_pending:
-                print("WORKER: No more items to classify. Sleeping 30s...")
-                await asyncio.sleep(30)
-                continue
-
-            print(f"WORKER: Classifying {len(pre_pending)} items...")
-            for pre in pre_pending:
+            did_work = False
+            EVENTS.clear(*channels)
+
+            if "preprocess" in stages:
+                try:
+                    stats = await preprocess_raw_batch(db, worker_id=worker_id)
+                    if stats["fetched"]:
+                        did_work = True
+                        logger.info("Worker %s preprocessed %d at %s items/sec", worker_id, stats["fetched"], stats["items_per_sec"],
+                                    extra={"worker_id": worker_id, "stage": "preprocess", "stats": stats})
+                except Exception as e:
+                    logger.error("Worker %s preprocessing error: %s", worker_id, e, exc_info=True)
+                    db.rollback()
+
+            if "classify" in stages:
                 try:
-                    await classify_preprocessed_item(db, pre.id)
-                    print(f"WORKER: Classified {pre.id[:8]}")
+                    classified = await run_classification_pipeline(db, batch_size=batch_size, worker_id=worker_id)
+                    if classified:
+                        did_work = True
+                        logger.info("Worker %s classified %d items", worker_id, classified,
+                                    extra={"worker_id": worker_id, "stage": "classify", "classified": classified})
                 except Exception as e:
-                    print(f"WORKER: Error {pre.id[:8]}: {e}")
-            
-            # Rate limit/Sleep
-            await asyncio.sleep(1)
-            
+                    logger.error("Worker %s classification error: %s", worker_id, e, exc_info=True)
+                    db.rollback()
+
+            if not did_work:
+                await EVENTS.wait(*channels, timeout=idle_sleep)
+
     except Exception as e:
-        print(f"WORKER FATAL: {e}")
+        logger.critical("Worker %s stopped: %s", worker_id, e, exc_info=True)
     finally:
+        EVENTS.close()
         db.close()
 
+def run_worker(index: int, stages, batch_size: int, idle_sleep: int, metrics_port: int = None,
+               preprocess_processes: int = None):
+    import socket
+    import observability
+    import preprocess_pool
+    observability.configure_logging()
+    if preprocess_processes:
+        preprocess_pool.POOL.processes = preprocess_processes
+    if metrics_port:
+        # One port per worker process: metrics_port, metrics_port + 1, ...
+        observability.start_metrics_server(metrics_port + index)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    try:
+        asyncio.run(worker(worker_id, stages, batch_size, idle_sleep))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        preprocess_pool.POOL.close()
+
 if __name__ == "__main__":
-    asyncio.run(worker())
+    parser = argparse.ArgumentParser(description="Pipeline worker. Items are claimed with leases, so any number of workers can run side by side.")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes to start")
+    parser.add_argument("--stage", choices=["preprocess", "classify", "all"], default="classify")
+    parser.add_argument("--batch-size", type=int, default=20, help="items claimed per classification batch")
+    parser.add_argument("--idle-sleep", type=int, default=30, help="seconds to wait for new work before checking again (Postgres notifications wake workers sooner)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on this port (+1 per extra worker)")
+    parser.add_argument("--preprocess-processes", type=int, default=None,
+                        help="preprocessing pool processes per worker (default: the cores split between workers)")
+    args = parser.parse_args()
+
+    stages = ["preprocess", "classify"] if args.stage == "all" else [args.stage]
+    preprocess_processes = args.preprocess_processes or max(1, (os.cpu_count() or 1) // args.workers)
+    if args.workers == 1:
+        run_worker(0, stages, args.batch_size, args.idle_sleep, args.metrics_port, preprocess_processes)
+    else:
+        # spawn, so no process inherits the parent's DB connections
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=run_worker, args=(i, stages, args.batch_size, args.idle_sleep, args.metrics_port, preprocess_processes)) for i in range(args.workers)]
+        for p in procs:
+            p.start()
+        try:
+            for p in procs:
+                p.join()
+        except KeyboardInterrupt:
+            for p in procs:
+                p.terminate()
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { ShieldCheck, Search, Filter, RefreshCcw, Table as TableIcon, LayoutGrid } from 'lucide-react';
-import { getClassifiedFeedback } from '../services/api';
+import { getClassifiedFeedbackPage } from '../services/api';
 import StatusBadge from '../components/StatusBadge';
 
 const VerifyData: React.FC = () => {
@@ -8,12 +8,15 @@ const VerifyData: React.FC = () => {
     const [loading, setLoading] = useState(true);
     const [viewMode, setViewMode] = useState<'grid' | 'table'>('table');
     const [searchTerm, setSearchTerm] = useState('');
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     const fetchData = async () => {
         setLoading(true);
         try {
-            const result = await getClassifiedFeedback();
-            setData(result);
+            const page = await getClassifiedFeedbackPage();
+            setData(page.items);
+            setNextCursor(page.nextCursor);
         } catch (error) {
             console.error('Failed to fetch audit data:', error);
         } finally {
@@ -21,6 +24,20 @@ const VerifyData: React.FC = () => {
         }
     };
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const page = await getClassifiedFeedbackPage({ cursor: nextCursor });
+            setData(prev => [...prev, ...page.items]);
+            setNextCursor(page.nextCursor);
+        } catch (error) {
+            console.error('Failed to fetch more audit data:', error);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         fetchData();
     }, []);
@@ -191,6 +208,18 @@ const VerifyData: React.FC = () => {
                     ))}
                 </div>
             )}
+
+            {!loading && nextCursor && (
+                <div className="flex justify-center">
+                    <button
+                        onClick={loadMore}
+                        disabled={loadingMore}
+                        className="px-4 py-2 bg-white border rounded-lg hover:bg-gray-50 text-gray-600 disabled:opacity-50"
+                    >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
@@ -26,6 +26,14 @@ export const getClassifiedFeedback = async (limit: number = 50): Promise<Classif
   return response.data;
 };
 
+// Keyset pagination: pass the previous page's nextCursor to get the next page
+export const getClassifiedFeedbackPage = async (
+  params: { limit?: number; cursor?: string | null; fields?: string; sentiment?: string; category?: string; brand?: string; model?: string; source?: string; since?: string; until?: string } = {}
+): Promise<{ items: ClassifiedInsight[]; nextCursor: string | null }> => {
+  const response = await api.get('/classified-feedback', { params: { limit: 50, ...params } });
+  return { items: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+};
+
 export const getStats = async (): Promise<DashboardStats> => {
   const response = await api.get('/analytics/summary');
   return response.data;
@@ -1,26 +1,32 @@
 import asyncio
 import json
 import os
+import sys
 from dotenv import load_dotenv
 
+# The backend modules import each other by bare name
+backend_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+if backend_path not in sys.path:
+    sys.path.append(backend_path)
+
 # Load env from backend folder
-load_dotenv(dotenv_path="backend/.env")
+load_dotenv(dotenv_path=os.path.join(backend_path, ".env"))
 
-from backend.openai_service import classify_feedback
-from backend.database import SessionLocal
-from backend import models
+from openai_service import analyze_feedback
+from database import SessionLocal
+import models
 
 async def test_system():
     print("--- 1. Testing OpenAI Classification ---")
     test_text = "The Ather Rizta's range dropped suddenly after the last update. Very disappointing."
     try:
-        result = await classify_feedback(test_text)
+        result = await analyze_feedback(test_text)
         print("Classification Result:")
         print(json.dumps(result, indent=2))
-        if result.get('sentiment') == 'Negative' and result.get('company') == 'Ather':
+        if result and result.get('sentiment') == 'Negative' and result.get('make_brand') == 'Ather':
             print("✅ OpenAI Classification working correctly.")
         else:
-            print("⚠️ OpenAI Classification responded but results might be unexpected (check for Mock mode).")
+            print("⚠️ OpenAI Classification responded but results might be unexpected (check the API key).")
     except Exception as e:
         print(f"❌ OpenAI Classification failed: {e}")
 
@@ -28,7 +34,7 @@ async def test_system():
     db = SessionLocal()
     try:
         # Check if we can query the table
-        count = db.query(models.Feedback).count()
+        count = db.query(models.RawFeedback).count()
         print(f"✅ Database connected. Total feedback records: {count}")
     except Exception as e:
         print(f"❌ Database query failed: {e}")
@@ -36,8 +42,4 @@ async def test_system():
         db.close()
 
 if __name__ == "__main__":
-    # Ensure we are in the right directory for imports
-    import sys
-    import os
-    sys.path.append(os.getcwd())
     asyncio.run(test_system())